@@ -1,37 +1,334 @@
-import requests
+# Generador de càrrega per als servidors Flask del projecte (a localhost).
+# Abans aquest fitxer feia un GET a /saludo i un POST a /sumar; ara n'envia
+# milers amb una barreja de peticions configurable i en mesura la capacitat.
+#
+#  - closed-loop (--concurrency N): N clients que envien la petició següent
+#    quan arriba la resposta. Mesura el màxim que aguanta el servidor.
+#  - open-loop (--rate R): R peticions per segon tant si el servidor respon com
+#    si no. La latència es compta des de l'hora prevista d'enviament, així la
+#    cua que es forma quan el servidor no dona l'abast també surt als números.
+#
+# El resultat és JSON: peticions/s, errors i latència p50/p95/p99 (ms), en
+# total i per operació.
+#
+# Exemples:
+#   python clientTest.py --target testserver --spawn
+#   python clientTest.py --target primer --spawn --concurrency 16 --duration 10
+#   python clientTest.py --target prototip2 --spawn --rate 300 --mix "login=1,child=4,tap=4,tap_create=1"
+#   python clientTest.py --target prototip2 --url http://localhost:5000 --auth --out resultat.json
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
-print("Petició GET: http://localhost:5000/saludo?nombre=Charles")
-url = "http://localhost:5000/saludo?nombre=Charles"
-response = requests.get(url)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Cada operació retorna (mètode, path, body) per a la petició número n
+TARGETS = {
+    'testserver': {
+        'dir': 'TestServer',
+        'module': 'server',
+        'mix': 'saludo=3,sumar=1',
+        'ops': {
+            'saludo': lambda n: ('GET', f'/saludo?nombre=Charles{n % 100}', None),
+            'sumar': lambda n: ('POST', '/sumar', {"numero": n % 1000}),
+        },
+    },
+    'primer': {
+        'dir': 'primerPrototipo',
+        'module': 'server',
+        'mix': 'user=5,list=3,create=1',
+        'ops': {
+            'user': lambda n: ('GET', '/user?username=' + ('rob', 'ana', 'John')[n % 3], None),
+            'list': lambda n: ('GET', '/users?limit=50', None),
+            'create': lambda n: ('POST', '/user', {"username": f"load{os.getpid()}-{n}", "nom": "Load Test",
+                                                   "password": "12345", "email": f"load{n}@test.cat"}),
+        },
+    },
+    'prueba': {
+        'dir': 'primerPrototipo',
+        'module': 'serverprueba',
+        'mix': 'login=1',
+        'ops': {
+            'login': lambda n: ('POST', '/login', {"user": "admin", "password": "1234"}),
+        },
+    },
+    'prototip2': {
+        'dir': os.path.join('prototipo2', 'prototip2', 'server'),
+        'module': 'server',
+        'mix': 'login=1,list=2,child=3,tap=3,tap_create=1',
+        'login': ('/login', {"username": "mare", "password": "12345"}),
+        'ops': {
+            'login': lambda n: ('POST', '/login', {"username": "mare", "password": "12345"}),
+            'list': lambda n: ('GET', '/getusers', None),
+            'child': lambda n: ('GET', f'/children?user_id={n % 2 + 1}', None),
+            'tap': lambda n: ('GET', f'/taps/search?child_id={n % 2 + 1}', None),
+            'tap_create': lambda n: ('POST', '/taps', {"child_id": n % 2 + 1, "status_id": 1, "user_id": 1,
+                                                       "init": "2024-12-18T21:30:00", "end": None}),
+        },
+    },
+}
 
-if response.status_code == 200:
-    print("✅ Èxit!")
-    print(response.text)
-else:
-    print(f"❌ Error {response.status_code}")
+SERVE = ("import sys; sys.argv = ['server']\n"
+         "import {module}\n"
+         "from werkzeug.serving import make_server\n"
+         "make_server('127.0.0.1', {port}, {module}.app, threaded=True).serve_forever()")
 
-print("Petició POST: http://localhost:5000/sumar")
-# URL del endpoint Flask
-url = "http://localhost:5000/sumar"
 
+def parseMix(text, ops):
+    # "login=1,list=2" -> [(nom, pes), ...]
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ops:
+            raise SystemExit(f"Operació desconeguda '{name}'. Disponibles: {', '.join(ops)}")
+        mix.append((name, float(weight or 1)))
+    return mix
 
-# Parámetro a enviar
-datos = {"numero": 7}
 
+def freePort():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
 
-try:
-    # Enviar petición POST con JSON
-    respuesta = requests.post(url, json=datos)
 
+def spawn(target):
+    # Arrenca el servidor en un procés a part (sense debug ni reloader)
+    port = freePort()
+    cmd = [sys.executable, '-c', SERVE.format(module=target['module'], port=port)]
+    proc = subprocess.Popen(cmd, cwd=os.path.join(ROOT, target['dir']),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc, f"http://127.0.0.1:{port}"
+        except OSError:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit(f"El servidor de {target['dir']} no arrenca")
 
-    # Comprobar el código de estado
-    if respuesta.status_code == 200:
-        print("✅ Respuesta correcta:")
-        print(respuesta.json())
-    else:
-        print(f"⚠️ Error {respuesta.status_code}: {respuesta.text}")
 
+class Client:
+    # Una connexió keep-alive per thread (http.client torna a connectar si el servidor la tanca)
+    def __init__(self, url, headers, timeout):
+        self.url = urlsplit(url)
+        self.headers = headers
+        self.timeout = timeout
+        self.local = threading.local()
 
-except requests.exceptions.RequestException as e:
-    print(f"❌ Error en la conexión: {e}")
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.url.hostname, self.url.port or 80,
+                                                                timeout=self.timeout)
+        return conn
+
+    def send(self, method, path, body):
+        # Retorna l'status, o None si hi ha hagut error de connexió/timeout
+        headers = dict(self.headers)
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        conn = self.connection()
+        try:
+            conn.request(method, self.url.path.rstrip('/') + path, data, headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.local.conn = None
+            return None
+
+
+class Recorder:
+    # Només compten les peticions enviades (o programades) després de l'escalfament
+    def __init__(self, measureFrom):
+        self.lock = threading.Lock()
+        self.measureFrom = measureFrom
+        self.latencies = {}     # operació -> [segons]
+        self.statuses = {}      # operació -> {status: nombre}
+
+    def add(self, op, status, started, latency):
+        if started < self.measureFrom:
+            return
+        key = str(status) if status is not None else 'error'
+        with self.lock:
+            self.latencies.setdefault(op, []).append(latency)
+            counts = self.statuses.setdefault(op, {})
+            counts[key] = counts.get(key, 0) + 1
+
+
+def percentile(values, p):
+    # values ordenats; percentil per rang (nearest-rank)
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summary(latencies, statuses, seconds):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    errors = sum(n for status, n in statuses.items() if status == 'error' or int(status) >= 400)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": total,
+        "throughput": round(total / seconds, 1) if seconds else 0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0,
+        "status": statuses,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / total) if total else None,
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+def closedLoop(client, requestFor, recorder, concurrency, stop):
+    def worker():
+        while time.perf_counter() < stop:
+            op, method, path, body = requestFor()
+            start = time.perf_counter()
+            status = client.send(method, path, body)
+            recorder.add(op, status, start, time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def openLoop(client, requestFor, recorder, rate, stop, workers, poisson):
+    # Les peticions es programen a hores fixes (o amb arribades de Poisson); si
+    # tots els workers estan ocupats esperen a la cua i aquesta espera compta
+    def run(scheduled, op, method, path, body):
+        status = client.send(method, path, body)
+        recorder.add(op, status, scheduled, time.perf_counter() - scheduled)
+
+    with ThreadPoolExecutor(workers) as pool:
+        scheduled = time.perf_counter()
+        while scheduled < stop:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, scheduled, *requestFor())
+            scheduled += random.expovariate(rate) if poisson else 1 / rate
+
+
+def login(url, target, timeout):
+    # Token de sessió per a --auth (servidors amb /login que retorna token)
+    path, body = target['login']
+    status = None
+    conn = http.client.HTTPConnection(urlsplit(url).hostname, urlsplit(url).port, timeout=timeout)
+    try:
+        conn.request('POST', path, json.dumps(body), {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        status = response.status
+        token = (json.loads(response.read()).get('data') or {}).get('token')
+    finally:
+        conn.close()
+    if not token:
+        raise SystemExit(f"Login sense token (status {status})")
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prova de càrrega dels servidors Flask del projecte")
+    parser.add_argument('--target', choices=sorted(TARGETS), default='testserver')
+    parser.add_argument('--url', help="servidor ja arrencat (per defecte http://localhost:5000)")
+    parser.add_argument('--spawn', action='store_true', help="arrenca el servidor del target en un procés a part")
+    parser.add_argument('--mix', help="pesos per operació, p. ex. 'login=1,list=2' (per defecte el del target)")
+    parser.add_argument('--concurrency', type=int, default=8, help="clients del closed-loop")
+    parser.add_argument('--rate', type=float, help="peticions/s: activa l'open-loop")
+    parser.add_argument('--poisson', action='store_true', help="open-loop amb arribades de Poisson")
+    parser.add_argument('--workers', type=int, default=64, help="threads que envien en open-loop")
+    parser.add_argument('--duration', type=float, default=5, help="segons de mesura")
+    parser.add_argument('--warmup', type=float, default=1, help="segons inicials que no compten")
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--auth', action='store_true', help="fa login i envia 'Authorization: Bearer <token>'")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="fitxer on escriure el JSON (a més de la sortida estàndard)")
+    args = parser.parse_args()
+
+    target = TARGETS[args.target]
+    ops = target['ops']
+    mix = parseMix(args.mix or target['mix'], ops)
+    names = [name for name, _ in mix]
+    weights = list(itertools.accumulate(weight for _, weight in mix))
+    counter = itertools.count()
+    rng = random.Random(args.seed)
+    rngLock = threading.Lock()
+
+    def requestFor():
+        with rngLock:
+            n = next(counter)
+            op = rng.choices(names, cum_weights=weights)[0]
+        return (op,) + ops[op](n)
+
+    proc = None
+    url = args.url or 'http://localhost:5000'
+    if args.spawn:
+        proc, url = spawn(target)
+    try:
+        headers = {'Accept': 'application/json'}
+        if args.auth:
+            if 'login' not in target:
+                raise SystemExit(f"El target {args.target} no té sessions")
+            headers['Authorization'] = 'Bearer ' + login(url, target, args.timeout)
+        client = Client(url, headers, args.timeout)
+        measureFrom = time.perf_counter() + args.warmup
+        stop = measureFrom + args.duration
+        recorder = Recorder(measureFrom)
+        if args.rate:
+            openLoop(client, requestFor, recorder, args.rate, stop, args.workers, args.poisson)
+        else:
+            closedLoop(client, requestFor, recorder, args.concurrency, stop)
+        # Inclou l'espera de les últimes respostes (en open-loop poden ser moltes)
+        seconds = time.perf_counter() - measureFrom
+    finally:
+        if proc:
+            proc.kill()
+            proc.wait()
+
+    allStatuses = {}
+    for counts in recorder.statuses.values():
+        for status, n in counts.items():
+            allStatuses[status] = allStatuses.get(status, 0) + n
+    result = {
+        "target": args.target,
+        "url": url,
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": None if args.rate else args.concurrency,
+        "duration": args.duration,
+        "mix": dict(mix),
+        **summary([v for values in recorder.latencies.values() for v in values], allStatuses, seconds),
+        "operations": {op: summary(recorder.latencies[op], recorder.statuses[op], seconds)
+                       for op in sorted(recorder.latencies)},
+    }
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + "\n")
+
+
+if __name__ == '__main__':
+    main()
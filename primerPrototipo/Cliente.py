@@ -39,8 +39,10 @@ class ViewConsole:
         #to-do
         return None
     
-daoUserClient = daoUserClient()
-u=daoUserClient.getUserByUsername("rob")
-print(u)
-u=daoUserClient.getUserByUsername("Not exist")
-print(u)
\ No newline at end of file
+# Prueba con el servidor arrancado: python Cliente.py (no se ejecuta al importar)
+if __name__ == "__main__":
+    daoUserClient = daoUserClient()
+    u=daoUserClient.getUserByUsername("rob")
+    print(u)
+    u=daoUserClient.getUserByUsername("Not exist")
+    print(u)
@@ -1,4 +1,16 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from bisect import bisect_left, bisect_right, insort
+import base64
+import json
+import os
+import sys
+import zlib
+from functools import wraps
+
+# Mètriques compartides amb el servidor de prototip2 (GET /metrics)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototipo2', 'prototip2', 'server'))
+from metricsServer import Metrics, TimedDao, instrument, SERIALIZE
+import profileServer
 
 #conexion cliente servidor 
 #Talent Api tester
@@ -21,34 +33,110 @@ listuser = [
     User(username="John", nom="John Cannigan", password="12345", email="john@gmail.com", rol="tutor")
 ]
 
+# Cursor opac per paginar /users (el client el torna tal qual a ?after=)
+def encodeCursor(username):
+    return base64.urlsafe_b64encode(username.encode()).decode().rstrip("=")
+
+def decodeCursor(token):
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor incorrecto")
+
 # Data Access Object
 class UserDao:
     def __init__(self):
         self.users = listuser
+        # Índice por username y lista de usernames ordenada (para paginar)
+        self.byUsername = {u.username: u for u in self.users}
+        self.usernames = sorted(self.byUsername)
+        self.version = 0  # cambia con cada alta/baja/modificación (ETag)
     
     def getUserByUsername(self, uname):
-        for u in self.users:
-            if u.username == uname:
-                return u.__dict__  # Retorna como diccionario
+        u = self.byUsername.get(uname)
+        if u:
+            return u.__dict__  # Retorna como diccionario
         return None
     
     def addUser(self, u):
         self.users.append(u)
+        self.byUsername[u.username] = u
+        insort(self.usernames, u.username)
+        self.version += 1
+        return u
+
+    def deleteUser(self, username):
+        u = self.byUsername.pop(username, None)
+        if u:
+            self.users.remove(u)
+            del self.usernames[bisect_left(self.usernames, username)]
+            self.version += 1
         return u
     
     def getAllUsers(self):
         return [user.__dict__ for user in self.users]
+
+    def getUsersPage(self, after=None, limit=100):
+        # Usuarios ordenados por username a partir del cursor; retorna (usuarios, cursor siguiente)
+        pos = 0 if not after else bisect_right(self.usernames, decodeCursor(after))
+        names = self.usernames[pos:pos + limit]
+        nextCursor = encodeCursor(names[-1]) if names and pos + limit < len(self.usernames) else None
+        return [self.byUsername[n].__dict__ for n in names], nextCursor
+    
+    def iterAllUsers(self, chunk=500):
+        # Generador por páginas: memoria constante aunque haya muchos usuarios
+        users, nextCursor = self.getUsersPage(None, chunk)
+        while True:
+            yield from users
+            if not nextCursor:
+                return
+            users, nextCursor = self.getUsersPage(nextCursor, chunk)
     
     def userExists(self, username):
-        return any(u.username == username for u in self.users)
+        return username in self.byUsername
 
 # Una sola instancia de UserDao
-user_dao = UserDao()
+metrics = Metrics()
+user_dao = TimedDao(UserDao(), metrics)   # cuenta el tiempo dentro del DAO
 
 app = Flask(__name__)
+instrument(app, metrics)
+profiler = profileServer.fromEnv()   # X-Profile / muestreo (opcional)
+if profiler is not None:
+    profiler.instrument(app)
+jsonify = metrics.timed(SERIALIZE, jsonify)
+
+# Con 'Accept: application/x-ndjson' las listas se envían un registro JSON por línea
+NDJSON = 'application/x-ndjson'
+
+def wantsNdjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
+
+def ndjsonResponse(records):
+    def generate():
+        for record in records:
+            yield json.dumps(record) + "\n"
+    return Response(generate(), mimetype=NDJSON)
+
+# GET condicional: ETag = versión de los usuarios + url. Con If-None-Match igual -> 304
+def conditional(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        variant = request.full_path + request.headers.get('Accept', '')
+        etag = f"{user_dao.version}-{zlib.crc32(variant.encode()):x}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+        return response
+    return wrapper
 
 # ========== ENDPOINT GET (obtener usuario) ==========
 @app.route('/user', methods=['GET'])
+@conditional
 def get_user():
     username = request.args.get("username", default="")
     
@@ -101,14 +189,30 @@ def add_user():
         return jsonify({"error": str(e)}), 500
 
 # ========== ENDPOINT GET ALL (obtener todos los usuarios) ==========
+# Paginado: /users?limit=50&after=<next de la página anterior>
 @app.route('/users', methods=['GET'])
+@conditional
 def get_all_users():
     try:
-        users = user_dao.getAllUsers()
+        limit = request.args.get("limit", type=int)
+        after = request.args.get("after")
+        if limit is None and after is None and wantsNdjson():
+            return ndjsonResponse(user_dao.iterAllUsers())
+        if limit is None and after is None:
+            users = user_dao.getAllUsers()
+            return jsonify({
+                "count": len(users),
+                "users": users
+            })
+        limit = min(max(limit or 100, 1), 1000)
+        users, nextCursor = user_dao.getUsersPage(after, limit)
         return jsonify({
             "count": len(users),
-            "users": users
+            "users": users,
+            "next": nextCursor
         })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -116,15 +220,13 @@ def get_all_users():
 @app.route('/user/<username>', methods=['DELETE'])
 def delete_user(username):
     try:
-        # Buscar usuario
-        for i, user in enumerate(user_dao.users):
-            if user.username == username:
-                # Eliminar usuario
-                deleted_user = user_dao.users.pop(i)
-                return jsonify({
-                    "msg": "Usuario eliminado",
-                    "user": deleted_user.__dict__
-                }), 200
+        # Eliminar usuario (también de los índices del DAO)
+        deleted_user = user_dao.deleteUser(username)
+        if deleted_user:
+            return jsonify({
+                "msg": "Usuario eliminado",
+                "user": deleted_user.__dict__
+            }), 200
         
         return jsonify({"error": "Usuario no encontrado"}), 404
         
@@ -149,6 +251,7 @@ def update_user(username):
                     user.email = data['email']
                 if 'rol' in data:
                     user.rol = data['rol']
+                user_dao.version += 1
                 
                 return jsonify({
                     "msg": "Usuario actualizado",
@@ -168,9 +271,11 @@ def index():
         "endpoints": {
             "GET /user?username=<username>": "Obtener un usuario",
             "GET /users": "Obtener todos los usuarios",
+            "GET /users?limit=<n>&after=<cursor>": "Obtener usuarios paginados",
             "POST /user": "Crear nuevo usuario (JSON body)",
             "PUT /user/<username>": "Actualizar usuario",
-            "DELETE /user/<username>": "Eliminar usuario"
+            "DELETE /user/<username>": "Eliminar usuario",
+            "GET /metrics": "Métricas (formato Prometheus)"
         }
     })
 
@@ -1,7 +1,19 @@
 from flask import Flask, request, jsonify
+import os
+import sys
+
+# Mètriques compartides amb el servidor de prototip2 (GET /metrics)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototipo2', 'prototip2', 'server'))
+from metricsServer import Metrics, instrument, SERIALIZE
+import profileServer
 
 
 app = Flask(__name__)
+metrics = instrument(app, Metrics())
+profiler = profileServer.fromEnv()   # X-Profile / muestreo (opcional)
+if profiler is not None:
+    profiler.instrument(app)
+jsonify = metrics.timed(SERIALIZE, jsonify)
 
 
 # 🔹 POST amb JSON
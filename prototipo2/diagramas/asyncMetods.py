@@ -0,0 +1,407 @@
+import asyncio
+import json
+import ssl
+from urllib.parse import urlsplit, urlencode
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Iterable
+
+from serverMetods import User, Child, Tap, APIException, _records
+
+# =============================================
+# CLIENTE HTTP ASÍNCRONO
+# =============================================
+
+class AsyncAPIClient:
+    """Cliente HTTP asyncio (solo librería estándar) con conexiones keep-alive reutilizadas
+
+    Como máximo concurrency peticiones a la vez; las conexiones libres vuelven a un
+    pool y las reutiliza la siguiente petición, así un reparto de 200 llamadas
+    abre como mucho concurrency conexiones.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 30,
+                 concurrency: int = 20):
+        url = urlsplit(base_url.rstrip('/'))
+        self.base_path = url.path
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.idle: List[tuple] = []
+        self.opened = 0
+        self.headers = {
+            'Host': url.netloc,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        if api_key:
+            self.headers['Authorization'] = f'Bearer {api_key}'
+
+    def set_token(self, token: Optional[str]) -> None:
+        """Token de sesión (de /login) que se envía en todas las peticiones siguientes"""
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        else:
+            self.headers.pop('Authorization', None)
+
+    async def __aenter__(self) -> 'AsyncAPIClient':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Cierra las conexiones del pool"""
+        while self.idle:
+            _, writer = self.idle.pop()
+            writer.close()
+
+    async def _connection(self) -> tuple:
+        if self.idle:
+            return self.idle.pop(), True
+        self.opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl), False
+
+    async def _send(self, conn: tuple, request: bytes) -> tuple:
+        reader, writer = conn
+        writer.write(request)
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1')
+        lines = head.split("\r\n")
+        version, status = lines[0].split(" ")[:2]
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        elif 'chunked' in headers.get('transfer-encoding', ''):
+            body = b''
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return int(status), headers, body, keep_alive
+
+    async def _request(self, method: str, endpoint: str, params: Optional[Dict] = None,
+                       data: Any = None) -> Any:
+        path = f"{self.base_path}/{endpoint.lstrip('/')}"
+        if params:
+            path += f"?{urlencode(params)}"
+        body = json.dumps(data).encode() if data is not None else b''
+        head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in self.headers.items())
+        request = (head + f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        async with self.semaphore:
+            while True:
+                conn, reused = await self._connection()
+                try:
+                    status, headers, raw, keep_alive = await asyncio.wait_for(self._send(conn, request),
+                                                                              self.timeout)
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    conn[1].close()
+                    # Si era una conexión keep-alive que el servidor ya cerró, se repite con otra
+                    if not reused:
+                        raise APIException(f"{method} {path}: {e}")
+                except BaseException:
+                    conn[1].close()
+                    raise
+            if keep_alive:
+                self.idle.append(conn)
+            else:
+                conn[1].close()
+        try:
+            result = json.loads(raw) if raw else {}
+        except json.JSONDecodeError as e:
+            print(f"Error JSON: {e}")
+            raise
+        if status >= 400:
+            raise APIException(f"{method} {path}", status, result)
+        return result
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Realiza una petición GET"""
+        return await self._request('GET', endpoint, params)
+
+    async def post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Realiza una petición POST"""
+        return await self._request('POST', endpoint, data=data)
+
+    async def put(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Realiza una petición PUT"""
+        return await self._request('PUT', endpoint, data=data)
+
+    async def delete(self, endpoint: str) -> Dict[str, Any]:
+        """Realiza una petición DELETE"""
+        return await self._request('DELETE', endpoint)
+
+
+# =============================================
+# DAOs ASÍNCRONOS (mismos métodos que serverMetods)
+# =============================================
+
+class AsyncBaseDAO:
+    """Clase base de los DAOs asíncronos"""
+
+    def __init__(self, api_client: AsyncAPIClient):
+        self.api_client = api_client
+
+
+class AsyncUserDAO(AsyncBaseDAO):
+    endpoint = "users"
+
+    async def create(self, user: User) -> int:
+        """Crea un nuevo usuario en el servidor"""
+        try:
+            response = await self.api_client.post(f"/{self.endpoint}", user.to_dict())
+            return response.get('id')
+        except Exception as e:
+            print(f"Error al crear usuario: {e}")
+            return -1
+
+    async def read(self, user_id: int) -> Optional[User]:
+        """Obtiene un usuario por ID"""
+        try:
+            return User.from_dict(await self.api_client.get(f"/{self.endpoint}/{user_id}"))
+        except Exception as e:
+            print(f"Error al leer usuario {user_id}: {e}")
+            return None
+
+    async def read_many(self, user_ids: Iterable[int]) -> List[Optional[User]]:
+        """Varios usuarios a la vez (en paralelo, con el límite del cliente)"""
+        return await asyncio.gather(*(self.read(user_id) for user_id in user_ids))
+
+    async def update(self, user: User) -> bool:
+        """Actualiza un usuario existente"""
+        try:
+            response = await self.api_client.put(f"/{self.endpoint}/{user.id}", user.to_dict())
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al actualizar usuario {user.id}: {e}")
+            return False
+
+    async def delete(self, user_id: int) -> bool:
+        """Elimina un usuario"""
+        try:
+            response = await self.api_client.delete(f"/{self.endpoint}/{user_id}")
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al eliminar usuario {user_id}: {e}")
+            return False
+
+    async def find_all(self, page_size: int = 100) -> List[User]:
+        """Obtiene todos los usuarios (página a página con el cursor 'next')"""
+        users = []
+        params = {'limit': page_size}
+        try:
+            while True:
+                response = await self.api_client.get(f"/{self.endpoint}", params)
+                users += [User.from_dict(u) for u in response.get('users', [])]
+                if not response.get('next'):
+                    return users
+                params = {'limit': page_size, 'after': response['next']}
+        except Exception as e:
+            print(f"Error al obtener todos los usuarios: {e}")
+            return []
+
+    async def authenticate(self, username: str, password: str) -> Optional[User]:
+        """Autentica con /login y guarda el token de sesión en el cliente"""
+        try:
+            response = await self.api_client.post("/login", {
+                'username': username,
+                'password': password
+            })
+            if response.get('coderesponse') != '1':
+                return None
+            user = User.from_dict(response.get('data'))
+            self.api_client.set_token(user.token)
+            return user
+        except Exception as e:
+            print(f"Error en autenticación: {e}")
+            return None
+
+    async def find_by_username(self, username: str) -> Optional[User]:
+        """Busca usuario por nombre de usuario"""
+        try:
+            response = await self.api_client.get(f"/{self.endpoint}/search", {'username': username})
+            users_data = response.get('users', [])
+            return User.from_dict(users_data[0]) if users_data else None
+        except Exception as e:
+            print(f"Error al buscar usuario por username {username}: {e}")
+            return None
+
+
+class AsyncChildDAO(AsyncBaseDAO):
+    endpoint = "children"
+
+    async def create(self, child: Child) -> int:
+        """Crea un nuevo niño en el servidor"""
+        try:
+            response = await self.api_client.post(f"/{self.endpoint}", child.to_dict())
+            return response.get('id')
+        except Exception as e:
+            print(f"Error al crear niño: {e}")
+            return -1
+
+    async def read(self, child_id: int) -> Optional[Child]:
+        """Obtiene un niño por ID"""
+        try:
+            return Child.from_dict(await self.api_client.get(f"/{self.endpoint}/{child_id}"))
+        except Exception as e:
+            print(f"Error al leer niño {child_id}: {e}")
+            return None
+
+    async def read_many(self, child_ids: Iterable[int]) -> List[Optional[Child]]:
+        """Varios niños a la vez (en paralelo, con el límite del cliente)"""
+        return await asyncio.gather(*(self.read(child_id) for child_id in child_ids))
+
+    async def delete(self, child_id: int) -> bool:
+        """Elimina un niño"""
+        try:
+            response = await self.api_client.delete(f"/{self.endpoint}/{child_id}")
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al eliminar niño {child_id}: {e}")
+            return False
+
+    async def find_all(self) -> List[Child]:
+        """Obtiene todos los niños"""
+        try:
+            response = await self.api_client.get(f"/{self.endpoint}")
+            return [Child.from_dict(c) for c in _records(response)]
+        except Exception as e:
+            print(f"Error al obtener todos los niños: {e}")
+            return []
+
+    async def find_by_user(self, user_id: int) -> List[Child]:
+        """Niños de un usuario (tutor o cuidador)"""
+        try:
+            response = await self.api_client.get(f"/{self.endpoint}", {'user_id': user_id})
+            return [Child.from_dict(c) for c in _records(response)]
+        except Exception as e:
+            print(f"Error al obtener los niños del usuario {user_id}: {e}")
+            return []
+
+
+class AsyncTapDAO(AsyncBaseDAO):
+    endpoint = "taps"
+
+    async def create(self, tap: Tap) -> int:
+        """Crea un nuevo registro de tap"""
+        try:
+            response = await self.api_client.post(f"/{self.endpoint}", tap.to_dict())
+            return response.get('id')
+        except Exception as e:
+            print(f"Error al crear tap: {e}")
+            return -1
+
+    async def read(self, tap_id: int) -> Optional[Tap]:
+        """Obtiene un tap por ID"""
+        try:
+            return Tap.from_dict(await self.api_client.get(f"/{self.endpoint}/{tap_id}"))
+        except Exception as e:
+            print(f"Error al leer tap {tap_id}: {e}")
+            return None
+
+    async def delete(self, tap_id: int) -> bool:
+        """Elimina un tap"""
+        try:
+            response = await self.api_client.delete(f"/{self.endpoint}/{tap_id}")
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al eliminar tap {tap_id}: {e}")
+            return False
+
+    async def _search(self, params: Dict[str, Any], what: str) -> List[Tap]:
+        try:
+            response = await self.api_client.get(f"/{self.endpoint}/search", params)
+            return [Tap.from_dict(t) for t in response.get('taps', [])]
+        except Exception as e:
+            print(f"Error al buscar taps por {what}: {e}")
+            return []
+
+    async def find_all(self) -> List[Tap]:
+        """Obtiene todos los taps"""
+        try:
+            response = await self.api_client.get(f"/{self.endpoint}")
+            return [Tap.from_dict(t) for t in response.get('taps', [])]
+        except Exception as e:
+            print(f"Error al obtener todos los taps: {e}")
+            return []
+
+    async def find_by_child(self, child_id: int) -> List[Tap]:
+        """Busca taps por niño"""
+        return await self._search({'child_id': child_id}, f"niño {child_id}")
+
+    async def find_by_children(self, child_ids: Iterable[int]) -> Dict[int, List[Tap]]:
+        """Historial de varios niños a la vez: {child_id: [Tap, ...]}"""
+        child_ids = list(child_ids)
+        histories = await asyncio.gather(*(self.find_by_child(c) for c in child_ids))
+        return dict(zip(child_ids, histories))
+
+    async def find_by_user(self, user_id: int) -> List[Tap]:
+        """Busca taps por usuario"""
+        return await self._search({'user_id': user_id}, f"usuario {user_id}")
+
+    async def find_by_status(self, status_id: int) -> List[Tap]:
+        """Busca taps por estado"""
+        return await self._search({'status_id': status_id}, f"estado {status_id}")
+
+    async def find_by_date_range(self, start_date: str, end_date: str) -> List[Tap]:
+        """Busca taps por rango de fechas"""
+        return await self._search({'start_date': start_date, 'end_date': end_date}, "rango de fechas")
+
+    async def close_tap(self, tap_id: int, end_time: str) -> bool:
+        """Cierra un tap estableciendo la hora de finalización"""
+        try:
+            response = await self.api_client.put(f"/{self.endpoint}/{tap_id}/close", {'end_time': end_time})
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al cerrar tap {tap_id}: {e}")
+            return False
+
+
+# =============================================
+# SERVICIO ASÍNCRONO
+# =============================================
+
+class AsyncSleepMonitoringService:
+    """Versión asyncio de SleepMonitoringService para paneles con muchos niños"""
+
+    def __init__(self, api_base_url: str, api_key: Optional[str] = None, concurrency: int = 20):
+        self.api_client = AsyncAPIClient(api_base_url, api_key, concurrency=concurrency)
+        self.user_dao = AsyncUserDAO(self.api_client)
+        self.child_dao = AsyncChildDAO(self.api_client)
+        self.tap_dao = AsyncTapDAO(self.api_client)
+
+    async def __aenter__(self) -> 'AsyncSleepMonitoringService':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.api_client.close()
+
+    async def register_sleep_event(self, child_id: int, user_id: int, status_id: int) -> int:
+        """Registra un nuevo evento de sueño/vigilia"""
+        tap = Tap(id=0, child_id=child_id, status_id=status_id, user_id=user_id,
+                  init=datetime.now().isoformat())
+        return await self.tap_dao.create(tap)
+
+    async def close_sleep_event(self, tap_id: int) -> bool:
+        """Cierra un evento de sueño/vigilia"""
+        return await self.tap_dao.close_tap(tap_id, datetime.now().isoformat())
+
+    async def get_child_sleep_history(self, child_id: int) -> List[Tap]:
+        """Obtiene el historial de sueño de un niño"""
+        return await self.tap_dao.find_by_child(child_id)
+
+    async def get_children_sleep_history(self, child_ids: Iterable[int]) -> Dict[int, List[Tap]]:
+        """Historial de muchos niños (p. ej. el panel del servicio médico) en paralelo"""
+        return await self.tap_dao.find_by_children(child_ids)
@@ -0,0 +1,83 @@
+# Benchmark: historial de N niños con SleepMonitoringService (secuencial, requests)
+# contra AsyncSleepMonitoringService (asyncio, en paralelo con límite de concurrencia).
+# Arranca prototip2/server/asyncServer.py en otro proceso con una latencia añadida
+# por petición para simular la red móvil. (El servidor de desarrollo de Flask cierra
+# la conexión después de cada respuesta: no sirve para medir la reutilización.)
+# Uso: python benchAsyncClient.py [niños] [latencia ms] [concurrencia]   (por defecto 200 20 20)
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from serverMetods import SleepMonitoringService
+from asyncMetods import AsyncSleepMonitoringService
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototip2', 'server')
+SERVER = ("import asyncio, asyncServer\n"
+          "dispatch = asyncServer.dispatch\n"
+          "async def slow(req):\n"
+          "    await asyncio.sleep({latency})\n"
+          "    return await dispatch(req)\n"
+          "asyncServer.dispatch = slow\n"
+          "asyncio.run(asyncServer.serve('127.0.0.1', {port}))")
+
+
+def start_server(port, latency):
+    proc = subprocess.Popen([sys.executable, '-c', SERVER.format(port=port, latency=latency)],
+                            cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("El servidor no arranca")
+
+
+def load_taps(service, children, per_child=10):
+    taps = [{'client_id': f"bench-{c}-{k}", 'child_id': c, 'status_id': 1 + k % 3, 'user_id': 1,
+             'init': f"2025-01-{1 + k:02d}T08:00:00"} for c in range(1, children + 1) for k in range(per_child)]
+    for start in range(0, len(taps), 5000):
+        service.api_client.post("/taps/bulk", {'taps': taps[start:start + 5000]}, idempotent=True)
+
+
+async def run_async(base_url, child_ids, concurrency):
+    async with AsyncSleepMonitoringService(base_url, concurrency=concurrency) as service:
+        start = time.perf_counter()
+        histories = await service.get_children_sleep_history(child_ids)
+        return time.perf_counter() - start, histories, service.api_client.opened
+
+
+def bench(children, latency_ms, concurrency, port=5111):
+    proc = start_server(port, latency_ms / 1000)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        service = SleepMonitoringService(base_url)
+        load_taps(service, children)
+        child_ids = list(range(1, children + 1))
+
+        start = time.perf_counter()
+        expected = {c: service.get_child_sleep_history(c) for c in child_ids}
+        sync_t = time.perf_counter() - start
+
+        async_t, histories, opened = asyncio.run(run_async(base_url, child_ids, concurrency))
+        for c in child_ids:
+            assert [t.id for t in histories[c]] == [t.id for t in expected[c]]
+
+        print(f"{children} niños, latencia {latency_ms} ms por petición")
+        print(f"  secuencial (requests)           {sync_t * 1000:9.0f} ms")
+        print(f"  asyncio (concurrencia {concurrency:>3})      {async_t * 1000:9.0f} ms"
+              f"  x{sync_t / async_t:.1f}   ({opened} conexiones abiertas)")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    children = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    bench(children, latency, concurrency)
@@ -0,0 +1,132 @@
+# Prueba del cliente asyncio (asyncMetods) contra prototip2/server/asyncServer.py
+# arrancado en un thread de este proceso, con datos generados (datasetServer):
+#  - el reparto en paralelo (find_by_children, read, find_by_user) devuelve
+#    lo mismo que las llamadas secuenciales de serverMetods
+#  - nunca hay más de concurrency peticiones a la vez en el servidor y se abren
+#    como mucho concurrency conexiones (keep-alive)
+#  - una conexión del pool que el servidor ya ha cerrado se repite con otra
+#  - errores: 404 -> APIException (cliente) o None (DAO)
+# Uso: python checkAsyncClient.py
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototip2', 'server')
+sys.path.append(SERVER_DIR)
+import datasetServer
+
+data = datasetServer.generate(200, 2, seed=16)
+os.environ['TAPATAPP_SNAPSHOT'] = os.path.join(tempfile.mkdtemp(), "asyncclient.snap.gz")
+datasetServer.save(data, os.environ['TAPATAPP_SNAPSHOT'])
+import asyncServer
+
+from serverMetods import APIClient, APIException, TapDAO
+from asyncMetods import AsyncAPIClient, AsyncSleepMonitoringService, AsyncTapDAO
+
+LATENCY = 0.02
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+class InFlight:
+    # Peticiones a la vez dentro del servidor (con una latencia añadida)
+    def __init__(self, dispatch):
+        self.dispatch = dispatch
+        self.now = 0
+        self.peak = 0
+
+    async def __call__(self, req):
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        try:
+            await asyncio.sleep(LATENCY)
+            return await self.dispatch(req)
+        finally:
+            self.now -= 1
+
+
+def start_server():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    ready = threading.Event()
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(asyncServer.serve('127.0.0.1', port, ready),),
+                     daemon=True).start()
+    check("asyncServer arranca", ready.wait(30))
+    return f"http://127.0.0.1:{port}"
+
+
+def ids(taps):
+    return [t.id for t in taps]
+
+
+async def fan_out(base_url, child_ids, tap_ids, user_ids, concurrency):
+    async with AsyncSleepMonitoringService(base_url, concurrency=concurrency) as service:
+        histories = await service.get_children_sleep_history(child_ids)
+        taps = await asyncio.gather(*(service.tap_dao.read(t) for t in tap_ids))
+        children = await asyncio.gather(*(service.child_dao.find_by_user(u) for u in user_ids))
+        return histories, taps, children, service.api_client.opened
+
+
+async def stale_connection(base_url):
+    async with AsyncAPIClient(base_url, concurrency=2) as api:
+        first = await api.get('/children')
+        await asyncio.sleep(asyncServer.IDLE_TIMEOUT + 0.5)
+        # El servidor ya ha cerrado la conexión que está en el pool
+        again = await api.get('/children')
+        return first == again, api.opened
+
+
+async def errors(base_url):
+    async with AsyncAPIClient(base_url) as api:
+        try:
+            await api.get('/taps/999999')
+            failed = None
+        except APIException as e:
+            failed = e
+        return failed, await AsyncTapDAO(api).read(999999)
+
+
+def main():
+    counter = asyncServer.dispatch = InFlight(asyncServer.dispatch)
+    base_url = start_server()
+    api = APIClient(base_url)
+    child_ids = sorted({t.child_id for t in data.taps})[:60]
+    tap_ids = [t.id for t in data.taps[:40]]
+    user_ids = sorted({r['user_id'] for r in data.relations})[:20]
+
+    print(f"reparto en paralelo == secuencial ({len(child_ids)} niños)")
+    taps = TapDAO(api)
+    expected = {c: ids(taps.find_by_child(c)) for c in child_ids}
+    for concurrency in (1, 5, 20):
+        counter.peak = 0
+        histories, read, byUser, opened = asyncio.run(fan_out(base_url, child_ids, tap_ids, user_ids, concurrency))
+        check(f"concurrency={concurrency}: find_by_children", {c: ids(h) for c, h in histories.items()} == expected)
+        check("  read de varios taps", [t.to_dict() for t in read] == [taps.read(t).to_dict() for t in tap_ids])
+        check("  find_by_user de varios usuarios",
+              [[c.to_dict() for c in found] for found in byUser] ==
+              [api.get('/children', {'user_id': u})['children'] for u in user_ids])
+        check(f"  como mucho {concurrency} a la vez en el servidor (máximo {counter.peak})",
+              counter.peak <= concurrency and (concurrency == 1 or counter.peak > 1))
+        check(f"  como mucho {concurrency} conexiones ({opened})", opened <= concurrency)
+
+    print("keep-alive")
+    asyncServer.IDLE_TIMEOUT = 0.5
+    same, opened = asyncio.run(stale_connection(base_url))
+    check("una conexión cerrada por el servidor se repite con otra", same and opened == 2)
+
+    print("errores")
+    failed, missing = asyncio.run(errors(base_url))
+    check("404: APIException con el status", failed is not None and failed.status_code == 404)
+    check("AsyncTapDAO.read de un id que no existe: None", missing is None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Prueba de CachingAPIClient (serverMetods) contra prototip2/server/server.py
+# (Flask en un thread de este proceso):
+#  - dentro del TTL un GET no va al servidor y devuelve el mismo cuerpo
+#  - al caducar vuelve a pedirlo; con TTL 0 nunca se guarda
+#  - como mucho max_entries respuestas: sale la menos usada (LRU)
+#  - un POST/PUT/DELETE correcto borra su colección y las dependientes
+#    (taps -> treatment), también dentro de un /batch; uno fallido no borra nada
+#  - contadores de stats(): hits, misses, evictions, invalidations
+# Uso: python checkCachingClient.py
+import logging
+import os
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototip2', 'server')
+sys.path.append(SERVER_DIR)
+import server
+
+from serverMetods import CachingAPIClient
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+class CountingTransport:
+    # Cuenta las peticiones que llegan a salir hacia el servidor
+    def __init__(self, transport):
+        self.transport = transport
+        self.sent = 0
+
+    def request(self, *args, **kwargs):
+        self.sent += 1
+        return self.transport.request(*args, **kwargs)
+
+
+def client(base_url, **kwargs):
+    api = CachingAPIClient(base_url, **kwargs)
+    api.transport = CountingTransport(api.transport)
+    return api
+
+
+def main():
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.createApp(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_port}"
+    try:
+        print("TTL")
+        api = client(base_url, ttls={'taps': 0.3})
+        body = api.get('/children', {'user_id': 1})
+        check("dentro del TTL: mismo cuerpo sin ir al servidor",
+              api.get('/children', {'user_id': 1}) is body and api.transport.sent == 1)
+        check("otros parámetros: otra entrada", api.get('/children', {'user_id': 2}) != body
+              and api.transport.sent == 2)
+        api.get('/taps')
+        time.sleep(0.4)
+        sent = api.transport.sent
+        check("caducado: vuelve a pedirlo", api.get('/taps') and api.transport.sent == sent + 1)
+        api.get('/getusers')
+        api.get('/getusers')
+        check("colección sin TTL (getusers): siempre al servidor",
+              api.transport.sent == sent + 3 and '/getusers?' not in api.cache)
+
+        print("LRU")
+        api = client(base_url, max_entries=3)
+        for path in ('/statuses', '/roles', '/treatments', '/statuses', '/children'):
+            api.get(path)
+        check("sale la menos usada (roles)", list(api.cache) == ['/treatments?', '/statuses?', '/children?']
+              and api.evictions == 1)
+        sent = api.transport.sent
+        api.get('/statuses')
+        api.get('/roles')
+        check("statuses sigue, roles se vuelve a pedir", api.transport.sent == sent + 1 and len(api.cache) == 3)
+
+        print("invalidación")
+        api = client(base_url)
+        api.get('/taps')
+        api.get('/treatment/1', {'date': '2024-12-18'})
+        api.get('/children')
+        created = api.post('/taps', {"child_id": 1, "status_id": 1, "user_id": 1, "init": "2024-12-19T08:00:00"})
+        check("POST /taps borra taps y treatment, no children", list(api.cache) == ['/children?'])
+        taps = api.get('/taps')
+        check("el GET siguiente ve el tap nuevo", created['id'] in [t['id'] for t in taps['taps']])
+        api.put(f"/taps/{created['id']}/close", {"end_time": "2024-12-19T09:00:00"})
+        check("PUT borra taps", '/taps?' not in api.cache)
+        check("  y se ve el cambio", api.get(f"/taps/{created['id']}")['end'] == "2024-12-19T09:00:00")
+        api.delete(f"/taps/{created['id']}")
+        check("DELETE borra taps", not any(key.startswith('/taps') for key in api.cache))
+        api.get('/taps')
+        with api.batch() as calls:
+            calls.post('/taps', {"child_id": 2, "status_id": 1, "user_id": 2, "init": "2024-12-19T10:00:00"})
+        check("un POST dentro de /batch borra taps", '/taps?' not in api.cache)
+        api.get('/taps')
+        try:
+            api.post('/taps', {"child_id": 2})
+            failed = False
+        except requests.exceptions.HTTPError:
+            failed = True
+        check("un POST que falla (400) no borra nada", failed and '/taps?' in api.cache)
+        api.invalidate('/users/1')
+        check("invalidate(users) borra children (dependiente)", '/children?' not in api.cache)
+
+        print("stats()")
+        api = client(base_url)
+        for _ in range(3):
+            api.get('/statuses')
+        api.get('/roles')
+        stats = api.stats()
+        check("hits, misses y hit_rate", (stats['hits'], stats['misses'], stats['hit_rate']) == (2, 2, 0.5))
+        check("entries", stats['entries'] == 2 and stats['evictions'] == 0 and stats['invalidations'] == 0)
+        api.clear()
+        check("clear()", api.stats()['entries'] == 0)
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,33 @@
 import requests
 import json
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
 from abc import ABC, abstractmethod
 
+# Transport HTTP compartido con el cliente de prototip2 (pool, reintentos, circuit breaker)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'prototip2', 'client'))
+from transportClient import HttpTransport, defaultTransport
+
 # =============================================
 # CLASES DE MODELO (ENTIDADES)
 # =============================================
 
 class User:
-    def __init__(self, id: int, username: str, password: str, email: str, idrole: int):
+    def __init__(self, id: int, username: str, password: str, email: str, idrole: int,
+                 token: Optional[str] = None):
         self.id = id
         self.username = username
         self.password = password
         self.email = email
         self.idrole = idrole
+        self.token = token
     
     def to_dict(self) -> Dict[str, Any]:
         """Convierte el objeto User a diccionario para JSON"""
@@ -23,7 +36,8 @@ class User:
             'username': self.username,
             'password': self.password,
             'email': self.email,
-            'idrole': self.idrole
+            'idrole': self.idrole,
+            'token': self.token
         }
     
     @classmethod
@@ -34,7 +48,8 @@ class User:
             username=data.get('username'),
             password=data.get('password'),
             email=data.get('email'),
-            idrole=data.get('idrole')
+            idrole=data.get('idrole'),
+            token=data.get('token')
         )
     
     def __str__(self):
@@ -168,20 +183,44 @@ class UserChildRelation:
 class APIClient:
     """Cliente HTTP para comunicación con el servidor"""
     
-    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: int = 30):
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: int = 30,
+                 etag_cache_size: int = 256, transport: Optional[HttpTransport] = None):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.timeout = timeout
-        self.session = requests.Session()
+        # Por defecto todos los clientes comparten el mismo transport (y sus conexiones)
+        self.transport = transport or defaultTransport()
+        # url -> (ETag, cuerpo ya parseado) de las últimas respuestas GET
+        self.etag_cache: Dict[str, tuple] = {}
+        self.etag_cache_size = etag_cache_size
         
-        # Configurar headers comunes
-        self.session.headers.update({
+        # Configurar headers comunes (se envían en cada petición: la sesión es compartida)
+        self.headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json'
-        })
+        }
         
         if api_key:
-            self.session.headers.update({'Authorization': f'Bearer {api_key}'})
+            self.headers['Authorization'] = f'Bearer {api_key}'
+    
+    def set_token(self, token: Optional[str]) -> None:
+        """Token de sesión (de /login) que se envía en todas las peticiones siguientes"""
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        else:
+            self.headers.pop('Authorization', None)
+    
+    @classmethod
+    def from_config(cls, config: 'Config') -> 'APIClient':
+        """Cliente con un transport propio según la configuración (timeout, reintentos)"""
+        transport = HttpTransport(retries=config.retry_attempts, timeout=config.timeout)
+        return cls(config.api_base_url, config.api_key, config.timeout, transport=transport)
+    
+    def _request(self, method: str, endpoint: str, headers: Optional[Dict] = None,
+                 **kwargs) -> requests.Response:
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        return self.transport.request(method, url, headers={**self.headers, **(headers or {})},
+                                      timeout=self.timeout, **kwargs)
     
     def _handle_response(self, response: requests.Response) -> Dict[str, Any]:
         """Maneja la respuesta HTTP y convierte a JSON"""
@@ -197,28 +236,245 @@ class APIClient:
             raise
     
     def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Realiza una petición GET"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        response = self.session.get(url, params=params, timeout=self.timeout)
-        return self._handle_response(response)
-    
-    def post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Realiza una petición POST"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        response = self.session.post(url, json=data, timeout=self.timeout)
+        """Realiza una petición GET (condicional si ya tenemos la ETag de esa url)"""
+        key = f"{self.base_url}/{endpoint.lstrip('/')}?{urlencode(sorted((params or {}).items()))}"
+        cached = self.etag_cache.pop(key, None)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        response = self._request('GET', endpoint, headers, params=params)
+        if response.status_code == 304 and cached:
+            # No ha cambiado: mismo cuerpo, sin volver a parsear
+            self.etag_cache[key] = cached
+            return cached[1]
+        body = self._handle_response(response)
+        etag = response.headers.get('ETag')
+        if etag:
+            if len(self.etag_cache) >= self.etag_cache_size:
+                self.etag_cache.pop(next(iter(self.etag_cache)))
+            self.etag_cache[key] = (etag, body)
+        return body
+    
+    def stream(self, endpoint: str, params: Optional[Dict] = None, model=None) -> Iterator[Any]:
+        """GET en modo NDJSON: devuelve los registros uno a uno (como model si se indica)"""
+        response = self._request('GET', endpoint, {'Accept': 'application/x-ndjson'},
+                                 params=params, stream=True)
+        with response:
+            response.raise_for_status()
+            if not response.headers.get('Content-Type', '').startswith('application/x-ndjson'):
+                # El servidor no soporta streaming: lista JSON normal
+                records = _records(response.json())
+            else:
+                records = (json.loads(line) for line in response.iter_lines() if line)
+            for record in records:
+                yield model.from_dict(record) if model else record
+    
+    def post(self, endpoint: str, data: Dict[str, Any], idempotent: bool = False) -> Dict[str, Any]:
+        """Realiza una petición POST (solo se reintenta si es idempotente)"""
+        response = self._request('POST', endpoint, json=data, idempotent=idempotent)
         return self._handle_response(response)
     
     def put(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Realiza una petición PUT"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        response = self.session.put(url, json=data, timeout=self.timeout)
+        response = self._request('PUT', endpoint, json=data)
         return self._handle_response(response)
     
     def delete(self, endpoint: str) -> Dict[str, Any]:
         """Realiza una petición DELETE"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        response = self.session.delete(url, timeout=self.timeout)
+        response = self._request('DELETE', endpoint)
         return self._handle_response(response)
+    
+    @contextmanager
+    def batch(self) -> Iterator['Batch']:
+        """Agrupa varias llamadas en una sola petición POST /batch al salir del bloque
+        
+        with client.batch() as batch:
+            children = batch.get('/children', {'user_id': 1})
+            treatment = batch.get('/treatment/1', {'date': '2024-12-18'})
+        children.result()['children']
+        """
+        pending = Batch()
+        yield pending
+        if pending.calls:
+            pending.send(self)
+
+
+class BatchCall:
+    """Resultado pendiente de una llamada dentro de APIClient.batch()"""
+    
+    def __init__(self, method: str, path: str, body: Optional[Dict[str, Any]] = None):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.status: Optional[int] = None
+        self.data: Any = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {'method': self.method, 'path': self.path, 'body': self.body}
+    
+    def result(self) -> Any:
+        """Cuerpo de la respuesta (APIException si la llamada ha fallado)"""
+        if self.status is None:
+            raise APIException(f"La llamada {self.method} {self.path} aún no se ha enviado")
+        if self.status >= 400:
+            raise APIException(f"{self.method} {self.path}", self.status, self.data)
+        return self.data
+
+
+class Batch:
+    """Cola de llamadas que se envían juntas a /batch"""
+    
+    max_size = 50
+    
+    def __init__(self):
+        self.calls: List[BatchCall] = []
+    
+    def _add(self, method: str, endpoint: str, body: Optional[Dict[str, Any]] = None,
+             params: Optional[Dict] = None) -> BatchCall:
+        path = f"/{endpoint.lstrip('/')}"
+        if params:
+            path += f"?{urlencode(params)}"
+        call = BatchCall(method, path, body)
+        self.calls.append(call)
+        return call
+    
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> BatchCall:
+        return self._add('GET', endpoint, params=params)
+    
+    def post(self, endpoint: str, data: Dict[str, Any]) -> BatchCall:
+        return self._add('POST', endpoint, data)
+    
+    def put(self, endpoint: str, data: Dict[str, Any]) -> BatchCall:
+        return self._add('PUT', endpoint, data)
+    
+    def delete(self, endpoint: str) -> BatchCall:
+        return self._add('DELETE', endpoint)
+    
+    def send(self, api_client: APIClient) -> None:
+        """Envía las llamadas en grupos de max_size y reparte las respuestas"""
+        for start in range(0, len(self.calls), self.max_size):
+            chunk = self.calls[start:start + self.max_size]
+            response = api_client.post("/batch", {'requests': [c.to_dict() for c in chunk]},
+                                       idempotent=all(c.method == 'GET' for c in chunk))
+            for call, result in zip(chunk, response.get('data', [])):
+                call.status = result.get('status')
+                call.data = result.get('body')
+
+
+class CachingAPIClient(APIClient):
+    """APIClient con caché de lectura: TTL por endpoint, tamaño máximo (LRU) e invalidación
+    
+    Un GET dentro de su TTL se responde desde memoria, sin ir al servidor. Un
+    POST/PUT/DELETE correcto borra de la caché su colección (y las que dependen de ella).
+    """
+    
+    # Segundos que vale una respuesta según el primer tramo de la ruta (0 = no se guarda)
+    DEFAULT_TTLS = {
+        'statuses': 3600,
+        'roles': 3600,
+        'treatments': 3600,
+        'children': 60,
+        'users': 60,
+        'taps': 10,
+        'treatment': 10,
+    }
+    # Colecciones que cambian cuando se modifica otra
+    DEPENDENCIES = {
+        'taps': ('treatment',),
+        'users': ('children',),
+    }
+    
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: int = 30,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 0,
+                 max_entries: int = 512, **kwargs):
+        super().__init__(base_url, api_key, timeout, **kwargs)
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        # clave -> (caduca, colección, cuerpo), de la menos a la más usada
+        self.cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _collection(endpoint: str) -> str:
+        return endpoint.lstrip('/').split('/', 1)[0]
+    
+    def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """GET desde la caché si la respuesta no ha caducado"""
+        collection = self._collection(endpoint)
+        ttl = self.ttls.get(collection, self.default_ttl)
+        if ttl <= 0:
+            return super().get(endpoint, params)
+        key = f"/{endpoint.lstrip('/')}?{urlencode(sorted((params or {}).items()))}"
+        now = time.monotonic()
+        entry = self.cache.get(key)
+        if entry and entry[0] > now:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        body = super().get(endpoint, params)
+        self.cache[key] = (now + ttl, collection, body)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+        return body
+    
+    def invalidate(self, endpoint: str) -> None:
+        """Borra las respuestas guardadas de la colección del endpoint y sus dependientes"""
+        collection = self._collection(endpoint)
+        stale = {collection, *self.DEPENDENCIES.get(collection, ())}
+        for key in [k for k, entry in self.cache.items() if entry[1] in stale]:
+            del self.cache[key]
+            self.invalidations += 1
+    
+    def clear(self) -> None:
+        self.cache.clear()
+    
+    def post(self, endpoint: str, data: Dict[str, Any], idempotent: bool = False) -> Dict[str, Any]:
+        response = super().post(endpoint, data, idempotent)
+        if self._collection(endpoint) == 'batch':
+            # Un batch puede tocar varias colecciones
+            for call in data.get('requests', []):
+                if call.get('method', 'GET').upper() != 'GET':
+                    self.invalidate(call['path'])
+        else:
+            self.invalidate(endpoint)
+        return response
+    
+    def put(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        response = super().put(endpoint, data)
+        self.invalidate(endpoint)
+        return response
+    
+    def delete(self, endpoint: str) -> Dict[str, Any]:
+        response = super().delete(endpoint)
+        self.invalidate(endpoint)
+        return response
+    
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la caché"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.cache),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+def _records(body: Any) -> List[Dict[str, Any]]:
+    """Lista de registros de una respuesta JSON ({'users': [...]}, {'data': [...]} o lista)"""
+    if isinstance(body, list):
+        return body
+    for key in ('users', 'children', 'taps', 'statuses', 'roles', 'treatments', 'data'):
+        if isinstance(body.get(key), list):
+            return body[key]
+    return []
 
 
 # =============================================
@@ -390,29 +646,57 @@ class UserDAO(IUserDAO):
             return False
     
     def find_all(self) -> List[User]:
-        """Obtiene todos los usuarios"""
+        """Obtiene todos los usuarios (página a página)"""
         try:
-            response = self.api_client.get(f"/{self.endpoint}")
-            users_data = response.get('users', [])
-            return [User.from_dict(user_data) for user_data in users_data]
+            return list(self.iter_all())
         except Exception as e:
             print(f"Error al obtener todos los usuarios: {e}")
             return []
     
+    def stream_all(self) -> Iterator[User]:
+        """Todos los usuarios en streaming (NDJSON), sin cargar la lista entera"""
+        return self.api_client.stream(f"/{self.endpoint}", model=User)
+    
+    def iter_all(self, page_size: int = 100) -> Iterator[User]:
+        """Recorre todos los usuarios pidiendo páginas de page_size con el cursor 'next'"""
+        params = {'limit': page_size}
+        while True:
+            response = self.api_client.get(f"/{self.endpoint}", params)
+            for user_data in response.get('users', []):
+                yield User.from_dict(user_data)
+            next_cursor = response.get('next')
+            if not next_cursor:
+                return
+            params = {'limit': page_size, 'after': next_cursor}
+    
     def authenticate(self, username: str, password: str) -> Optional[User]:
-        """Autentica un usuario con username y password"""
+        """Autentica con /login y guarda el token de sesión en el cliente"""
         try:
-            response = self.api_client.post(f"/{self.endpoint}/authenticate", {
+            # No es reintenta: cada /login crea una sessió nova al servidor
+            response = self.api_client.post("/login", {
                 'username': username,
                 'password': password
             })
-            if response.get('authenticated'):
-                return User.from_dict(response.get('user'))
-            return None
+            if response.get('coderesponse') != '1':
+                return None
+            user = User.from_dict(response.get('data'))
+            self.api_client.set_token(user.token)
+            return user
         except Exception as e:
             print(f"Error en autenticación: {e}")
             return None
     
+    def logout(self) -> bool:
+        """Cierra la sesión en el servidor y deja de enviar el token"""
+        try:
+            response = self.api_client.post("/logout", {})
+            return response.get('success', False)
+        except Exception as e:
+            print(f"Error al cerrar sesión: {e}")
+            return False
+        finally:
+            self.api_client.set_token(None)
+    
     def find_by_username(self, username: str) -> Optional[User]:
         """Busca usuario por nombre de usuario"""
         try:
@@ -495,6 +779,10 @@ class ChildDAO(IChildDAO):
             print(f"Error al obtener todos los niños: {e}")
             return []
     
+    def stream_all(self) -> Iterator[Child]:
+        """Todos los niños en streaming (NDJSON)"""
+        return self.api_client.stream(f"/{self.endpoint}", model=Child)
+    
     def find_by_name(self, name: str) -> List[Child]:
         """Busca niños por nombre"""
         try:
@@ -584,6 +872,20 @@ class TapDAO(ITapDAO):
             print(f"Error al obtener todos los taps: {e}")
             return []
     
+    def stream_all(self) -> Iterator[Tap]:
+        """Todos los taps en streaming (NDJSON)"""
+        return self.api_client.stream(f"/{self.endpoint}", model=Tap)
+    
+    def stream_by_child(self, child_id: int, start_date: Optional[str] = None,
+                        end_date: Optional[str] = None) -> Iterator[Tap]:
+        """Historial de un niño en streaming (NDJSON)"""
+        params = {'child_id': child_id}
+        if start_date:
+            params['start_date'] = start_date
+        if end_date:
+            params['end_date'] = end_date
+        return self.api_client.stream(f"/{self.endpoint}/search", params, model=Tap)
+    
     def find_by_child(self, child_id: int) -> List[Tap]:
         """Busca taps por niño"""
         try:
@@ -654,6 +956,146 @@ class TapDAO(ITapDAO):
             return {}
 
 
+class ReferenceDAO(BaseDAO):
+    """Datos de referencia (estados, roles, tratamientos): casi nunca cambian"""
+    
+    def _list(self, endpoint: str, model) -> List[Any]:
+        try:
+            return [model.from_dict(item) for item in _records(self.api_client.get(endpoint))]
+        except Exception as e:
+            print(f"Error al obtener {endpoint}: {e}")
+            return []
+    
+    def get_statuses(self) -> List[Status]:
+        return self._list("/statuses", Status)
+    
+    def get_roles(self) -> List[Role]:
+        return self._list("/roles", Role)
+    
+    def get_treatments(self) -> List[Treatment]:
+        return self._list("/treatments", Treatment)
+    
+    def get_status(self, status_id: int) -> Optional[Status]:
+        return next((s for s in self.get_statuses() if s.id == status_id), None)
+    
+    def get_role(self, role_id: int) -> Optional[Role]:
+        return next((r for r in self.get_roles() if r.id == role_id), None)
+    
+    def get_treatment(self, treatment_id: int) -> Optional[Treatment]:
+        return next((t for t in self.get_treatments() if t.id == treatment_id), None)
+
+
+class ChangeFeedDAO(BaseDAO):
+    """Cambios del servidor desde la última sincronización (/changes)"""
+    
+    def pull(self, since: int, limit: int = 500) -> Dict[str, Any]:
+        """Todos los cambios posteriores a since, página a página
+        
+        Devuelve {'changes': [...], 'last': N, 'resync': bool}. Con resync=True el
+        servidor ya no tiene los cambios pedidos: hay que recargar todos los datos
+        y la próxima vez pedir desde 'last'.
+        """
+        changes: List[Dict[str, Any]] = []
+        while True:
+            response = self.api_client.get("/changes", {'since': since, 'limit': limit})
+            if response.get('resync'):
+                return {'changes': [], 'last': response['last'], 'resync': True}
+            changes += response.get('changes', [])
+            since = response['next']
+            if not response.get('more'):
+                return {'changes': changes, 'last': since, 'resync': False}
+
+
+# =============================================
+# COLA DE SINCRONIZACIÓN (MODO SIN CONEXIÓN)
+# =============================================
+
+class TapSyncQueue:
+    """Taps guardados en local mientras no hay conexión; se suben por lotes a /taps/bulk
+    
+    Cada tap lleva un client_id (uuid) generado aquí: si un lote se envía dos veces
+    el servidor no lo duplica. La cola se guarda en un fichero JSON después de cada
+    lote confirmado, así una subida cortada continúa donde se quedó.
+    """
+    
+    def __init__(self, api_client: APIClient, path: Optional[str] = None, batch_size: int = 500):
+        self.api_client = api_client
+        self.path = path
+        self.batch_size = batch_size
+        self.pending: List[Dict[str, Any]] = []
+        # client_id -> id asignado por el servidor (de los taps ya subidos)
+        self.synced: Dict[str, int] = {}
+        # Taps que el servidor no acepta (datos incorrectos): fuera de la cola, con el error
+        self.rejected: List[Dict[str, Any]] = []
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.pending = json.load(f)
+        if path and os.path.exists(f"{path}.rejected"):
+            with open(f"{path}.rejected", 'r') as f:
+                self.rejected = json.load(f)
+    
+    def _write(self, path: str, records: List[Dict[str, Any]]) -> None:
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(records, f)
+        os.replace(tmp, path)
+    
+    def _save(self) -> None:
+        if self.path:
+            self._write(self.path, self.pending)
+            if self.rejected:
+                self._write(f"{self.path}.rejected", self.rejected)
+    
+    def enqueue(self, tap: Tap) -> str:
+        """Añade un tap a la cola y devuelve su client_id"""
+        record = tap.to_dict()
+        record.pop('id', None)
+        record['client_id'] = uuid.uuid4().hex
+        self.pending.append(record)
+        self._save()
+        return record['client_id']
+    
+    def __len__(self) -> int:
+        return len(self.pending)
+    
+    def flush(self) -> int:
+        """Sube la cola por lotes; si falla, lo que queda se reintenta en la próxima llamada
+        
+        Devuelve el número de taps aceptados por el servidor en esta llamada (nuevos o
+        que ya tenía). Los rechazados pasan a self.rejected con el error; los que el
+        servidor no ha confirmado ni rechazado siguen en la cola.
+        """
+        confirmed = 0
+        queue = self.pending
+        kept: List[Dict[str, Any]] = []
+        sent = 0
+        while sent < len(queue):
+            batch = queue[sent:sent + self.batch_size]
+            try:
+                # Reintentar es seguro: el servidor no duplica un client_id
+                response = self.api_client.post("/taps/bulk", {'taps': batch}, idempotent=True)
+            except Exception as e:
+                print(f"Error al sincronizar taps ({len(queue) - sent + len(kept)} pendientes): {e}")
+                break
+            accepted = {item['client_id']: item['id'] for item in response.get('ids', [])}
+            errors = {error['index']: error['error'] for error in response.get('errors', [])}
+            for index, record in enumerate(batch):
+                if record['client_id'] in accepted:
+                    self.synced[record['client_id']] = accepted[record['client_id']]
+                    confirmed += 1
+                elif index in errors:
+                    # Datos incorrectos: reenviarlos no serviría de nada
+                    self.rejected.append({**record, 'error': errors[index]})
+                    print(f"Tap rechazado por el servidor: {errors[index]}")
+                else:
+                    # Ni confirmado ni rechazado: se queda en la cola para la próxima llamada
+                    kept.append(record)
+            sent += len(batch)
+            self.pending = kept + queue[sent:]
+            self._save()
+        return confirmed
+
+
 # =============================================
 # FACHADA/SERVICIO PARA GESTIÓN COMPLETA
 # =============================================
@@ -661,11 +1103,16 @@ class TapDAO(ITapDAO):
 class SleepMonitoringService:
     """Fachada que coordina todas las operaciones del sistema"""
     
-    def __init__(self, api_base_url: str, api_key: Optional[str] = None):
-        self.api_client = APIClient(api_base_url, api_key)
+    def __init__(self, api_base_url: str, api_key: Optional[str] = None,
+                 sync_file: Optional[str] = None, cache_ttls: Optional[Dict[str, float]] = None):
+        # Con caché: las consultas repetidas (estados, roles, niños...) no salen a la red
+        self.api_client = CachingAPIClient(api_base_url, api_key, ttls=cache_ttls)
         self.user_dao = UserDAO(self.api_client)
         self.child_dao = ChildDAO(self.api_client)
         self.tap_dao = TapDAO(self.api_client)
+        self.reference_dao = ReferenceDAO(self.api_client)
+        self.change_feed = ChangeFeedDAO(self.api_client)
+        self.sync_queue = TapSyncQueue(self.api_client, sync_file)
     
     def register_sleep_event(self, child_id: int, user_id: int, status_id: int) -> int:
         """Registra un nuevo evento de sueño/vigilia"""
@@ -689,6 +1136,16 @@ class SleepMonitoringService:
         
         return tap_id
     
+    def queue_sleep_event(self, child_id: int, user_id: int, status_id: int) -> str:
+        """Registra el evento en la cola local (sin conexión); se sube con sync()"""
+        tap = Tap(id=0, child_id=child_id, status_id=status_id, user_id=user_id,
+                  init=datetime.now().isoformat())
+        return self.sync_queue.enqueue(tap)
+    
+    def sync(self) -> int:
+        """Sube los eventos pendientes de la cola local"""
+        return self.sync_queue.flush()
+    
     def close_sleep_event(self, tap_id: int) -> bool:
         """Cierra un evento de sueño/vigilia"""
         end_time = datetime.now().isoformat()
@@ -719,6 +1176,27 @@ class SleepMonitoringService:
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """Autentica un usuario"""
         return self.user_dao.authenticate(username, password)
+    
+    def get_children_overview(self, user_id: int, date: str) -> List[Dict[str, Any]]:
+        """Niños de un tutor con su tratamiento del día y el tap abierto (2 peticiones en total)"""
+        response = self.api_client.get("/children", {'user_id': user_id})
+        children = [Child.from_dict(c) for c in response.get('children', [])]
+        with self.api_client.batch() as batch:
+            treatments = [batch.get(f"/treatment/{child.id}", {'date': date}) for child in children]
+        overview = []
+        for child, treatment in zip(children, treatments):
+            try:
+                summary = treatment.result()
+            except APIException as e:
+                print(f"Error al obtener el tratamiento del niño {child.id}: {e}")
+                summary = {}
+            open_tap = summary.get('open')
+            overview.append({
+                'child': child,
+                'treatment': summary,
+                'open_tap': Tap.from_dict(open_tap) if open_tap else None
+            })
+        return overview
 
 
 # =============================================
@@ -804,6 +1282,8 @@ class Config:
                             config.api_key = value
                         elif key == "API_TIMEOUT":
                             config.timeout = int(value)
+                        elif key == "API_RETRY_ATTEMPTS":
+                            config.retry_attempts = int(value)
         except FileNotFoundError:
             print(f"Archivo {env_file} no encontrado, usando configuración por defecto")
         
@@ -1,9 +1,15 @@
-import requests
 from User import *
-from flask import jsonify
+from transportClient import defaultTransport
 
 class DaoUserClient:
 
+    def __init__(self, base_URL="http://localhost:5000/", transport=None):
+        self.base_URL = base_URL
+        # Transport compartit: connexions keep-alive, reintents i circuit breaker
+        self.transport = transport or defaultTransport()
+        # Usuari amb sessió (el token es reutilitza a les peticions següents)
+        self.user = None
+
     def login(self, user):
         #validacion de parametros
         #TO-DO
@@ -13,22 +19,45 @@ class DaoUserClient:
             "username": user.username,
             "password": user.password
         }
-        response = requests.post(URL_peticion, json=params_POST)
+        # No es reintenta: cada /login crea una sessió nova al servidor
+        response = self.transport.request("POST", URL_peticion, json=params_POST)
         if response.status_code == 200:
             user_data_raw = response.json()
             code_response = user_data_raw['coderesponse']
             if code_response == '1': #
                 user_raw=user_data_raw['data']
-                user = User(user_data_raw['id'], user_data_raw['username']
+                user = User(user_raw['id'], user_raw['username']
                         , "" , user_raw['email']
-                        , user_data_raw['idrole'], user_data_raw['token'])
+                        , user_raw['idrole'], user_raw['token'])
+                self.user = user
                 return user
             else:
                 return None
         else:
             return None
-        
-daoClient=DaoUserClient()
-user=User("", "user1", "12345"," "," "," ")
-resposta=daoClient.login(user)
-print(resposta)
\ No newline at end of file
+
+    def headers(self):
+        # Authorization amb el token del login; sense login no s'envia res
+        if self.user and self.user.token:
+            return {"Authorization": "Bearer " + self.user.token}
+        return {}
+
+    def me(self):
+        # Qui és l'usuari de la sessió, sense tornar a enviar el password
+        response = self.transport.request("GET", self.base_URL + "me", headers=self.headers())
+        if response.status_code == 200:
+            return response.json()['data']
+        return None
+
+    def logout(self):
+        response = self.transport.request("POST", self.base_URL + "logout", headers=self.headers())
+        self.user = None
+        return response.status_code == 200
+
+
+# Prova: python DaoClient.py (amb el servidor engegat); no s'executa en importar
+if __name__ == '__main__':
+    daoClient=DaoUserClient()
+    user=User("", "user1", "12345"," "," "," ")
+    resposta=daoClient.login(user)
+    print(resposta)
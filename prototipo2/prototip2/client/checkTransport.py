@@ -0,0 +1,150 @@
+# Prova del transport compartit contra un servidor "stub" local que afegeix
+# latència i errors (503) a voluntat. No cal el servidor de TapatApp.
+# Ús: python checkTransport.py
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from transportClient import HttpTransport, CircuitOpenError, defaultTransport
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'diagramas'))
+from serverMetods import APIClient
+
+
+class Stub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = {}          # path -> peticions rebudes
+        self.ports = set()      # ports dels clients (una connexió = un port)
+        self.active = 0
+        self.maxActive = 0
+        self.down = False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None):
+        data = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_one(self):
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        key = url.path + query.get('key', '')
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        with stub.lock:
+            stub.hits[key] = stub.hits.get(key, 0) + 1
+            hits = stub.hits[key]
+            stub.ports.add(self.client_address[1])
+            stub.active += 1
+            stub.maxActive = max(stub.maxActive, stub.active)
+        try:
+            time.sleep(int(query.get('ms', 0)) / 1000)
+            if url.path == '/down' and stub.down:
+                return self.reply(503, {"error": "saturat"})
+            if hits <= int(query.get('fail', 0)):
+                return self.reply(503, {"error": "saturat"})
+            self.reply(200, {"ok": True, "hits": hits})
+        finally:
+            with stub.lock:
+                stub.active -= 1
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_one
+
+
+def startStub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.stub = Stub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def main():
+    server, base = startStub()
+    stub = server.stub
+
+    print("keep-alive")
+    transport = HttpTransport(backoff=0.01, pool_per_host=4)
+    for _ in range(50):
+        transport.request('GET', f"{base}/ok")
+    check("50 peticions seguides fan servir 1 connexió", len(stub.ports) == 1)
+
+    print("pool limitat per host")
+    with ThreadPoolExecutor(20) as pool:
+        list(pool.map(lambda i: transport.request('GET', f"{base}/ok?ms=30"), range(40)))
+    check(f"màxim de peticions simultànies {stub.maxActive} <= 4", stub.maxActive <= 4)
+    check(f"connexions obertes {len(stub.ports)} <= 4", len(stub.ports) <= 4)
+
+    print("reintents")
+    response = transport.request('GET', f"{base}/ok?fail=2&key=a")
+    check("GET amb 2 errors 503: correcte al 3r intent", response.status_code == 200 and stub.hits['/oka'] == 3)
+    response = transport.request('POST', f"{base}/ok?fail=1&key=b", json={})
+    check("POST no idempotent: no es reintenta", response.status_code == 503 and stub.hits['/okb'] == 1)
+    response = transport.request('POST', f"{base}/ok?fail=1&key=c", json={}, idempotent=True)
+    check("POST marcat idempotent: es reintenta", response.status_code == 200 and stub.hits['/okc'] == 2)
+
+    print("circuit breaker")
+    breakerT = HttpTransport(retries=1, backoff=0.01, breaker_failures=3, breaker_reset=0.3)
+    stub.down = True
+    response = breakerT.request('GET', f"{base}/down")
+    check("2 intents amb 503: es retorna el 503", response.status_code == 503 and stub.hits['/down'] == 2)
+    try:
+        breakerT.request('GET', f"{base}/down")
+        opened = False
+    except CircuitOpenError:
+        opened = True
+    check("al 3r error seguit el circuit s'obre i deixa de reintentar", opened and stub.hits['/down'] == 3)
+    hitsBefore = stub.hits['/down']
+    start = time.perf_counter()
+    try:
+        breakerT.request('GET', f"{base}/down")
+        failedFast = False
+    except CircuitOpenError:
+        failedFast = True
+    elapsed = (time.perf_counter() - start) * 1000
+    check(f"circuit obert: falla en {elapsed:.2f} ms sense enviar res",
+          failedFast and stub.hits['/down'] == hitsBefore)
+    stub.down = False
+    time.sleep(0.35)
+    try:
+        # json que no es pot serialitzar: TypeError abans d'enviar la prova de half-open
+        breakerT.request('GET', f"{base}/down", json=object())
+        raised = False
+    except TypeError:
+        raised = True
+    check("una excepció que no és de xarxa a la prova no deixa el circuit a half-open",
+          raised and breakerT.breaker(base).state() == 'open')
+    response = breakerT.request('GET', f"{base}/down")
+    check("passat el temps de reset, una prova correcta el tanca",
+          response.status_code == 200 and breakerT.breaker(base).state() == 'closed')
+
+    print("APIClient fa servir el transport compartit")
+    client = APIClient(base)
+    check("APIClient.get", client.get('/ok')['ok'] and client.transport is defaultTransport())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
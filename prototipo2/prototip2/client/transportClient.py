@@ -0,0 +1,149 @@
+# Transport HTTP compartit pels clients (DaoUserClient i APIClient de serverMetods)
+#  - una sola requests.Session: connexions keep-alive reutilitzades
+#  - pool limitat: pool_hosts hosts i com a màxim pool_per_host connexions per host
+#    (si totes estan ocupades, la petició espera en lloc d'obrir-ne més)
+#  - reintents amb backoff exponencial i jitter, només per a peticions idempotents
+#  - circuit breaker per host: després de breaker_failures errors seguits
+#    les peticions fallen a l'instant durant breaker_reset segons
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IDEMPOTENT = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    # El servidor està saturat o caigut: no s'ha enviat la petició
+    pass
+
+
+class CircuitBreaker:
+    # closed -> (n errors seguits) -> open -> (passat reset) -> half-open: una prova
+    def __init__(self, failures=5, reset=10.0):
+        self.failures = failures
+        self.reset = reset
+        self.errors = 0
+        self.openedAt = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.openedAt is None:
+                return True
+            if not self.trial and time.monotonic() - self.openedAt >= self.reset:
+                self.trial = True
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.errors = 0
+            self.openedAt = None
+            self.trial = False
+
+    def cancel(self):
+        # La petició ha fallat abans de saber res del servidor (excepció que no és
+        # de xarxa): no compta com a error, però si era la prova de half-open
+        # se'n pot fer una altra (si no, el circuit quedaria obert per sempre)
+        with self.lock:
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.errors += 1
+            if self.trial or self.errors >= self.failures:
+                self.openedAt = time.monotonic()
+                self.trial = False
+
+    def state(self):
+        if self.openedAt is None:
+            return 'closed'
+        return 'half-open' if self.trial else 'open'
+
+
+class HttpTransport:
+    def __init__(self, retries=3, backoff=0.1, max_backoff=2.0, timeout=30,
+                 pool_hosts=10, pool_per_host=10, breaker_failures=5, breaker_reset=10.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host,
+                              pool_block=True, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def breaker(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            breaker = self.breakers.get(host)
+            if breaker is None:
+                breaker = self.breakers[host] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            return breaker
+
+    def delay(self, attempt, response=None):
+        # Retry-After del servidor si n'hi ha; si no, backoff exponencial amb "full jitter"
+        retryAfter = response.headers.get('Retry-After') if response is not None else None
+        if retryAfter and retryAfter.isdigit():
+            return min(float(retryAfter), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        # Com session.request. idempotent=True permet reintentar un POST
+        # (per exemple /taps/bulk, que no duplica gràcies al client_id)
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT
+        kwargs.setdefault('timeout', self.timeout)
+        breaker = self.breaker(url)
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit obert per a {urlsplit(url).netloc}")
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.failure()
+                if attempt + 1 == attempts:
+                    raise
+                time.sleep(self.delay(attempt))
+                continue
+            except BaseException:
+                breaker.cancel()
+                raise
+            if response.status_code not in RETRY_STATUS and response.status_code < 500:
+                breaker.success()
+                return response
+            breaker.failure()
+            if attempt + 1 == attempts or response.status_code not in RETRY_STATUS:
+                return response
+            response.close()
+            time.sleep(self.delay(attempt, response))
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+_default = None
+_defaultLock = threading.Lock()
+
+
+def defaultTransport():
+    # Transport compartit per tots els clients del procés
+    global _default
+    with _defaultLock:
+        if _default is None:
+            _default = HttpTransport()
+        return _default
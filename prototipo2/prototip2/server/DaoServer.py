@@ -1,54 +1,283 @@
 from dadesServer import *
-from dataclasses import dataclass, asdict
-from flask import jsonify
+from indexServer import UserIndex, RelationIndex, encodeCursor, decodeCursor, parseTime, checkTimes
+from tapTable import TapStore
+from treatmentAccumulator import TreatmentAccumulator
+from sessionServer import REVOKING_FIELDS
+from changesServer import USER, CHILD, RELATION, TAP, UPSERT, DELETE, relationKey
 
 
 
 
 class UserDAO:
-    def __init__(self):
-        self.users = users
+    def __init__(self, users=users, relations=None, changes=None, sessions=None):
+        # Índex per id, username i email (veure indexServer)
+        self.users = UserIndex(users)
+        # Es pot compartir el mateix RelationIndex amb ChildDao
+        self.relations = relations if relations is not None else RelationIndex(relation_user_child)
+        # Registre de canvis opcional (changesServer.ChangeLog)
+        self.changes = changes
+        # Sessions opcionals (sessionServer.SessionStore): es revoquen les d'un
+        # usuari esborrat o amb un password o rol nou (la sessió guarda l'idrole)
+        self.sessions = sessions
 
     def getAllUsers(self):
-        return [user.__dict__ for user in self.users]
+        return [user.to_dict() for user in self.users]
+
+    def iterAllUsers(self, chunk=500):
+        # Generador per pàgines: memòria constant i no falla si hi ha altes mentre es recorre
+        after_id = None
+        while True:
+            page, after_id = self.users.page(after_id, chunk)
+            for user in page:
+                yield user.to_dict()
+            if after_id is None:
+                return
+
+    def getUsersPage(self, after=None, limit=100):
+        # after és el cursor opac de la pàgina anterior; retorna (usuaris, cursor següent)
+        after_id = int(decodeCursor(after)) if after else None
+        page, last = self.users.page(after_id, limit)
+        return [user.to_dict() for user in page], (encodeCursor(last) if last is not None else None)
 
     def getUserByUsername(self, username):
-        for user in self.users:
-            if user.username == username:
-                return user.__dict__
+        user = self.users.getByUsername(username)
+        if user:
+            return user.to_dict()
+        return None
+
+    def getUserByEmail(self, email):
+        user = self.users.getByEmail(email)
+        if user:
+            return user.to_dict()
         return None
     
     def login(self, identifier, password):
-        for user in self.users:
-            if (user.username == identifier or user.email == identifier) and user.password == password:
+        # identifier pot ser el username o l'email; si no és un string el login falla
+        if not isinstance(identifier, str):
+            return None
+        for user in (self.users.getByUsername(identifier), self.users.getByEmail(identifier)):
+            if user and user.password == password:
                 return user
         return None
+
+    def addUser(self, user):
+        user = self.users.insert(user)
+        if self.changes is not None:
+            self.changes.append(USER, UPSERT, user.id, user)
+        return user
+
+    def getVersion(self):
+        # Canvia a cada alta/modificació/baixa d'usuaris (ETag)
+        return self.users.version
+
+    def updateUser(self, user_id, **fields):
+        user = self.users.update(user_id, **fields)
+        if user is not None and self.changes is not None:
+            self.changes.append(USER, UPSERT, user_id, user)
+        if user is not None and self.sessions is not None and REVOKING_FIELDS & fields.keys():
+            self.sessions.revokeUser(user_id)
+        return user
+
+    def deleteUser(self, user_id):
+        user = self.users.delete(user_id)
+        if user is not None and self.changes is not None:
+            self.changes.append(USER, DELETE, user_id)
+        if user is not None and self.sessions is not None:
+            self.sessions.revokeUser(user_id)
+        return user
     
     def getUserRole(self,user_id):
-        return [relation['rol_id'] for relation in relation_user_child if relation['user_id'] == user_id]
+        return self.relations.roles(user_id)
 
 class ChildDao:
-    def __init__ (self):
-        self.childs = children
-        self.relation_user_child = relation_user_child
+    def __init__ (self, childs=children, relations=None, changes=None):
+        self.childs = {c.id: c for c in childs}
+        self.version = 0   # canvia a cada alta/baixa de child (ETag)
+        self.relation_user_child = relations if relations is not None else RelationIndex(relation_user_child)
+        self.changes = changes
         
     def getChild(self, user):
-        # Get IDs
-        child_ids = {r['child_id'] for r in self.relation_user_child if r['user_id'] == user.id}
-        #for in que devuelve relation_user_child (esta en dadesSERVER) y pone dento de R
+        # Get IDs (índex per user_id, no cal recórrer relation_user_child)
         #retrun Child Objects
-        return [c.__dict__ for c in self.childs if c.id in child_ids]
+        return self.getChildsOfUser(user.id)
+
+    def getAllChilds(self):
+        return [c.to_dict() for c in self.childs.values()]
+
+    def iterAllChilds(self):
+        for child_id in list(self.childs):
+            child = self.childs.get(child_id)
+            if child:
+                yield child.to_dict()
+
+    def getChildById(self, child_id):
+        child = self.childs.get(child_id)
+        if child:
+            return child.to_dict()
+        return None
+
+    def getUsersOfChild(self, child_id):
+        return self.relation_user_child.userIds(child_id)
+
+    def addChild(self, child):
+        self.childs[child.id] = child
+        self.version += 1
+        if self.changes is not None:
+            self.changes.append(CHILD, UPSERT, child.id, child)
+        return child
+
+    def deleteChild(self, child_id):
+        removed = self.relation_user_child.removeChild(child_id)
+        self.version += 1
+        child = self.childs.pop(child_id, None)
+        if self.changes is not None:
+            for relation in removed:
+                self.changes.append(RELATION, DELETE, relationKey(relation), relation)
+            if child is not None:
+                self.changes.append(CHILD, DELETE, child_id)
+        return child
+
+    def getVersion(self, user_id=None):
+        # Amb user_id també compten els canvis de relacions d'aquest user
+        if user_id is None:
+            return self.version
+        return f"{self.version}.{self.relation_user_child.versionOf(user_id)}"
+
+    def getChildsOfUser(self, user_id):
+        child_ids = self.relation_user_child.childIds(user_id)
+        return [self.childs[c].to_dict() for c in child_ids if c in self.childs]
+
+    def addRelation(self, user_id, child_id, rol_id):
+        relation = self.relation_user_child.add(user_id, child_id, rol_id)
+        if relation is not None and self.changes is not None:
+            self.changes.append(RELATION, UPSERT, relationKey(relation), relation)
+        return relation
+
+    def removeRelation(self, user_id, child_id, rol_id=None):
+        removed = self.relation_user_child.remove(user_id, child_id, rol_id)
+        if self.changes is not None:
+            for relation in removed:
+                self.changes.append(RELATION, DELETE, relationKey(relation), relation)
+        return removed
+
+
+class TapDao:
+    def __init__(self, taps=taps, changes=None):
+        # Taps per child ordenats per temps (veure tapTable.TapStore)
+        self.taps = TapStore(taps)
+        # Minuts de pegat/son per child i dia, al dia a cada canvi de taps
+        self.treatment = TreatmentAccumulator(self.taps)
+        # client_id (generat al mòbil) -> id del tap, per no duplicar reenviaments
+        self.clientIds = {}
+        self.changes = changes
+
+    def _changed(self, tap, op=UPSERT):
+        if tap is not None and self.changes is not None:
+            self.changes.append(TAP, op, tap.id, tap if op == UPSERT else None)
+        return tap
+
+    def getTap(self, tap_id):
+        tap = self.taps.get(tap_id)
+        if tap:
+            return tap.to_dict()
+        return None
+
+    def getTapsByChild(self, child_id, start=None, end=None):
+        # Generador, no construeix la llista sencera
+        return (tap.to_dict() for tap in self.taps.findByChild(child_id, start, end))
+
+    def getTapsByDateRange(self, start=None, end=None):
+        return (tap.to_dict() for tap in self.taps.findByDateRange(start, end))
+
+    # Els canvis passen per l'acumulador, que també actualitza el TapStore
+    def createTap(self, tap):
+        return self._changed(self.treatment.insert(tap))
+
+    def closeTap(self, tap_id, end):
+        return self._changed(self.treatment.close(tap_id, end))
+
+    def deleteTap(self, tap_id):
+        return self._changed(self.treatment.delete(tap_id), DELETE)
+
+    def createTaps(self, taps, clientIds):
+        # Alta en bloc (sincronització del mòbil). Els client_id ja coneguts no es
+        # tornen a inserir: es retorna l'id que ja tenien. Retorna [(id, creat), ...]
+        new = {}
+        # Amb el lock del store: dues altes amb el mateix client_id no el poden crear dues vegades
+        with self.taps.lock:
+            for tap, clientId in zip(taps, clientIds):
+                if clientId not in self.clientIds and clientId not in new:
+                    new[clientId] = tap
+            # En ordre de temps per child: l'acumulador només ha de sumar, no reparar
+            for clientId, tap in sorted(new.items(), key=lambda item: (item[1].child_id, parseTime(item[1].init))):
+                self._changed(self.treatment.insert(tap))
+                self.clientIds[clientId] = tap.id
+            return [(self.clientIds[clientId], new.get(clientId) is tap)
+                    for tap, clientId in zip(taps, clientIds)]
+
+    def getTreatment(self, child_id, day, now=None):
+        return self.treatment.summary(child_id, day, now)
+
+    def getVersion(self, child_id=None):
+        if child_id is None:
+            return self.taps.version
+        return self.taps.versionOf(child_id)
+
+
+MAX_CLIENT_ID = 64
+statusIds = {s.id for s in statuses}
+
+def tapFromRow(row):
+    # Valida un tap rebut (POST /taps o una fila de /taps/bulk) i el retorna com a Tap.
+    # Qualsevol error és un ValueError amb el missatge per al client (400)
+    if not isinstance(row, dict):
+        raise ValueError("cal un objecte")
+    for field in ('child_id', 'status_id', 'user_id', 'init'):
+        if row.get(field) is None:
+            raise ValueError(f"Camp requerit: {field}")
+    for field in ('child_id', 'status_id', 'user_id'):
+        if type(row[field]) is not int or row[field] <= 0:
+            raise ValueError(f"{field} incorrecte")
+    if row['status_id'] not in statusIds:
+        raise ValueError("status_id desconegut")
+    tap_id = row.get('id') or 0
+    if type(tap_id) is not int or tap_id < 0:
+        raise ValueError("id incorrecte")
+    checkTimes(row['init'], row.get('end'))
+    return Tap(id=tap_id, child_id=row['child_id'], status_id=row['status_id'],
+               user_id=row['user_id'], init=row['init'], end=row.get('end'))
+
 
+def tapsFromRows(rows):
+    # Valida les files d'una alta en bloc d'una passada (amb tapFromRow, com POST /taps).
+    # Retorna (taps, clientIds, errors); errors = [{"index": i, "error": "..."}]
+    valid, clientIds, errors = [], [], []
+    for i, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("cal un objecte")
+            clientId = row.get('client_id')
+            if not isinstance(clientId, str) or not 0 < len(clientId) <= MAX_CLIENT_ID:
+                raise ValueError("client_id incorrecte")
+            # Les altes en bloc no porten id: el posa el servidor
+            tap = tapFromRow({**row, 'id': 0})
+        except ValueError as e:
+            errors.append({"index": i, "error": str(e)})
+            continue
+        valid.append(tap)
+        clientIds.append(clientId)
+    return valid, clientIds, errors
 
-cDao= ChildDao()
-u=User(id=1, username="", password="", email="", idrole=1, token="")
-listChilds=cDao.getChild(u)
-print(listChilds)
 
 #####################################################
 #  Test / Proves Codi per veure funcionament 
-#  (comentar quan s'ha testejat)
+#  (python DaoServer.py; no s'executa en importar)
 #####################################################
+if __name__ == '__main__':
+    cDao= ChildDao()
+    u=User(id=1, username="", password="", email="", idrole=1, token="")
+    listChilds=cDao.getChild(u)
+    print(listChilds)
 
 ## print All Users from list dadesServer: 
 #print(" ".join([str(x) for x in users]))
@@ -0,0 +1,488 @@
+# Versió asyncio del servidor de TapatApp (sense Flask ni threads per petició).
+# Mateixos endpoints i mateix JSON que server.py: /login, /getusers, /Child,
+# /children, /taps, /batch... amb l'embolcall ApiResponse {msg, coderesponse, data}.
+#  - HTTP/1.1 amb keep-alive sobre asyncio.start_server (només llibreria estàndard)
+#  - una connexió oberta i inactiva només ocupa una corutina i uns quants KB,
+#    així es poden mantenir desenes de milers de mòbils connectats
+#  - amb TAPATAPP_DB (SQLite) les crides al DAO van a un pool de threads
+#    per no bloquejar el bucle d'esdeveniments
+# Ús: python asyncServer.py [port]   (per defecte 5000)
+import asyncio
+import os
+import re
+import sys
+import traceback
+import zlib
+from dataclasses import dataclass
+from http import HTTPStatus
+from json import loads
+from urllib.parse import urlsplit, parse_qsl
+
+from DaoServer import tapsFromRows, tapFromRow
+from backendServer import Backend, LazyDao
+from sessionServer import SessionStore, bearerToken
+from dadesServer import *
+from encoderServer import encode, encodeApiResponse
+
+MAX_HEADERS = 16 * 1024
+MAX_BODY = 4 * 1024 * 1024
+IDLE_TIMEOUT = 75
+
+
+@dataclass
+class ApiResponse():
+    msg: str
+    coderesponse: str
+    data: list
+
+
+# Mateixa tria de backend que server.py (TAPATAPP_DB, TAPATAPP_SNAPSHOT); les
+# dades es carreguen a serve(), no en importar el mòdul
+# Sessions amb token, com a server.py (el UserDAO revoca les d'un usuari esborrat)
+sessions = SessionStore(ttl=int(os.environ.get('TAPATAPP_SESSION_TTL', 3600)))
+backend = Backend(sessions=sessions)
+DB_PATH = backend.dbPath
+userDao = LazyDao(backend, 'userDao')
+childDao = LazyDao(backend, 'childDao')
+tapDao = LazyDao(backend, 'tapDao')
+changes = LazyDao(backend, 'changes')
+
+REQUIRE_AUTH = os.environ.get('TAPATAPP_REQUIRE_AUTH') == '1'
+PUBLIC = {'/login'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+class Request:
+    __slots__ = ('method', 'target', 'path', 'query', 'headers', 'body', 'params', 'session')
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.target = target
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+        self.params = {}
+        self.session = None
+
+    def arg(self, name):
+        return self.query.get(name)
+
+    def argInt(self, name):
+        # Com request.args.get(name, type=int): None si no hi és o no és un enter
+        try:
+            return int(self.query[name])
+        except (KeyError, ValueError):
+            return None
+
+    def json(self):
+        try:
+            return loads(self.body) if self.body else None
+        except ValueError:
+            raise HttpError(400, "JSON incorrecte")
+
+    def variant(self):
+        # Igual que request.full_path + Accept a server.py (per a l'ETag)
+        query = urlsplit(self.target).query
+        return f"{self.path}?{query}" + self.headers.get('accept', '')
+
+
+def reply(body, status=200, etag=None):
+    return status, body, etag
+
+
+def error(message, status):
+    return reply(encode({"error": message}), status)
+
+
+def released(fn, *args):
+    # Al thread del pool: la connexió de SQLite torna al pool en acabar
+    try:
+        return fn(*args)
+    finally:
+        backend.release()
+
+
+async def call(fn, *args):
+    # SQLite bloqueja: es fa en un thread. En memòria es crida directament
+    if DB_PATH:
+        return await asyncio.get_running_loop().run_in_executor(None, released, fn, *args)
+    return fn(*args)
+
+
+# Rutes: (mètode, patró, handler, versió per a l'ETag o None)
+routes = []
+
+
+def route(method, pattern, version=None):
+    regex = re.compile('^' + re.sub(r'<int:(\w+)>', r'(?P<\1>\\d+)', pattern) + '$')
+    def decorator(handler):
+        routes.append((method, regex, handler, version))
+        return handler
+    return decorator
+
+
+def childrenVersion(req):
+    return childDao.getVersion(req.argInt('user_id'))
+
+
+def tapsVersion(req):
+    child_id = req.params.get('child_id', req.argInt('child_id'))
+    return tapDao.getVersion(child_id)
+
+
+@route('GET', '/getusers', lambda req: userDao.getVersion())
+async def getusers(req):
+    limit = req.argInt('limit')
+    after = req.arg('after')
+    if limit is None and after is None:
+        response = ApiResponse(msg="All Users", coderesponse="1", data=await call(userDao.getAllUsers))
+        return reply(encodeApiResponse(response))
+
+    limit = min(max(limit or 100, 1), 1000)
+    try:
+        listUsers, nextCursor = await call(userDao.getUsersPage, after, limit)
+    except ValueError as e:
+        return error(str(e), 400)
+    response = ApiResponse(msg="Users", coderesponse="1", data=listUsers)
+    return reply(encodeApiResponse(response, next=nextCursor))
+
+
+@route('POST', '/login')
+async def login(req):
+    data = req.json() or {}
+    user = await call(userDao.login, data.get('username'), data.get('password'))
+    if user:
+        # Mai s'envia el password; el token és el de la sessió nova
+        data = {k: v for k, v in user.to_dict().items() if k != 'password'}
+        data['token'] = sessions.create(user).token
+        response = ApiResponse(msg="Authenticated", coderesponse="1", data=data)
+    else:
+        response = ApiResponse(msg="Not authenticated", coderesponse="0", data=user)
+    return reply(encodeApiResponse(response))
+
+
+@route('POST', '/logout')
+async def logout(req):
+    if req.session is None:
+        return error("No autenticat", 401)
+    sessions.revoke(req.session.token)
+    return reply(encode({"success": True}))
+
+
+@route('GET', '/me')
+async def me(req):
+    if req.session is None:
+        return error("No autenticat", 401)
+    data = {"user_id": req.session.user_id, "idrole": req.session.idrole}
+    return reply(encodeApiResponse(ApiResponse(msg="Session", coderesponse="1", data=data)))
+
+
+@route('POST', '/Child')
+async def child(req):
+    data = req.json() or {}
+    user_id = data.get('id_user')
+    response = ApiResponse(msg="Child", coderesponse="-1", data="")
+    if user_id is None or not str(user_id).isdigit():
+        return reply(encodeApiResponse(response), 400)
+    listChilds = await call(childDao.getChildsOfUser, int(user_id))
+    response.coderesponse = "1"
+    response.msg = len(listChilds)
+    response.data = listChilds
+    return reply(encodeApiResponse(response))
+
+
+@route('GET', '/children', childrenVersion)
+async def getChildren(req):
+    user_id = req.argInt('user_id')
+    if user_id is not None:
+        listChilds = await call(childDao.getChildsOfUser, user_id)
+    else:
+        listChilds = await call(childDao.getAllChilds)
+    return reply(encode({"count": len(listChilds), "children": listChilds}))
+
+
+@route('GET', '/taps/search', tapsVersion)
+async def searchTaps(req):
+    child_id = req.argInt('child_id')
+    user_id = req.argInt('user_id')
+    status_id = req.argInt('status_id')
+    start = req.arg('start_date')
+    end = req.arg('end_date')
+
+    def search():
+        if child_id is not None:
+            found = tapDao.getTapsByChild(child_id, start, end)
+        else:
+            found = tapDao.getTapsByDateRange(start, end)
+        return [t for t in found
+                if (user_id is None or t['user_id'] == user_id)
+                and (status_id is None or t['status_id'] == status_id)]
+    try:
+        listTaps = await call(search)
+    except ValueError:
+        return error("Data incorrecta (format ISO 8601)", 400)
+    return reply(encode({"count": len(listTaps), "taps": listTaps}))
+
+
+@route('GET', '/taps', tapsVersion)
+async def getTaps(req):
+    listTaps = await call(lambda: list(tapDao.getTapsByDateRange()))
+    return reply(encode({"count": len(listTaps), "taps": listTaps}))
+
+
+@route('GET', '/taps/<int:tap_id>', lambda req: tapDao.getVersion())
+async def getTap(req):
+    tap = await call(tapDao.getTap, req.params['tap_id'])
+    if tap is None:
+        return error("Tap no trobat", 404)
+    return reply(encode(tap))
+
+
+@route('POST', '/taps')
+async def createTap(req):
+    # Mateixa validació que /taps/bulk (DaoServer.tapFromRow)
+    try:
+        tap = tapFromRow(req.json() or {})
+        await call(tapDao.createTap, tap)
+    except ValueError as e:
+        return error(str(e), 400)
+    return reply(encode({"id": tap.id}), 201)
+
+
+MAX_BULK = 5000
+
+
+@route('POST', '/taps/bulk')
+async def createTapsBulk(req):
+    # Com /taps/bulk de server.py
+    rows = (req.json() or {}).get('taps')
+    if not isinstance(rows, list):
+        return error("Camp requerit: taps", 400)
+    if len(rows) > MAX_BULK:
+        return error(f"Màxim {MAX_BULK} taps per petició", 400)
+    newTaps, clientIds, errors = tapsFromRows(rows)
+    ids = await call(tapDao.createTaps, newTaps, clientIds) if newTaps else []
+    created = sum(1 for _, isNew in ids if isNew)
+    return reply(encode({
+        "count": len(ids),
+        "created": created,
+        "duplicates": len(ids) - created,
+        "ids": [{"client_id": c, "id": i} for c, (i, _) in zip(clientIds, ids)],
+        "errors": errors
+    }))
+
+
+@route('PUT', '/taps/<int:tap_id>/close')
+async def closeTap(req):
+    data = req.json() or {}
+    end_time = data.get('end_time')
+    if end_time is None:
+        return error("Camp requerit: end_time", 400)
+    try:
+        tap = await call(tapDao.closeTap, req.params['tap_id'], end_time)
+    except ValueError as e:
+        return error(str(e), 400)
+    if tap is None:
+        return reply(encode({"success": False, "error": "Tap no trobat"}), 404)
+    return reply(encode({"success": True}))
+
+
+@route('DELETE', '/taps/<int:tap_id>')
+async def deleteTap(req):
+    if await call(tapDao.deleteTap, req.params['tap_id']) is None:
+        return reply(encode({"success": False, "error": "Tap no trobat"}), 404)
+    return reply(encode({"success": True}))
+
+
+@route('GET', '/treatment/<int:child_id>', tapsVersion)
+async def treatment(req):
+    day = req.arg('date')
+    if not day:
+        return error("Falta el paràmetre date", 400)
+    try:
+        summary = await call(tapDao.getTreatment, req.params['child_id'], day, req.arg('now'))
+    except ValueError:
+        return error("Data incorrecta (format ISO 8601)", 400)
+    return reply(encode(summary))
+
+
+@route('GET', '/changes')
+async def getChanges(req):
+    since = req.argInt('since')
+    if since is None:
+        return error("Falta el paràmetre since", 400)
+    # Com a server.py: sense limit 500, limit=0 és 1
+    limit = req.argInt('limit')
+    limit = min(max(500 if limit is None else limit, 1), 5000)
+    return reply(encode(await call(changes.since, since, limit)))
+
+
+MAX_BATCH = 50
+
+
+@route('POST', '/batch')
+async def batch(req):
+    # Com /batch de server.py: els GET seguits en paral·lel, les escriptures en ordre
+    data = req.json() or {}
+    subRequests = data.get('requests')
+    if not isinstance(subRequests, list) or not subRequests:
+        return error("Camp requerit: requests", 400)
+    if len(subRequests) > MAX_BATCH:
+        return error(f"Màxim {MAX_BATCH} peticions per batch", 400)
+    calls = []
+    for sub in subRequests:
+        method = str(sub.get('method', 'GET')).upper() if isinstance(sub, dict) else ''
+        path = sub.get('path') if isinstance(sub, dict) else None
+        if method not in ('GET', 'POST', 'PUT', 'DELETE') or not isinstance(path, str) \
+                or not path.startswith('/') or path.split('?')[0] == '/batch':
+            return error(f"Petició incorrecta: {sub}", 400)
+        body = sub.get('body')
+        # Les subpeticions fan servir la mateixa sessió que el batch
+        headers = {'accept': 'application/json'}
+        if 'authorization' in req.headers:
+            headers['authorization'] = req.headers['authorization']
+        calls.append(Request(method, path, headers, encode(body) if body is not None else b''))
+
+    async def run(sub):
+        try:
+            status, body, _ = await dispatch(sub)
+        except HttpError as e:
+            status, body = e.status, encode({"error": str(e)})
+        except Exception:
+            # Com full_dispatch_request a server.py: un 500 per a aquesta subpetició
+            traceback.print_exc()
+            status, body = 500, encode({"error": HTTPStatus(500).phrase})
+        return {"status": status, "body": loads(body) if body else None}
+
+    results = []
+    reads = []
+    for sub in calls:
+        if sub.method == 'GET':
+            reads.append(run(sub))
+            continue
+        results += await asyncio.gather(*reads)
+        reads = []
+        results.append(await run(sub))
+    results += await asyncio.gather(*reads)
+    return reply(encodeApiResponse(ApiResponse(msg="Batch", coderesponse="1", data=results)))
+
+
+async def dispatch(req):
+    req.session = sessions.get(bearerToken(req.headers.get('authorization')))
+    if REQUIRE_AUTH and req.session is None and req.path not in PUBLIC:
+        return error("No autenticat", 401)
+    allowed = False
+    for method, regex, handler, version in routes:
+        match = regex.match(req.path)
+        if match is None:
+            continue
+        if method != req.method:
+            allowed = True
+            continue
+        req.params.update((k, int(v)) for k, v in match.groupdict().items())
+        etag = None
+        if version is not None:
+            # GET condicional com a server.py: 304 sense cridar el DAO
+            etag = f'"{version(req)}-{zlib.crc32(req.variant().encode()):x}"'
+            if etag in req.headers.get('if-none-match', ''):
+                return reply(b'', 304, etag)
+        try:
+            status, body, _ = await handler(req)
+        except PermissionError as e:
+            # Escriptures amb els DAO només de lectura (snapshot binari)
+            return error(str(e), 403)
+        return reply(body, status, etag if status == 200 else None)
+    if allowed:
+        return error("Mètode no permès", 405)
+    return error("No trobat", 404)
+
+
+def encodeHead(status, length, etag, keepAlive):
+    head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    if status != 304:
+        head.append("Content-Type: application/json")
+    head.append(f"Content-Length: {length}")
+    if etag:
+        head.append(f"ETag: {etag}")
+    if not keepAlive:
+        head.append("Connection: close")
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1')
+
+
+async def readRequest(reader):
+    try:
+        raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+    except asyncio.LimitOverrunError:
+        raise HttpError(431)
+    lines = raw.decode('latin-1').split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HttpError(400, "Petició incorrecta")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    if 'chunked' in headers.get('transfer-encoding', ''):
+        raise HttpError(411)
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HttpError(400, "Content-Length incorrecte")
+    if length < 0:
+        raise HttpError(400, "Content-Length incorrecte")
+    if length > MAX_BODY:
+        raise HttpError(413)
+    body = await reader.readexactly(length) if length else b''
+    req = Request(method, target, headers, body)
+    connection = headers.get('connection', '').lower()
+    keepAlive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return req, keepAlive
+
+
+async def handle(reader, writer):
+    keepAlive = True
+    try:
+        while keepAlive:
+            try:
+                req, keepAlive = await readRequest(reader)
+                status, body, etag = await dispatch(req)
+            except HttpError as e:
+                keepAlive = False
+                status, body, etag = e.status, encode({"error": str(e)}), None
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                raise
+            except Exception:
+                # Error al handler: 500 i la connexió continua (el cos ja s'ha llegit)
+                traceback.print_exc()
+                status, body, etag = 500, encode({"error": HTTPStatus(500).phrase}), None
+            writer.write(encodeHead(status, len(body), etag, keepAlive) + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        # El client ha tancat o porta massa estona inactiu
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host='0.0.0.0', port=5000, ready=None):
+    # Es carrega abans d'acceptar connexions i fora del bucle (un snapshot gran triga)
+    await asyncio.get_running_loop().run_in_executor(None, backend.load)
+    server = await asyncio.start_server(handle, host, port, limit=MAX_HEADERS, backlog=4096)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(serve(port=port))
@@ -0,0 +1,106 @@
+# Tria i creació del backend (DAO + registre de canvis), compartida per server.py
+# i asyncServer.py. No es crea res en importar: les dades (dadesServer, el
+# snapshot de TAPATAPP_SNAPSHOT o la base de dades de TAPATAPP_DB) es carreguen
+# la primera vegada que es fa servir un DAO.
+#  - TAPATAPP_DB=fitxer.sqlite: les dades es guarden a SQLite (sqliteServer)
+#  - TAPATAPP_SNAPSHOT=fitxer.tapsnap (sense TAPATAPP_DB): DAO només de lectura
+#    sobre el snapshot binari obert amb mmap (binarySnapshot)
+#  - si no, es treballa en memòria, amb les llistes de dadesServer o les del
+#    snapshot gzip de TAPATAPP_SNAPSHOT (datasetServer)
+#
+# Ús:
+#   backend = Backend()
+#   userDao = LazyDao(backend, 'userDao')   # carrega el backend a la primera crida
+import os
+import threading
+
+
+class Backend:
+    def __init__(self, environ=os.environ, sessions=None):
+        # sessions (sessionServer.SessionStore) es passa al UserDAO per revocar
+        # les sessions d'un usuari esborrat o amb un password nou
+        self.sessions = sessions
+        self.dbPath = environ.get('TAPATAPP_DB')
+        self.snapshot = environ.get('TAPATAPP_SNAPSHOT')
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.userDao = self.childDao = self.tapDao = self.changes = None
+        self.db = None
+        self.binary = None
+
+    def load(self):
+        if self.loaded:
+            return self
+        with self.lock:
+            if not self.loaded:
+                self.create()
+                self.loaded = True
+        return self
+
+    def release(self):
+        # Final d'una petició: amb SQLite la connexió del thread torna al pool
+        if self.db is not None:
+            self.db.release()
+
+    def create(self):
+        # Els mòduls dels DAO també s'importen aquí: el cost és de la primera petició
+        from dadesServer import users, children, relation_user_child, taps
+        binary = self.snapshot and self.snapshot.endswith('.tapsnap')
+        if binary and not self.dbPath:
+            # Snapshot binari (binarySnapshot) sense SQLite: DAO només de lectura
+            # que consulten el mmap, que queda obert mentre duri el procés
+            from binarySnapshot import BinarySnapshot, SnapshotUserDao, SnapshotChildDao, SnapshotTapDao
+            from changesServer import ChangeLog
+            self.binary = BinarySnapshot(self.snapshot)
+            self.changes = ChangeLog()
+            self.userDao = SnapshotUserDao(self.binary)
+            self.childDao = SnapshotChildDao(self.binary)
+            self.tapDao = SnapshotTapDao(self.binary)
+            return
+        if binary:
+            # Per omplir una base de dades SQLite nova es passa tot a objectes
+            from binarySnapshot import BinarySnapshot
+            with BinarySnapshot(self.snapshot) as snapshot:
+                users, children, relation_user_child, taps = snapshot.dataset()
+        elif self.snapshot:
+            import datasetServer
+            users, children, relation_user_child, taps = datasetServer.load(self.snapshot)
+        if self.dbPath:
+            from sqliteServer import SqliteDatabase, SqliteUserDAO, SqliteChildDao, SqliteTapDao
+            from changesServer import SqliteChangeLog
+            db = self.db = SqliteDatabase(self.dbPath)
+            if db.isEmpty():
+                db.load(users, children, relation_user_child, taps)
+            db.release()
+            self.changes = SqliteChangeLog(db)
+            self.userDao = SqliteUserDAO(db, self.changes, sessions=self.sessions)
+            self.childDao = SqliteChildDao(db, self.changes)
+            self.tapDao = SqliteTapDao(db, self.changes)
+        else:
+            from DaoServer import UserDAO, ChildDao, TapDao
+            from changesServer import ChangeLog
+            from indexServer import RelationIndex
+            # comparteixen l'índex de relacions user <-> child
+            relations = RelationIndex(relation_user_child)
+            self.changes = ChangeLog()
+            self.userDao = UserDAO(users, relations=relations, changes=self.changes, sessions=self.sessions)
+            self.childDao = ChildDao(children, relations=relations, changes=self.changes)
+            self.tapDao = TapDao(taps, changes=self.changes)
+
+
+class LazyDao:
+    # Fa de DAO (userDao, childDao, tapDao o changes del backend) i el carrega
+    # amb el primer mètode que es demana. Com TimedDao, els mètodes es guarden
+    # i la propera vegada no passen per __getattr__.
+    def __init__(self, backend, name):
+        object.__setattr__(self, '_backend', backend)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, name):
+        value = getattr(getattr(self._backend.load(), self._name), name)
+        if callable(value):
+            object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(getattr(self._backend.load(), self._name), name, value)
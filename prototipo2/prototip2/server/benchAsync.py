@@ -0,0 +1,127 @@
+# Benchmark de càrrega: server.py (Flask, un thread per connexió) contra
+# asyncServer.py (asyncio) a localhost, amb la mateixa barreja de peticions.
+# Cada servidor s'arrenca en un procés a part; el client és asyncio amb
+# connexions keep-alive (si el servidor tanca, es torna a connectar).
+# Ús: python benchAsync.py [segons] [connexions inactives]   (per defecte 5 1000)
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FLASK = ("import server\n"
+         "from werkzeug.serving import make_server\n"
+         "make_server('127.0.0.1', {port}, server.app, threaded=True).serve_forever()")
+
+MIX = [
+    ('POST', '/login', b'{"username":"mare","password":"12345"}'),
+    ('POST', '/Child', b'{"id_user":1}'),
+    ('GET', '/getusers', None),
+    ('GET', '/taps?child_id=1', None),
+    ('GET', '/treatment/1?date=2024-12-18', None),
+]
+
+
+def start(name, port):
+    if name == 'flask':
+        cmd = [sys.executable, '-c', FLASK.format(port=port)]
+    else:
+        cmd = [sys.executable, 'asyncServer.py', str(port)]
+    proc = subprocess.Popen(cmd, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{name} no arrenca al port {port}")
+
+
+def encodeRequest(method, path, body):
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    if body is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    return (head + "\r\n").encode() + (body or b'')
+
+
+async def readResponse(reader):
+    head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').lower()
+    status = int(head.split(" ", 2)[1])
+    length = None
+    for line in head.split("\r\n"):
+        if line.startswith("content-length:"):
+            length = int(line.split(":")[1])
+    if length is None:
+        await reader.read()
+        return status, False
+    await reader.readexactly(length)
+    keepAlive = head.startswith("http/1.1") and "connection: close" not in head
+    return status, keepAlive
+
+
+async def worker(port, requests, stop, latencies, errors):
+    conn = None
+    i = 0
+    while time.perf_counter() < stop:
+        request = requests[i % len(requests)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if conn is None:
+                conn = await asyncio.open_connection('127.0.0.1', port)
+            reader, writer = conn
+            writer.write(request)
+            status, keepAlive = await readResponse(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append(1)
+            conn = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(status)
+        if not keepAlive:
+            writer.close()
+            conn = None
+    if conn is not None:
+        conn[1].close()
+
+
+async def load(port, clients, seconds, idle):
+    # Connexions obertes sense enviar res (mòbils connectats i inactius)
+    idleConns = []
+    for _ in range(idle):
+        try:
+            idleConns.append(await asyncio.open_connection('127.0.0.1', port))
+        except OSError:
+            break
+    requests = [encodeRequest(*r) for r in MIX]
+    latencies, errors = [], []
+    stop = time.perf_counter() + seconds
+    await asyncio.gather(*(worker(port, requests, stop, latencies, errors) for _ in range(clients)))
+    for _, writer in idleConns:
+        writer.close()
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0
+    return len(latencies) / seconds, pct(0.5), pct(0.99), len(errors), len(idleConns)
+
+
+def bench(seconds, idle):
+    print(f"{'servidor':<8} {'clients':>7} {'inactives':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for port, name in ((5101, 'flask'), (5102, 'asyncio')):
+        proc = start(name, port)
+        try:
+            for clients, idleN in ((10, 0), (100, 0), (100, idle)):
+                rps, p50, p99, errors, opened = asyncio.run(load(port, clients, seconds, idleN))
+                print(f"{name:<8} {clients:>7} {opened:>9} {rps:9.0f} {p50:8.2f} {p99:8.2f} {errors:>7}")
+        finally:
+            proc.kill()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    idle = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    bench(seconds, idle)
@@ -0,0 +1,222 @@
+# Microbenchmark de tots els mètodes dels DAO en memòria (UserDAO, ChildDao i
+# TapDao de DaoServer) i del UserDao de primerPrototipo, amb dades generades
+# per datasetServer a diverses mides. Per a cada mida mostra la memòria que
+# ocupen les dades i cada DAO (tracemalloc) i les operacions per segon de cada
+# mètode. Els snapshots es guarden a --snapshots i es reutilitzen.
+# Ús: python benchDao.py [--sizes 10000 100000 1000000] [--days 7] [--seed 1]
+#                        [--snapshots dir] [--json resultat.json]
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+
+from dadesServer import User, Child, Tap
+from indexServer import RelationIndex
+from DaoServer import UserDAO, ChildDao, TapDao
+from datasetServer import loadOrGenerate, noGc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PRIMER = os.path.join(HERE, '..', '..', '..', 'primerPrototipo', 'server.py')
+
+
+def primerModule():
+    # primerPrototipo/server.py amb un altre nom (aquí "server" ja és el de prototip2)
+    spec = importlib.util.spec_from_file_location('primerServer', PRIMER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def consume(iterable):
+    deque(iterable, 0)
+
+
+def measure(build):
+    # (resultat, MB que ocupa el que ha construït build)
+    gc.collect()
+    tracemalloc.start()
+    with noGc():
+        result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size / 1e6
+
+
+def rate(fn, args, minTime):
+    # Lectures: es repeteix la llista d'arguments fins a passar minTime segons
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for a in args:
+            fn(*a)
+        calls += len(args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= minTime:
+            return calls / elapsed
+
+
+def once(fn, args):
+    # Escriptures: cada argument un sol cop (una alta no es pot repetir)
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    return len(args) / (time.perf_counter() - start)
+
+
+def benchUserDao(dao, data, rnd, lookups, writes, minTime):
+    n = len(data.users)
+    users = [data.users[rnd.randrange(n)] for _ in range(lookups)]
+    firstId = max(u.id for u in data.users) + 1
+    new = [User(id=firstId + i, username=f"bench{i}", password="pw", email=f"bench{i}@tapatapp.cat",
+                idrole=2, token="") for i in range(writes)]
+    cursors = [dao.getUsersPage(None, 100)[1]]
+    return {
+        "getUserByUsername": rate(dao.getUserByUsername, [(u.username,) for u in users], minTime),
+        "getUserByEmail": rate(dao.getUserByEmail, [(u.email,) for u in users], minTime),
+        "login": rate(dao.login, [(u.email, u.password) for u in users], minTime),
+        "getUserRole": rate(dao.getUserRole, [(u.id,) for u in users], minTime),
+        "getVersion": rate(dao.getVersion, [()] * lookups, minTime),
+        "getUsersPage(100)": rate(dao.getUsersPage, [(c, 100) for c in cursors] * 10, minTime),
+        "getAllUsers": rate(dao.getAllUsers, [()], minTime),
+        "iterAllUsers": rate(lambda: consume(dao.iterAllUsers()), [()], minTime),
+        "addUser": once(dao.addUser, [(u,) for u in new]),
+        "updateUser": once(lambda i: dao.updateUser(i, password="pw2"), [(u.id,) for u in new]),
+        "deleteUser": once(dao.deleteUser, [(u.id,) for u in new]),
+    }
+
+
+def benchChildDao(dao, data, rnd, lookups, writes, minTime):
+    users = [data.users[rnd.randrange(len(data.users))] for _ in range(lookups)]
+    children = [data.children[rnd.randrange(len(data.children))].id for _ in range(lookups)]
+    firstId = max(c.id for c in data.children) + 1
+    new = [Child(id=firstId + i, child_name=f"Bench {i}", sleep_average=9, treatment_id=1, time=4)
+           for i in range(writes)]
+    tutors = [users[i % len(users)].id for i in range(writes)]
+    return {
+        "getChild": rate(dao.getChild, [(u,) for u in users], minTime),
+        "getChildsOfUser": rate(dao.getChildsOfUser, [(u.id,) for u in users], minTime),
+        "getChildById": rate(dao.getChildById, [(c,) for c in children], minTime),
+        "getUsersOfChild": rate(dao.getUsersOfChild, [(c,) for c in children], minTime),
+        "getVersion(user)": rate(dao.getVersion, [(u.id,) for u in users], minTime),
+        "getAllChilds": rate(dao.getAllChilds, [()], minTime),
+        "iterAllChilds": rate(lambda: consume(dao.iterAllChilds()), [()], minTime),
+        "addChild": once(dao.addChild, [(c,) for c in new]),
+        "addRelation": once(dao.addRelation, [(u, c.id, 3) for u, c in zip(tutors, new)]),
+        "removeRelation": once(dao.removeRelation, [(u, c.id, 3) for u, c in zip(tutors, new)]),
+        "deleteChild": once(dao.deleteChild, [(c.id,) for c in new]),
+    }
+
+
+def benchTapDao(dao, data, rnd, lookups, writes, minTime):
+    taps = [data.taps[rnd.randrange(len(data.taps))] for _ in range(lookups)]
+    day = data.taps[len(data.taps) // 2].init[:10]
+    # Taps nous de l'endemà de l'últim dia de dades, com els que arriben del mòbil:
+    # tanquen el tap obert de cada nen i no en toquen cap altre
+    last = datetime.fromisoformat(max(t.init for t in data.taps)).date()
+    nextDay, bulkDay = last + timedelta(days=1), last + timedelta(days=2)
+    new = [Tap(id=0, child_id=t.child_id, status_id=2, user_id=t.user_id,
+               init=f"{nextDay}T08:{i % 60:02d}:00") for i, t in enumerate(taps[:writes])]
+    bulk = [Tap(id=0, child_id=t.child_id, status_id=2, user_id=t.user_id,
+                init=f"{bulkDay}T08:{i % 60:02d}:00") for i, t in enumerate(taps[:writes])]
+    result = {
+        "getTap": rate(dao.getTap, [(t.id,) for t in taps], minTime),
+        "getTapsByChild": rate(lambda c: consume(dao.getTapsByChild(c)), [(t.child_id,) for t in taps], minTime),
+        "getTapsByChild(dia)": rate(lambda c: consume(dao.getTapsByChild(c, f"{day}T00:00:00", f"{day}T23:59:59")),
+                                    [(t.child_id,) for t in taps], minTime),
+        "getTreatment": rate(dao.getTreatment, [(t.child_id, day) for t in taps], minTime),
+        "getVersion(child)": rate(dao.getVersion, [(t.child_id,) for t in taps], minTime),
+        "getTapsByDateRange(dia)": rate(lambda: consume(dao.getTapsByDateRange(f"{day}T00:00:00",
+                                                                              f"{day}T23:59:59")), [()], minTime),
+        "createTap": once(dao.createTap, [(t,) for t in new]),
+        "closeTap": once(dao.closeTap, [(t.id, f"{nextDay}T09:30:00") for t in new]),
+        "deleteTap": once(dao.deleteTap, [(t.id,) for t in new]),
+        # taps/s d'una sola alta en bloc
+        "createTaps(bulk)": len(bulk) * once(lambda: dao.createTaps(bulk, [f"bench-{i}" for i in range(len(bulk))]),
+                                             [()]),
+    }
+    return result
+
+
+def benchPrimerUserDao(dao, names, rnd, lookups, writes, minTime, module):
+    picked = [names[rnd.randrange(len(names))] for _ in range(lookups)]
+    new = [module.User(username=f"bench{i}", nom="Bench", password="pw", email=f"bench{i}@tapatapp.cat")
+           for i in range(writes)]
+    return {
+        "getUserByUsername": rate(dao.getUserByUsername, [(n,) for n in picked], minTime),
+        "userExists": rate(dao.userExists, [(n,) for n in picked], minTime),
+        "getUsersPage(100)": rate(dao.getUsersPage, [(None, 100)] * 10, minTime),
+        "getAllUsers": rate(dao.getAllUsers, [()], minTime),
+        "iterAllUsers": rate(lambda: consume(dao.iterAllUsers()), [()], minTime),
+        "addUser": once(dao.addUser, [(u,) for u in new]),
+        "deleteUser": once(dao.deleteUser, [(u.username,) for u in new]),
+    }
+
+
+def bench(size, args, primer):
+    print(f"\n== {size} usuaris ==", flush=True)
+    path = os.path.join(args.snapshots, f"dataset-{size}-{args.days}d-s{args.seed}.snap.gz")
+    start = time.perf_counter()
+    data, dataMb = measure(lambda: loadOrGenerate(path, size, args.days, args.seed))
+    print(f"dades: {len(data.users)} users, {len(data.children)} children, {len(data.relations)} relacions, "
+          f"{len(data.taps)} taps ({time.perf_counter() - start:.1f} s, {dataMb:.0f} MB)")
+
+    # Cada DAO té els seus índexs; les dades (objectes) són compartides
+    relations, relationsMb = measure(lambda: RelationIndex(data.relations))
+    userDao, userMb = measure(lambda: UserDAO(data.users, relations=relations))
+    childDao, childMb = measure(lambda: ChildDao(data.children, relations=relations))
+    tapDao, tapMb = measure(lambda: TapDao(data.taps))
+    primer.listuser = [primer.User(username=u.username, nom=u.username, password=u.password, email=u.email)
+                       for u in data.users]
+    primerDao, primerMb = measure(primer.UserDao)
+    memory = {"dataset": dataMb, "RelationIndex": relationsMb, "UserDAO": userMb, "ChildDao": childMb,
+              "TapDao": tapMb, "primerPrototipo.UserDao": primerMb}
+    for name, mb in memory.items():
+        print(f"  memòria {name:<24} {mb:9.1f} MB")
+
+    rnd = random.Random(args.seed)
+    opts = (rnd, args.lookups, args.writes, args.min_time)
+    results = {
+        "UserDAO": benchUserDao(userDao, data, *opts),
+        "ChildDao": benchChildDao(childDao, data, *opts),
+        "TapDao": benchTapDao(tapDao, data, *opts),
+        "primerPrototipo.UserDao": benchPrimerUserDao(primerDao, [u.username for u in data.users],
+                                                      *opts, primer),
+    }
+    for dao, methods in results.items():
+        for method, ops in methods.items():
+            print(f"  {dao + '.' + method:<44} {ops:14,.0f} ops/s")
+    return {"users": len(data.users), "children": len(data.children), "relations": len(data.relations),
+            "taps": len(data.taps), "memory_mb": memory, "ops_per_sec": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark dels DAO amb dades generades")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--days', type=int, default=7, help="dies de taps per nen")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--lookups', type=int, default=1000, help="arguments diferents per a les lectures")
+    parser.add_argument('--writes', type=int, default=200, help="altes/modificacions/baixes per mètode")
+    parser.add_argument('--min-time', type=float, default=0.2, help="segons mínims per mètode de lectura")
+    parser.add_argument('--snapshots', default=os.path.join(HERE, 'snapshots'))
+    parser.add_argument('--json', help="fitxer on escriure els resultats")
+    args = parser.parse_args()
+    os.makedirs(args.snapshots, exist_ok=True)
+
+    primer = primerModule()
+    report = {"python": sys.version.split()[0], "days": args.days, "seed": args.seed, "sizes": []}
+    for size in args.sizes:
+        report["sizes"].append(bench(size, args, primer))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Microbenchmark: resposta de 10k registres amb ApiResponse + asdict + jsonify
+# contra encoderServer.encodeApiResponse
+# Ús: python benchEncoder.py [registres]   (per defecte 10000)
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+
+from flask import jsonify
+
+from dadesServer import User, Tap
+from DaoServer import UserDAO
+from encoderServer import encodeApiResponse
+from server import app, ApiResponse
+
+
+def measure(fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        size = len(fn())
+    elapsed = (time.perf_counter() - start) / repeat
+    # Memòria reservada durant la crida (pic, amb tracemalloc)
+    tracemalloc.start()
+    fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def report(name, size, elapsed, peak):
+    print(f"  {name:<26} {elapsed * 1000:8.2f} ms  {size / elapsed / 1e6:8.1f} MB/s"
+          f"  memòria pic {peak / 1024:9.0f} KB")
+
+
+def bench(n):
+    userDao = UserDAO([User(id=i, username=f"user{i}", password="x", email=f"user{i}@tapatapp.cat",
+                            idrole=1, token="") for i in range(1, n + 1)])
+    taps = [Tap(id=i, child_id=i % 50, status_id=1 + i % 3, user_id=1, init="2024-12-18T19:42:43")
+            for i in range(1, n + 1)]
+
+    # asdict no sap copiar objectes que no són dataclass: el camí antic rep diccionaris
+    cases = (("users (dicts del DAO)", userDao.getAllUsers, userDao.getAllUsers),
+             ("taps (objectes del model)", lambda: [t.to_dict() for t in taps], lambda: taps))
+    for title, oldData, newData in cases:
+        print(f"{n} {title}")
+        with app.app_context():
+            old = measure(lambda: jsonify(asdict(ApiResponse(msg="All", coderesponse="1", data=oldData()))).get_data())
+        new = measure(lambda: encodeApiResponse(ApiResponse(msg="All", coderesponse="1", data=newData())))
+        report("asdict + jsonify", *old)
+        report("encodeApiResponse", *new)
+        print(f"  x{old[1] / new[1]:.1f} més ràpid")
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,98 @@
+# Informe de memòria: bytes per registre de les classes del model
+# abans (classe normal amb __dict__) i ara (__slots__), i dels taps en TapTable
+# i en TapStore (el magatzem de TapDao: TapTable + índexs per child)
+# Ús: python benchMemory.py [registres]   (per defecte 100000)
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+from dadesServer import User, Child, Tap
+from tapTable import TapTable, TapStore
+
+
+# Còpia de les classes tal com eren abans (amb __dict__ per instància)
+class OldUser:
+    def __init__(self, id, username, password, email, idrole, token):
+        self.id = id
+        self.username = username
+        self.password = password
+        self.email = email
+        self.idrole = id
+        self.token = token
+
+
+class OldChild:
+    def __init__(self, id, child_name, sleep_average, treatment_id, time):
+        self.id = id
+        self.child_name = child_name
+        self.sleep_average = sleep_average
+        self.treatment_id = treatment_id
+        self.time = time
+
+
+class OldTap:
+    def __init__(self, id, child_id, status_id, user_id, init, end=None):
+        self.id = id
+        self.child_id = child_id
+        self.status_id = status_id
+        self.user_id = user_id
+        self.init = init
+        self.end = end
+
+
+def perRecord(build, n):
+    tracemalloc.start()
+    data = build(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size / n
+
+
+def users(cls):
+    return lambda n: [cls(i, f"user{i}", "pw", f"user{i}@tapatapp.cat", 1, "") for i in range(n)]
+
+
+def children(cls):
+    return lambda n: [cls(i, f"Child {i}", 8, 1, 6) for i in range(n)]
+
+
+def taps(cls):
+    base = datetime(2024, 1, 1)
+    return lambda n: [cls(i, i % 1000, 1 + i % 3, 1, (base + timedelta(minutes=i)).isoformat(),
+                          (base + timedelta(minutes=i + 30)).isoformat()) for i in range(1, n + 1)]
+
+
+def tapTable(n):
+    # Les dates es creen i es descarten: només queden les columnes
+    table = TapTable()
+    base = datetime(2024, 1, 1)
+    for i in range(1, n + 1):
+        table.append(Tap(i, i % 1000, 1 + i % 3, 1, (base + timedelta(minutes=i)).isoformat(),
+                         (base + timedelta(minutes=i + 30)).isoformat()))
+    return table
+
+
+def tapStore(n):
+    return TapStore(taps(Tap)(n))
+
+
+def oldTapStore(n):
+    # Com era TapStore abans: diccionari per id i llistes de segons i de Tap per child
+    byId, byChild = {}, {}
+    for tap in taps(Tap)(n):
+        byId[tap.id] = tap
+        times, childTaps = byChild.setdefault(tap.child_id, ([], []))
+        times.append(int((datetime.fromisoformat(tap.init) - datetime(1970, 1, 1)).total_seconds()))
+        childTaps.append(tap)
+    return byId, byChild
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"bytes per registre ({n} registres, inclou strings)")
+    print(f"  User   abans {perRecord(users(OldUser), n):6.0f}   __slots__ {perRecord(users(User), n):6.0f}")
+    print(f"  Child  abans {perRecord(children(OldChild), n):6.0f}   __slots__ {perRecord(children(Child), n):6.0f}")
+    print(f"  Tap    abans {perRecord(taps(OldTap), n):6.0f}   __slots__ {perRecord(taps(Tap), n):6.0f}"
+          f"   TapTable {perRecord(tapTable, n):6.0f}")
+    print(f"  TapStore abans {perRecord(oldTapStore, n):6.0f}   TapTable {perRecord(tapStore, n):6.0f}")
@@ -0,0 +1,71 @@
+# Cost de les mètriques per petició: begin + end de Metrics (el que s'afegeix a
+# cada petició) i el mateix amb dues crides a DAO i una serialització
+# cronometrades; l'agregació que es fa en segon pla; i una petició de Flask
+# sencera (test_client) amb i sense mètriques.
+# Ús: python benchMetrics.py [peticions]   (per defecte 200000)
+import sys
+import time
+
+from flask import Flask, jsonify
+
+from metricsServer import Metrics, TimedDao, instrument, SERIALIZE
+
+
+class Dao:
+    def get(self, key):
+        return key
+
+
+def perRequest(fn, n):
+    start = time.perf_counter_ns()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter_ns() - start) / n
+
+
+def flaskRequest(instrumented, n):
+    app = Flask(__name__)
+    if instrumented:
+        instrument(app, Metrics())
+
+    @app.route('/taps/<int:tap_id>')
+    def tap(tap_id):
+        return jsonify({"id": tap_id})
+
+    client = app.test_client()
+    return perRequest(lambda i: client.get(f'/taps/{i % 100}'), n)
+
+
+def bench(n):
+    metrics = Metrics(flushEvery=3600)   # s'agrega a part, al final
+    routes = ['/taps/<int:tap_id>', '/children', '/getusers', '/login']
+    seconds = [0.0004, 0.003, 0.02, 0.3]
+
+    def bare(i):
+        route = routes[i & 3]
+        metrics.end(route, 'GET', 200, seconds[i & 3], metrics.begin(route))
+
+    dao = TimedDao(Dao(), metrics)
+    encode = metrics.timed(SERIALIZE, str)
+
+    def phases(i):
+        route = routes[i & 3]
+        previous = metrics.begin(route)
+        dao.get(i)
+        dao.get(i)
+        encode(i)
+        metrics.end(route, 'GET', 200, seconds[i & 3], previous)
+
+    print(f"begin + end                         {perRequest(bare, n):8.0f} ns/petició")
+    print(f"begin + end + 2 DAO + serialitzar   {perRequest(phases, n):8.0f} ns/petició")
+    start = time.perf_counter_ns()
+    metrics.flush()
+    print(f"agregació en segon pla              {(time.perf_counter_ns() - start) / (2 * n):8.0f} ns/petició")
+    m = max(n // 50, 1000)
+    plain, timed = flaskRequest(False, m), flaskRequest(True, m)
+    print(f"Flask test_client sense mètriques   {plain:8.0f} ns/petició")
+    print(f"Flask test_client amb mètriques     {timed:8.0f} ns/petició  (+{timed - plain:.0f})")
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
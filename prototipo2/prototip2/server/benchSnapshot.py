@@ -0,0 +1,138 @@
+# Arrencada d'un treballador amb el snapshot gzip (datasetServer: parsejar-ho
+# tot a objectes) i amb el snapshot binari (binarySnapshot: mmap i consultar).
+# Mesura el temps fins a la primera consulta, les consultes per segon i la
+# memòria de --workers processos amb les dades obertes alhora: Rss i Pss
+# (la part proporcional de les pàgines compartides, /proc/self/smaps_rollup).
+# Ús: python benchSnapshot.py [--users 100000] [--days 7] [--seed 1] [--workers 4]
+#                             [--snapshots dir]
+import argparse
+import json
+import mmap
+import os
+import random
+import subprocess
+import sys
+import time
+
+import datasetServer
+from binarySnapshot import BinarySnapshot, save, EXTENSION
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAGE = mmap.PAGESIZE
+
+
+def memory():
+    # (Rss, Pss) en MB del procés; Pss només a Linux
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line[0].isdigit())
+        return int(fields['Rss'].split()[0]) / 1024, int(fields['Pss'].split()[0]) / 1024
+    except (OSError, KeyError):
+        return None, None
+
+
+def worker(kind, path):
+    # Procés treballador: obre les dades, fa una consulta, toca totes les pàgines,
+    # avisa i espera que els altres també les tinguin obertes abans de mesurar
+    start = time.perf_counter()
+    if kind == "gzip":
+        data = datasetServer.load(path)
+        first = next(u for u in data.users if u.username == "tutor1")
+    else:
+        snapshot = BinarySnapshot(path)
+        first = snapshot.userByUsername("tutor1")
+        for offset in range(0, len(snapshot.mm), PAGE):
+            snapshot.mm[offset]
+    ready = time.perf_counter() - start
+    print("ready", flush=True)
+    sys.stdin.readline()
+    rss, pss = memory()
+    print(json.dumps({"ready_s": ready, "rss_mb": rss, "pss_mb": pss, "ok": first is not None}), flush=True)
+
+
+def workers(kind, path, n):
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", kind, path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=HERE)
+             for _ in range(n)]
+    for p in procs:
+        assert p.stdout.readline().strip() == "ready"
+    results = []
+    for p in procs:
+        p.stdin.write("go\n")
+        p.stdin.flush()
+        results.append(json.loads(p.stdout.readline()))
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return results
+
+
+def rate(fn, args, minTime=0.3):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for a in args:
+            fn(*a)
+        calls += len(args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= minTime:
+            return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot gzip vs snapshot binari amb mmap")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--snapshots', default=os.path.join(HERE, 'snapshots'))
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(*args.worker)
+
+    os.makedirs(args.snapshots, exist_ok=True)
+    name = os.path.join(args.snapshots, f"dataset-{args.users}-{args.days}d-s{args.seed}")
+    data = datasetServer.loadOrGenerate(name + ".snap.gz", args.users, args.days, args.seed)
+    binary = name + EXTENSION
+    if not os.path.exists(binary) or os.path.getmtime(binary) < os.path.getmtime(name + ".snap.gz"):
+        save(data, binary)
+    print(f"{len(data.users)} users, {len(data.children)} children, {len(data.taps)} taps; "
+          f"gzip {os.path.getsize(name + '.snap.gz') / 1e6:.1f} MB, binari {os.path.getsize(binary) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    datasetServer.load(name + ".snap.gz")
+    print(f"  gzip: carregar a objectes          {time.perf_counter() - start:8.3f} s")
+    start = time.perf_counter()
+    snapshot = BinarySnapshot(binary)
+    snapshot.userByUsername("tutor1")
+    print(f"  binari: obrir + primera consulta   {time.perf_counter() - start:8.4f} s")
+    start = time.perf_counter()
+    snapshot.dataset()
+    print(f"  binari: dataset() a objectes       {time.perf_counter() - start:8.3f} s")
+
+    rnd = random.Random(args.seed)
+    users = [data.users[rnd.randrange(len(data.users))] for _ in range(1000)]
+    children = [data.children[rnd.randrange(len(data.children))].id for _ in range(1000)]
+    day = data.taps[len(data.taps) // 2].init[:10]
+    for label, fn, calls in (
+            ("userByUsername", snapshot.userByUsername, [(u.username,) for u in users]),
+            ("userByEmail", snapshot.userByEmail, [(u.email,) for u in users]),
+            ("childrenOfUser", snapshot.childrenOfUser, [(u.id,) for u in users]),
+            ("userIdsOfChild", snapshot.userIdsOfChild, [(c,) for c in children]),
+            ("tapsByChild", snapshot.tapsByChild, [(c,) for c in children]),
+            ("tapsByChild(dia)", snapshot.tapsByChild,
+             [(c, f"{day}T00:00:00", f"{day}T23:59:59") for c in children])):
+        print(f"  binari: {label:<26} {rate(fn, calls):12,.0f} ops/s")
+
+    for kind, path in (("gzip", name + ".snap.gz"), ("binari", binary)):
+        results = workers(kind, path, args.workers)
+        ready = max(r["ready_s"] for r in results)
+        rss = sum(r["rss_mb"] or 0 for r in results)
+        pss = sum(r["pss_mb"] or 0 for r in results)
+        print(f"  {args.workers} treballadors {kind:<6}: a punt en {ready:7.3f} s, "
+              f"Rss total {rss:8.1f} MB, Pss total {pss:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
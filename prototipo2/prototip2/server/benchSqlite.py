@@ -0,0 +1,82 @@
+# Benchmark de throughput: DAOs en memòria (DaoServer) contra DAOs SQLite (sqliteServer)
+# Ús: python benchSqlite.py [users] [fitxer.sqlite]   (per defecte 20000, fitxer temporal)
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from dadesServer import User, Child, Tap
+from DaoServer import UserDAO, ChildDao, TapDao
+from indexServer import RelationIndex
+from sqliteServer import SqliteDatabase, SqliteUserDAO, SqliteChildDao, SqliteTapDao
+
+
+def makeData(n, tapsPerChild=20):
+    base = datetime(2024, 1, 1)
+    users = [User(i, f"user{i}", f"pw{i}", f"user{i}@tapatapp.cat", 1, "") for i in range(1, n + 1)]
+    children = [Child(i, f"Child {i}", 8, 1 + i % 2, 6) for i in range(1, n // 2 + 1)]
+    relations = []
+    for c in children:
+        relations.append({"user_id": 2 * c.id - 1, "child_id": c.id, "rol_id": 2})
+        relations.append({"user_id": 2 * c.id, "child_id": c.id, "rol_id": 3})
+    taps = [Tap(len(children) * k + c.id, c.id, 1 + k % 3, 2 * c.id - 1,
+                (base + timedelta(hours=3 * k)).isoformat())
+            for k in range(tapsPerChild) for c in children]
+    return users, children, relations, taps
+
+
+def throughput(fn, args):
+    start = time.perf_counter()
+    for a in args:
+        result = fn(*a)
+        if hasattr(result, '__next__'):
+            list(result)
+    return len(args) / (time.perf_counter() - start)
+
+
+def bench(n, path):
+    users, children, relations, taps = makeData(n)
+    rnd = random.Random(1)
+    ops = 2000
+
+    index = RelationIndex(relations)
+    memory = (UserDAO(users, index), ChildDao(children, index), TapDao(taps))
+    db = SqliteDatabase(path)
+    start = time.perf_counter()
+    db.load(users, children, relations, taps)
+    loadT = time.perf_counter() - start
+    sqlite = (SqliteUserDAO(db), SqliteChildDao(db), SqliteTapDao(db))
+
+    ids = [rnd.randint(1, n) for _ in range(ops)]
+    childIds = [rnd.randint(1, n // 2) for _ in range(ops)]
+    cases = [
+        ("login", lambda d: d[0].login, [(f"user{i}@tapatapp.cat", f"pw{i}") for i in ids]),
+        ("getUserByUsername", lambda d: d[0].getUserByUsername, [(f"user{i}",) for i in ids]),
+        ("getChild", lambda d: d[1].getChild, [(User(i, "", "", "", 1, ""),) for i in ids]),
+        ("getTapsByChild (1 dia)", lambda d: d[2].getTapsByChild,
+         [(c, "2024-01-02T00:00:00", "2024-01-02T23:59:59") for c in childIds]),
+        ("getUsersPage (100)", lambda d: d[0].getUsersPage, [(None, 100)] * (ops // 10)),
+        ("createTap", lambda d: d[2].createTap,
+         [(Tap(0, c, 1, 1, "2024-02-01T10:00:00"),) for c in childIds]),
+    ]
+    print(f"{n} users, {len(children)} children, {len(taps)} taps (càrrega SQLite {loadT:.2f} s)")
+    print(f"  {'operació':<24} {'memòria ops/s':>14} {'sqlite ops/s':>14}")
+    for name, method, args in cases:
+        mem = throughput(method(memory), args)
+        # createTap modifica els objectes: se'n fan de nous per a SQLite
+        if name == "createTap":
+            args = [(Tap(0, a[0].child_id, 1, 1, a[0].init),) for a in args]
+        sql = throughput(method(sqlite), args)
+        print(f"  {name:<24} {mem:14.0f} {sql:14.0f}")
+    db.close()
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    if len(sys.argv) > 2:
+        bench(n, sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            bench(n, os.path.join(tmp, "bench.sqlite"))
@@ -0,0 +1,78 @@
+# Benchmark: durades diàries de pegat/son amb un bucle Python sobre objectes Tap
+# contra tapColumns (numpy)
+# Ús: python benchTapColumns.py [children] [dies]   (per defecte 1000 30)
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+from dadesServer import Tap, SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH
+from indexServer import parseTime, DAY
+from tapColumns import TapColumns, dailyDurations
+
+
+def makeTaps(children, days, seed=1):
+    rnd = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    taps = []
+    for child_id in range(1, children + 1):
+        t = base + timedelta(minutes=rnd.randint(0, 600))
+        stop = base + timedelta(days=days)
+        while t < stop:
+            status = rnd.choice((SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH))
+            taps.append(Tap(id=len(taps) + 1, child_id=child_id, status_id=status,
+                            user_id=1, init=t.isoformat()))
+            t += timedelta(minutes=rnd.randint(20, 240))
+    return taps
+
+
+def pythonDaily(taps):
+    # Bucle "normal": ordenar per child, cada tap dura fins al següent i es reparteix per dies
+    result = {}
+    byChild = {}
+    for tap in taps:
+        byChild.setdefault(tap.child_id, []).append(tap)
+    for child_id, childTaps in byChild.items():
+        childTaps.sort(key=lambda t: parseTime(t.init))
+        for i, tap in enumerate(childTaps):
+            start = parseTime(tap.init)
+            end = parseTime(childTaps[i + 1].init) if i + 1 < len(childTaps) else start
+            while True:
+                day = start // DAY
+                pieceEnd = min(end, (day + 1) * DAY)
+                row = result.setdefault((child_id, day), {SLEEP: 0, AWAKE_PATCH: 0, AWAKE_NO_PATCH: 0})
+                row[tap.status_id] += pieceEnd - start
+                if pieceEnd >= end:
+                    break
+                start = pieceEnd
+    return result
+
+
+def bench(children, days):
+    taps = makeTaps(children, days)
+
+    start = time.perf_counter()
+    expected = pythonDaily(taps)
+    pyT = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cols = TapColumns.fromTaps(taps)
+    buildT = time.perf_counter() - start
+    start = time.perf_counter()
+    totals = dailyDurations(cols)
+    npT = time.perf_counter() - start
+
+    for i in range(len(totals['child'])):
+        row = expected[(int(totals['child'][i]), int(totals['day'][i]))]
+        assert row[SLEEP] == totals['sleep'][i] and row[AWAKE_PATCH] == totals['wear'][i]
+
+    print(f"{len(taps)} taps, {children} children x {days} dies")
+    print(f"  python loop       {pyT * 1000:9.1f} ms")
+    print(f"  numpy (columnes)  {npT * 1000:9.1f} ms  x{pyT / npT:.0f}"
+          f"   (construir columnes: {buildT * 1000:.1f} ms)")
+
+
+if __name__ == '__main__':
+    children = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    bench(children, days)
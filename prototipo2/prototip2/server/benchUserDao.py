@@ -0,0 +1,63 @@
+# Benchmark: login/getUserByUsername amb recorregut de la llista
+# (implementació antiga de UserDAO) contra UserDAO amb índex
+# Ús: python benchUserDao.py [mides...]   (per defecte 1000 100000 1000000)
+import sys
+import time
+import random
+
+from dadesServer import User
+from DaoServer import UserDAO
+
+
+def scanLogin(users, identifier, password):
+    for user in users:
+        if (user.username == identifier or user.email == identifier) and user.password == password:
+            return user
+    return None
+
+
+def scanGetUserByUsername(users, username):
+    for user in users:
+        if user.username == username:
+            return user.to_dict()
+    return None
+
+
+def makeUsers(n):
+    return [User(id=i, username=f"user{i}", password=f"pw{i}",
+                 email=f"user{i}@tapatapp.cat", idrole=1, token="")
+            for i in range(1, n + 1)]
+
+
+def timeit(fn, args, repeat):
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(n, lookups=200):
+    users = makeUsers(n)
+    dao = UserDAO(users)
+    rnd = random.Random(n)
+    ids = [rnd.randint(1, n) for _ in range(lookups)]
+    loginArgs = [(f"user{i}@tapatapp.cat", f"pw{i}") for i in ids]
+    nameArgs = [(f"user{i}",) for i in ids]
+
+    # El recorregut és lent amb moltes dades: es fan menys consultes
+    scanN = max(1, min(lookups, 20_000_000 // n))
+    scanLoginT = timeit(lambda i, p: scanLogin(users, i, p), loginArgs[:scanN], scanN)
+    scanNameT = timeit(lambda u: scanGetUserByUsername(users, u), nameArgs[:scanN], scanN)
+    idxLoginT = timeit(dao.login, loginArgs, lookups)
+    idxNameT = timeit(dao.getUserByUsername, nameArgs, lookups)
+
+    print(f"{n:>9} users | login scan {scanLoginT * 1e6:12.1f} us  index {idxLoginT * 1e6:8.2f} us"
+          f"  x{scanLoginT / idxLoginT:10.0f}")
+    print(f"{'':>9}       | byName scan {scanNameT * 1e6:11.1f} us  index {idxNameT * 1e6:8.2f} us"
+          f"  x{scanNameT / idxNameT:10.0f}")
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 100_000, 1_000_000]
+    for n in sizes:
+        bench(n)
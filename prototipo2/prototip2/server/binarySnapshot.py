@@ -0,0 +1,499 @@
+# Snapshot binari de les dades (users, children, relacions i taps) per obrir-lo
+# amb mmap i consultar-lo sense parsejar res. Cada camp és una columna d'amplada
+# fixa (com TapTable) i els strings van tots junts en un sol heap. Com que el
+# fitxer es llegeix amb mmap, obrir-lo només llegeix la capçalera; les pàgines
+# es carreguen quan es consulten i els processos que obren el mateix fitxer
+# comparteixen les mateixes pàgines (la cache de pàgines del sistema).
+#
+# Format (little-endian, columnes alineades a 8 bytes):
+#   capçalera  MAGIC, VERSION, nombre de columnes
+#   índex      per columna: nom, typecode d'array, offset, nombre d'elements
+#   columnes   users.*, children.*, relations.*, taps.* i heap
+#  - strings: columna 'I' amb n+1 offsets dins del heap (string i = heap[off[i]:off[i+1]])
+#  - dates dels taps en segons (indexServer.parseTime); end = -1 si el tap és obert
+#  - users, children i taps ordenats per id; relacions per (user_id, child_id)
+#  - índexs: users per username i per email, relacions per child, taps per
+#    (child, init) amb l'inici de cada child a children.taps
+#
+# Ús:
+#   python binarySnapshot.py dades.tapsnap --users 100000 [--days 7] [--seed 1]
+#   python binarySnapshot.py dades.tapsnap --from dades.snap.gz
+#   snapshot = BinarySnapshot('dades.tapsnap')
+#   snapshot.userByUsername('tutor1'), snapshot.tapsByChild(7, '2024-11-02T00:00:00')
+#   tapDao = SnapshotTapDao(snapshot)   # DAO només de lectura (TAPATAPP_SNAPSHOT=*.tapsnap)
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from dadesServer import User, Child, Tap
+from indexServer import parseTime, normalizeEmail, encodeCursor, decodeCursor, DAY
+from tapTable import formatTime, NO_END
+from treatmentAccumulator import SLOT, summaryOf
+
+MAGIC = b"TAPSNAP\0"
+VERSION = 1
+EXTENSION = ".tapsnap"
+HEADER = struct.Struct("<8sII")
+ENTRY = struct.Struct("<24sc7xQQ")   # nom, typecode, offset, elements
+ALIGN = 8
+MAX_HEAP = 2 ** 32 - 1               # els offsets del heap són 'I'
+
+
+class StringColumn:
+    # Strings d'una columna a partir del heap; es construeix mentre s'escriu
+    def __init__(self, heap):
+        self.heap = heap
+        self.offsets = array('I', [len(heap)])
+
+    def append(self, value):
+        self.heap += value.encode('utf-8')
+        if len(self.heap) > MAX_HEAP:
+            raise ValueError("Massa strings per a un snapshot binari (heap > 4 GB)")
+        self.offsets.append(len(self.heap))
+
+
+def permutation(n, key):
+    return array('I', sorted(range(n), key=key))
+
+
+def columnsOf(data):
+    # Dataset (datasetServer) -> {nom: array}
+    heap = bytearray()
+    users = sorted(data.users, key=lambda u: u.id)
+    children = sorted(data.children, key=lambda c: c.id)
+    relations = sorted(data.relations, key=lambda r: (r["user_id"], r["child_id"]))
+    taps = sorted(data.taps, key=lambda t: t.id)
+    columns = {}
+
+    columns["users.id"] = array('i', (u.id for u in users))
+    columns["users.idrole"] = array('i', (u.idrole for u in users))
+    for field in ("username", "password", "email"):
+        strings = StringColumn(heap)
+        for user in users:
+            strings.append(getattr(user, field))
+        columns[f"users.{field}"] = strings.offsets
+    # Índexs per username i per email (normalitzat, com UserIndex): files ordenades pel string
+    usernames = [u.username.encode('utf-8') for u in users]
+    emails = [normalizeEmail(u.email).encode('utf-8') for u in users]
+    columns["users.byUsername"] = permutation(len(users), usernames.__getitem__)
+    columns["users.byEmail"] = permutation(len(users), emails.__getitem__)
+
+    columns["children.id"] = array('i', (c.id for c in children))
+    columns["children.sleep_average"] = array('b', (c.sleep_average for c in children))
+    columns["children.treatment_id"] = array('b', (c.treatment_id for c in children))
+    columns["children.time"] = array('b', (c.time for c in children))
+    strings = StringColumn(heap)
+    for child in children:
+        strings.append(child.child_name)
+    columns["children.child_name"] = strings.offsets
+
+    columns["relations.user_id"] = array('i', (r["user_id"] for r in relations))
+    columns["relations.child_id"] = array('i', (r["child_id"] for r in relations))
+    columns["relations.rol_id"] = array('b', (r["rol_id"] for r in relations))
+    columns["relations.byChild"] = permutation(len(relations),
+                                               lambda i: (relations[i]["child_id"], relations[i]["user_id"]))
+
+    inits = array('q', (parseTime(t.init) for t in taps))
+    columns["taps.id"] = array('q', (t.id for t in taps))
+    columns["taps.child_id"] = array('i', (t.child_id for t in taps))
+    columns["taps.status_id"] = array('b', (t.status_id for t in taps))
+    columns["taps.user_id"] = array('i', (t.user_id for t in taps))
+    columns["taps.init"] = inits
+    columns["taps.end"] = array('q', (NO_END if t.end is None else parseTime(t.end) for t in taps))
+    byChild = permutation(len(taps), lambda i: (taps[i].child_id, inits[i], taps[i].id))
+    columns["taps.byChild"] = byChild
+    # children.taps[fila del child]: on comencen els seus taps a taps.byChild (n+1 valors)
+    tapChildren = [taps[i].child_id for i in byChild]
+    columns["children.taps"] = array('I', (bisect_left(tapChildren, c.id) for c in children))
+    columns["children.taps"].append(bisect_right(tapChildren, children[-1].id) if children else 0)
+
+    columns["heap"] = array('B', heap)
+    return columns
+
+
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save(data, path):
+    # Escriu a un fitxer temporal i el reanomena: mai queda un snapshot a mitges
+    columns = columnsOf(data)
+    offset = aligned(HEADER.size + ENTRY.size * len(columns))
+    entries = []
+    for name, column in columns.items():
+        entries.append((name, column, offset))
+        offset = aligned(offset + column.itemsize * len(column))
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(columns)))
+        for name, column, start in entries:
+            f.write(ENTRY.pack(name.encode(), column.typecode.encode(), start, len(column)))
+        for name, column, start in entries:
+            f.write(b"\0" * (start - f.tell()))
+            if sys.byteorder != 'little':
+                column = array(column.typecode, column)
+                column.byteswap()
+            column.tofile(f)
+    os.replace(tmp, path)
+    return {name: len(column) for name, column in columns.items()}
+
+
+class BinarySnapshot:
+    # Consultes directes sobre el fitxer: cada crida crea només els objectes
+    # (User, Child, Tap) que retorna
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise ValueError("El snapshot binari només es pot obrir en màquines little-endian")
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"{path} no és un snapshot binari de TapatApp (versió {VERSION})")
+        self.view = memoryview(self.mm)
+        self.columns = {}
+        for i in range(count):
+            name, typecode, offset, length = ENTRY.unpack_from(self.mm, HEADER.size + i * ENTRY.size)
+            name, typecode = name.rstrip(b"\0").decode(), typecode.decode()
+            if name == "heap":
+                # Els strings es llegeixen directament del mmap (els slices són bytes)
+                self.heapStart = offset
+                continue
+            size = array(typecode).itemsize
+            self.columns[name] = self.view[offset:offset + length * size].cast(typecode)
+        for name, column in self.columns.items():
+            setattr(self, name.replace('.', '_'), column)
+
+    def close(self):
+        # Les columnes són vistes del mmap: s'han d'alliberar abans de tancar-lo
+        for name, column in self.columns.items():
+            column.release()
+            delattr(self, name.replace('.', '_'))
+        self.columns = {}
+        self.view.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def counts(self):
+        return {"users": len(self.users_id), "children": len(self.children_id),
+                "relations": len(self.relations_user_id), "taps": len(self.taps_id)}
+
+    def string(self, offsets, row):
+        start = self.heapStart
+        return self.mm[start + offsets[row]:start + offsets[row + 1]]
+
+    @staticmethod
+    def find(column, value):
+        # Fila de value en una columna ordenada, o None
+        row = bisect_left(column, value)
+        if row < len(column) and column[row] == value:
+            return row
+        return None
+
+    # Users
+    def user(self, row):
+        return User(id=self.users_id[row], username=self.string(self.users_username, row).decode(),
+                    password=self.string(self.users_password, row).decode(),
+                    email=self.string(self.users_email, row).decode(), idrole=self.users_idrole[row], token="")
+
+    def userById(self, user_id):
+        row = self.find(self.users_id, user_id)
+        return None if row is None else self.user(row)
+
+    def findString(self, order, offsets, value):
+        # Cerca binària a l'índex order comparant els bytes del heap
+        key = value.encode('utf-8')
+        i = bisect_left(order, key, key=lambda row: self.string(offsets, row))
+        if i < len(order) and self.string(offsets, order[i]) == key:
+            return order[i]
+        return None
+
+    def userByUsername(self, username):
+        row = self.findString(self.users_byUsername, self.users_username, username)
+        return None if row is None else self.user(row)
+
+    def userByEmail(self, email):
+        # users.byEmail està ordenat per l'email normalitzat: es compara amb el mateix
+        email = normalizeEmail(email)
+        if email is None:
+            return None
+        email = email.encode('utf-8')
+        order, offsets = self.users_byEmail, self.users_email
+        key = lambda row: normalizeEmail(self.string(offsets, row).decode()).encode('utf-8')
+        i = bisect_left(order, email, key=key)
+        if i < len(order) and key(order[i]) == email:
+            return self.user(order[i])
+        return None
+
+    # Children
+    def child(self, row):
+        return Child(id=self.children_id[row], child_name=self.string(self.children_child_name, row).decode(),
+                     sleep_average=self.children_sleep_average[row], treatment_id=self.children_treatment_id[row],
+                     time=self.children_time[row])
+
+    def childById(self, child_id):
+        row = self.find(self.children_id, child_id)
+        return None if row is None else self.child(row)
+
+    def childIdsOfUser(self, user_id):
+        start = bisect_left(self.relations_user_id, user_id)
+        end = bisect_right(self.relations_user_id, user_id)
+        return list(self.relations_child_id[start:end])
+
+    def childrenOfUser(self, user_id):
+        return [self.childById(child_id) for child_id in self.childIdsOfUser(user_id)]
+
+    def userIdsOfChild(self, child_id):
+        order, childIds = self.relations_byChild, self.relations_child_id
+        start = bisect_left(order, child_id, key=childIds.__getitem__)
+        end = bisect_right(order, child_id, lo=start, key=childIds.__getitem__)
+        return [self.relations_user_id[i] for i in order[start:end]]
+
+    # Taps
+    def tap(self, row):
+        end = self.taps_end[row]
+        return Tap(id=self.taps_id[row], child_id=self.taps_child_id[row], status_id=self.taps_status_id[row],
+                   user_id=self.taps_user_id[row], init=formatTime(self.taps_init[row]),
+                   end=None if end == NO_END else formatTime(end))
+
+    def tapById(self, tap_id):
+        row = self.find(self.taps_id, tap_id)
+        return None if row is None else self.tap(row)
+
+    def tapRange(self, child_id, start=None, end=None):
+        # (primera, última) posició a taps.byChild dels taps del child amb
+        # start <= init <= end; start/end en ISO o segons
+        row = self.find(self.children_id, child_id)
+        if row is None:
+            return 0, 0
+        first, last = self.children_taps[row], self.children_taps[row + 1]
+        order, inits = self.taps_byChild, self.taps_init
+        if start is not None:
+            first = bisect_left(order, parseTime(start), first, last, key=inits.__getitem__)
+        if end is not None:
+            last = bisect_right(order, parseTime(end), first, last, key=inits.__getitem__)
+        return first, last
+
+    def tapsByChild(self, child_id, start=None, end=None):
+        # Taps del child per ordre d'init
+        first, last = self.tapRange(child_id, start, end)
+        return [self.tap(i) for i in self.taps_byChild[first:last]]
+
+    def dataset(self):
+        # Tot com a objectes (Dataset de datasetServer) per als DAO en memòria.
+        # Com a datasetServer.load, les hores repetides són el mateix string
+        from datasetServer import Dataset, noGc
+        stamps = {}
+
+        def stamp(seconds):
+            value = stamps.get(seconds)
+            if value is None:
+                value = stamps[seconds] = formatTime(seconds)
+            return value
+
+        with noGc():
+            users = [self.user(i) for i in range(len(self.users_id))]
+            children = [self.child(i) for i in range(len(self.children_id))]
+            relations = [{"user_id": u, "child_id": c, "rol_id": r} for u, c, r in
+                         zip(self.relations_user_id, self.relations_child_id, self.relations_rol_id)]
+            taps = [Tap(i, c, s, u, stamp(init), None if end == NO_END else stamp(end))
+                    for i, c, s, u, init, end in zip(self.taps_id, self.taps_child_id, self.taps_status_id,
+                                                     self.taps_user_id, self.taps_init, self.taps_end)]
+        return Dataset(users, children, relations, taps)
+
+
+# DAO només de lectura sobre el snapshot (mateixa interfície que els de
+# DaoServer i sqliteServer). Cada consulta fa cerques binàries a les columnes i
+# només crea els objectes que retorna: el mmap ha de quedar obert mentre es facin
+# servir. Les escriptures donen PermissionError (els servidors responen 403)
+READ_ONLY = "Dades només de lectura (snapshot binari)"
+
+
+class SnapshotUserDao:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def getAllUsers(self):
+        return list(self.iterAllUsers())
+
+    def iterAllUsers(self, chunk=500):
+        snapshot = self.snapshot
+        for row in range(len(snapshot.users_id)):
+            yield snapshot.user(row).to_dict()
+
+    def getUsersPage(self, after=None, limit=100):
+        # Com UserDAO.getUsersPage: cursor opac amb l'id de l'últim usuari
+        ids = self.snapshot.users_id
+        pos = 0 if not after else bisect_right(ids, int(decodeCursor(after)))
+        rows = range(pos, min(pos + limit, len(ids)))
+        last = ids[rows[-1]] if rows and pos + limit < len(ids) else None
+        return [self.snapshot.user(row).to_dict() for row in rows], \
+            (encodeCursor(last) if last is not None else None)
+
+    def getUserByUsername(self, username):
+        user = self.snapshot.userByUsername(username)
+        return user.to_dict() if user else None
+
+    def getUserByEmail(self, email):
+        user = self.snapshot.userByEmail(email)
+        return user.to_dict() if user else None
+
+    def login(self, identifier, password):
+        # identifier pot ser el username o l'email; si no és un string el login falla
+        if not isinstance(identifier, str):
+            return None
+        for user in (self.snapshot.userByUsername(identifier), self.snapshot.userByEmail(identifier)):
+            if user and user.password == password:
+                return user
+        return None
+
+    def getVersion(self):
+        # Les dades no canvien mai
+        return 0
+
+    def getUserRole(self, user_id):
+        snapshot = self.snapshot
+        start = bisect_left(snapshot.relations_user_id, user_id)
+        end = bisect_right(snapshot.relations_user_id, user_id)
+        return list(snapshot.relations_rol_id[start:end])
+
+    def addUser(self, user):
+        raise PermissionError(READ_ONLY)
+
+    def updateUser(self, user_id, **fields):
+        raise PermissionError(READ_ONLY)
+
+    def deleteUser(self, user_id):
+        raise PermissionError(READ_ONLY)
+
+
+class SnapshotChildDao:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def getChild(self, user):
+        return self.getChildsOfUser(user.id)
+
+    def getAllChilds(self):
+        return list(self.iterAllChilds())
+
+    def iterAllChilds(self):
+        snapshot = self.snapshot
+        for row in range(len(snapshot.children_id)):
+            yield snapshot.child(row).to_dict()
+
+    def getChildById(self, child_id):
+        child = self.snapshot.childById(child_id)
+        return child.to_dict() if child else None
+
+    def getUsersOfChild(self, child_id):
+        return self.snapshot.userIdsOfChild(child_id)
+
+    def getVersion(self, user_id=None):
+        return 0
+
+    def getChildsOfUser(self, user_id):
+        return [child.to_dict() for child in self.snapshot.childrenOfUser(user_id) if child]
+
+    def addChild(self, child):
+        raise PermissionError(READ_ONLY)
+
+    def deleteChild(self, child_id):
+        raise PermissionError(READ_ONLY)
+
+    def addRelation(self, user_id, child_id, rol_id):
+        raise PermissionError(READ_ONLY)
+
+    def removeRelation(self, user_id, child_id, rol_id=None):
+        raise PermissionError(READ_ONLY)
+
+
+class SnapshotTapDao:
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def getTap(self, tap_id):
+        tap = self.snapshot.tapById(tap_id)
+        return tap.to_dict() if tap else None
+
+    def getTapsByChild(self, child_id, start=None, end=None):
+        # Generador, com TapDao: els Tap es creen a mesura que es recorren
+        snapshot = self.snapshot
+        first, last = snapshot.tapRange(child_id, start, end)
+        return (snapshot.tap(row).to_dict() for row in snapshot.taps_byChild[first:last])
+
+    def getTapsByDateRange(self, start=None, end=None):
+        # Per child (ordre d'id) i per init dins de cada child
+        for child_id in self.snapshot.children_id:
+            yield from self.getTapsByChild(child_id, start, end)
+
+    def getTreatment(self, child_id, day, now=None):
+        # Com TreatmentAccumulator.summary, però sumant els taps del dia a cada
+        # consulta: el tap anterior al dia i els que comencen dins del dia
+        snapshot = self.snapshot
+        lo = parseTime(day) // DAY * DAY
+        hi = lo + DAY
+        order, inits, ends = snapshot.taps_byChild, snapshot.taps_init, snapshot.taps_end
+        first, last = snapshot.tapRange(child_id)
+        start = max(bisect_left(order, lo, first, last, key=inits.__getitem__) - 1, first)
+        stop = bisect_left(order, hi, start, last, key=inits.__getitem__)
+        totals = [0, 0, 0]
+        for pos in range(start, stop):
+            row = order[pos]
+            # Final efectiu: mai més enllà de l'init del següent tap (TreatmentAccumulator._end)
+            end = ends[row]
+            nextInit = inits[order[pos + 1]] if pos + 1 < last else None
+            if end == NO_END:
+                end = nextInit
+            elif nextInit is not None:
+                end = min(end, nextInit)
+            slot = SLOT.get(snapshot.taps_status_id[row])
+            if end is not None and slot is not None:
+                totals[slot] += max(min(end, hi) - max(inits[row], lo), 0)
+        current = None
+        if last > first and ends[order[last - 1]] == NO_END:
+            current = snapshot.tap(order[last - 1])
+        return summaryOf(child_id, day, totals, current, now)
+
+    def getVersion(self, child_id=None):
+        return 0
+
+    def createTap(self, tap):
+        raise PermissionError(READ_ONLY)
+
+    def createTaps(self, taps, clientIds):
+        raise PermissionError(READ_ONLY)
+
+    def closeTap(self, tap_id, end):
+        raise PermissionError(READ_ONLY)
+
+    def deleteTap(self, tap_id):
+        raise PermissionError(READ_ONLY)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crea un snapshot binari (mmap) de dades de prova")
+    parser.add_argument('path')
+    parser.add_argument('--from', dest='source', help="snapshot gzip de datasetServer")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    import datasetServer
+    start = time.perf_counter()
+    data = datasetServer.load(args.source) if args.source else \
+        datasetServer.generate(args.users, args.days, args.seed)
+    save(data, args.path)
+    with BinarySnapshot(args.path) as snapshot:
+        print(f"{snapshot.counts()} -> {args.path} "
+              f"({os.path.getsize(args.path) / 1e6:.1f} MB, {time.perf_counter() - start:.1f} s)")
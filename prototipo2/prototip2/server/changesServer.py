@@ -0,0 +1,117 @@
+# Registre de canvis (change feed) per a la sincronització delta dels clients.
+# Cada alta/modificació/baixa de users, children, relacions i taps afegeix una
+# entrada amb un número de seqüència creixent. El client guarda l'últim número
+# que ha vist i demana només el que ha canviat: /changes?since=N&limit=M
+#
+#  {"seq": 8, "entity": "tap", "op": "upsert", "id": 5, "data": {...}}
+#  {"seq": 9, "entity": "tap", "op": "delete", "id": 5, "data": null}
+#
+# Només es guarden les últimes `retention` entrades. Si el client demana un
+# since que ja no hi és, la resposta porta "resync": true i ha de tornar a
+# carregar-ho tot (i continuar des de "last").
+import json
+import threading
+import time
+
+USER, CHILD, RELATION, TAP = "user", "child", "relation", "tap"
+UPSERT, DELETE = "upsert", "delete"
+
+# Camps que no surten mai al change feed
+PRIVATE = {USER: ('password', 'token')}
+
+
+def changeData(entity, data):
+    if data is None:
+        return None
+    if hasattr(data, 'to_dict'):
+        data = data.to_dict()
+    hidden = PRIVATE.get(entity)
+    if hidden:
+        data = {k: v for k, v in data.items() if k not in hidden}
+    return data
+
+
+def relationKey(relation):
+    return f"{relation['user_id']}-{relation['child_id']}-{relation['rol_id']}"
+
+
+def feed(entries, since, first, last):
+    # Resposta comuna dels dos registres
+    if since < first - 1 or since > last:
+        return {"resync": True, "changes": [], "next": last, "last": last, "more": False}
+    return {"resync": False, "changes": entries, "next": entries[-1]["seq"] if entries else since,
+            "last": last, "more": bool(entries) and entries[-1]["seq"] < last}
+
+
+class ChangeLog:
+    # En memòria. La seqüència comença en el temps d'arrencada (microsegons): després
+    # d'un reinici tots els números nous són més grans que els d'abans i el since
+    # d'un client antic queda fora del registre -> resync.
+    def __init__(self, retention=10000, start=None):
+        self.retention = retention
+        self.entries = []
+        self.first = start if start is not None else time.time_ns() // 1000
+        self.lock = threading.Lock()
+
+    @property
+    def last(self):
+        return self.first + len(self.entries) - 1
+
+    def append(self, entity, op, key, data=None):
+        with self.lock:
+            seq = self.last + 1
+            self.entries.append({"seq": seq, "entity": entity, "op": op, "id": key,
+                                 "data": changeData(entity, data)})
+            # Es retalla amb una mica de marge per no moure la llista a cada alta
+            if len(self.entries) > self.retention + self.retention // 4:
+                drop = len(self.entries) - self.retention
+                del self.entries[:drop]
+                self.first += drop
+            return seq
+
+    def since(self, since, limit=500):
+        with self.lock:
+            start = max(since - self.first + 1, 0)
+            return feed(self.entries[start:start + limit], since, self.first, self.last)
+
+
+class SqliteChangeLog:
+    # A la mateixa base de dades que les dades: el canvi s'escriu dins de la
+    # transacció de la modificació (o tots dos o cap)
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        op TEXT NOT NULL,
+        key TEXT,
+        data TEXT
+    );
+    """
+    SQL_INSERT = "INSERT INTO changes(entity, op, key, data) VALUES (?, ?, ?, ?)"
+    SQL_SINCE = "SELECT seq, entity, op, key, data FROM changes WHERE seq > ? ORDER BY seq LIMIT ?"
+    SQL_FIRST = "SELECT MIN(seq) FROM changes"
+    SQL_LAST = "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+
+    def __init__(self, db, retention=10000):
+        self.db = db
+        self.retention = retention
+        db.connection().executescript(self.SCHEMA)
+
+    def append(self, entity, op, key, data=None, conn=None):
+        conn = conn or self.db.connection()
+        data = changeData(entity, data)
+        seq = conn.execute(self.SQL_INSERT, (entity, op, json.dumps(key),
+                                             json.dumps(data) if data is not None else None)).lastrowid
+        if seq % 1000 == 0:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - self.retention,))
+        return seq
+
+    def since(self, since, limit=500):
+        conn = self.db.connection()
+        entries = [{"seq": seq, "entity": entity, "op": op, "id": json.loads(key),
+                    "data": json.loads(data) if data is not None else None}
+                   for seq, entity, op, key, data in conn.execute(self.SQL_SINCE, (since, limit))]
+        row = conn.execute(self.SQL_LAST).fetchone()
+        last = row[0] if row else 0
+        first = conn.execute(self.SQL_FIRST).fetchone()[0] or last + 1
+        return feed(entries, since, first, last)
@@ -0,0 +1,166 @@
+# Prova de asyncServer contra server.py (Flask) amb les mateixes dades
+# (snapshot generat amb datasetServer):
+#  - /login, /getusers (sencer i paginat), /Child, /children, /taps,
+#    /taps/search, /taps/<id> i /treatment: el mateix JSON i la mateixa ETag
+#  - If-None-Match: 304; escriptures (POST /taps, /taps/bulk): mateixos ids
+#  - keep-alive: totes les peticions per la mateixa connexió; HTTP/1.0 la tanca
+#  - entrades incorrectes: JSON mal format (400), línia de petició incorrecta
+#    (400), cos massa gran (413), ruta desconeguda (404), mètode (405) i un
+#    error dins del handler (500 i la connexió continua)
+# Ús: python checkAsyncServer.py
+import asyncio
+import contextlib
+import http.client
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+
+import datasetServer
+
+data = datasetServer.generate(300, 2, seed=12)
+os.environ['TAPATAPP_SNAPSHOT'] = os.path.join(tempfile.mkdtemp(), "async.snap.gz")
+datasetServer.save(data, os.environ['TAPATAPP_SNAPSHOT'])
+import asyncServer   # els dos backends carreguen el mateix snapshot
+import server
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def freePort():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start():
+    port, ready = freePort(), threading.Event()
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(asyncServer.serve('127.0.0.1', port, ready),),
+                     daemon=True).start()
+    check("serve() arrenca", ready.wait(30))
+    return port
+
+
+class AsyncClient:
+    # Una sola connexió HTTP/1.1 per a totes les peticions
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+
+    def request(self, method, path, body=None, headers=None):
+        raw = body if isinstance(body, bytes) or body is None else json.dumps(body).encode()
+        self.conn.request(method, path, raw, headers or {})
+        response = self.conn.getresponse()
+        payload = response.read()
+        return response, json.loads(payload) if payload else None
+
+
+class FailingDao:
+    # Un DAO que falla amb un error que no és de xarxa ni de validació
+    def getVersion(self, child_id=None):
+        return 0
+
+    def getTap(self, tap_id):
+        raise RuntimeError("error de prova")
+
+
+def rawRequest(port, raw):
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as s:
+        s.sendall(raw)
+        chunks = []
+        while True:
+            chunk = s.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+def main():
+    port = start()
+    flask = server.createApp().test_client()
+    api = AsyncClient(port)
+    user, tap = data.users[0], data.taps[0]
+    child_id, day = tap.child_id, tap.init[:10]
+
+    print("GET: mateix JSON i mateixa ETag que Flask")
+    paths = ["/getusers", "/getusers?limit=50", f"/children?user_id={data.relations[0]['user_id']}", "/children",
+             "/taps", f"/taps/search?child_id={child_id}&start_date={day}T00:00:00&end_date={day}T23:59:59",
+             f"/taps/search?status_id=2&start_date={day}T00:00:00", f"/taps/{tap.id}",
+             f"/treatment/{child_id}?date={day}&now={day}T23:00:00"]
+    first = api.request("GET", "/getusers?limit=50")[1]
+    paths.append(f"/getusers?limit=50&after={first['next']}")
+    for path in paths:
+        response, body = api.request("GET", path)
+        expected = flask.get(path)
+        check(path, response.status == 200 and body == expected.get_json()
+              and response.getheader("ETag") == expected.headers["ETag"])
+    response, _ = api.request("GET", "/taps", headers={"If-None-Match": response.getheader("ETag")})
+    check("If-None-Match d'una altra url: 200", response.status == 200)
+    etag = response.getheader("ETag")
+    response, body = api.request("GET", "/taps", headers={"If-None-Match": etag})
+    check("If-None-Match igual: 304 sense cos", response.status == 304 and body is None)
+
+    print("POST")
+    login = {"username": f"  {user.email.upper()} ", "password": user.password}
+    response, body = api.request("POST", "/login", login)
+    expected = flask.post("/login", json=login).get_json()
+    token = body["data"].pop("token")
+    expected["data"].pop("token")
+    check("/login: mateix JSON (el token és de cada servidor)", body == expected and body["coderesponse"] == "1")
+    response, body = api.request("GET", "/me", headers={"Authorization": f"Bearer {token}"})
+    check("/me amb el token", body["data"]["user_id"] == user.id)
+    wrong = {"username": user.username, "password": "no"}
+    check("/login incorrecte", api.request("POST", "/login", wrong)[1] == flask.post("/login", json=wrong).get_json())
+    for body in ({"id_user": user.id}, {"id_user": "x"}, {}):
+        response, got = api.request("POST", "/Child", body)
+        expected = flask.post("/Child", json=body)
+        check(f"/Child {body}", response.status == expected.status_code and got == expected.get_json())
+    newTap = {"child_id": child_id, "status_id": 1, "user_id": user.id, "init": f"{day}T23:30:00"}
+    response, body = api.request("POST", "/taps", newTap)
+    check("POST /taps: el mateix id", response.status == 201 and body == flask.post("/taps", json=newTap).get_json())
+    bulk = {"taps": [{**newTap, "client_id": f"async-{i}", "init": f"{day}T23:{40 + i}:00"} for i in range(5)]}
+    response, body = api.request("POST", "/taps/bulk", bulk)
+    check("POST /taps/bulk", body == flask.post("/taps/bulk", json=bulk).get_json() and body["created"] == 5)
+    bad = {"child_id": child_id, "status_id": 1, "user_id": 1, "init": f"{day}T10:00:00", "end": f"{day}T09:00:00"}
+    check("POST /taps amb end < init: 400", api.request("POST", "/taps", bad)[0].status == 400)
+
+    print("keep-alive")
+    sock = api.conn.sock
+    for _ in range(20):
+        api.request("GET", "/children")
+    check("21 peticions per la mateixa connexió", api.conn.sock is sock and sock is not None)
+    reply = rawRequest(port, b"GET /children HTTP/1.0\r\n\r\n")
+    check("HTTP/1.0 sense keep-alive: Connection: close", reply.startswith(b"HTTP/1.1 200")
+          and b"Connection: close" in reply)
+
+    print("entrades incorrectes")
+    response, body = api.request("POST", "/login", b"{no-json", {"Content-Type": "application/json"})
+    check("JSON mal format: 400 i es tanca la connexió",
+          response.status == 400 and "error" in body and response.getheader("Connection") == "close")
+    api = AsyncClient(port)
+    check("ruta desconeguda: 404", api.request("GET", "/noexisteix")[0].status == 404)
+    check("mètode no permès: 405", api.request("DELETE", "/getusers")[0].status == 405)
+    check("cursor incorrecte: 400", api.request("GET", "/getusers?limit=5&after=%25%25")[0].status == 400)
+    check("línia de petició incorrecta: 400", rawRequest(port, b"HOLA\r\n\r\n").startswith(b"HTTP/1.1 400"))
+    check("Content-Length negatiu: 400",
+          rawRequest(port, b"POST /taps HTTP/1.1\r\nContent-Length: -1\r\n\r\n").startswith(b"HTTP/1.1 400"))
+    check("cos massa gran: 413", rawRequest(port, b"POST /taps HTTP/1.1\r\nContent-Length: %d\r\n\r\n"
+                                        % (asyncServer.MAX_BODY + 1)).startswith(b"HTTP/1.1 413"))
+    tapDao = asyncServer.tapDao
+    asyncServer.tapDao = FailingDao()
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            response, body = api.request("GET", f"/taps/{tap.id}")
+    finally:
+        asyncServer.tapDao = tapDao
+    check("error al handler: 500", response.status == 500 and body == {"error": "Internal Server Error"})
+    check("  i la connexió continua", api.request("GET", f"/taps/{tap.id}")[0].status == 200)
+
+
+if __name__ == '__main__':
+    main()
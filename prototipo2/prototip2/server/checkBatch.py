@@ -0,0 +1,132 @@
+# Prova de POST /batch (server.py) i de APIClient.batch() (serverMetods):
+#  - cada subpetició dona el mateix status i cos que la petició feta sola
+#  - les escriptures van en ordre: un GET després d'un POST ja el veu
+#  - un error (404, 400...) només afecta la seva subpetició
+#  - les subpeticions fan servir la sessió del batch (Authorization)
+#  - com a molt MAX_BATCH subpeticions; batch buit, subpetició incorrecta o
+#    un /batch dins d'un altre: 400
+#  - APIClient.batch() contra el servidor en un thread: més de max_size crides
+#    es parteixen en diversos /batch i result() d'una crida fallida llança APIException
+# Ús: python checkBatch.py
+import logging
+import os
+import sys
+import threading
+
+from werkzeug.serving import make_server
+
+import server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'client'))
+sys.path.append(os.path.join(HERE, '..', '..', 'diagramas'))
+from serverMetods import APIClient, APIException
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def batch(client, calls, headers=None):
+    response = client.post('/batch', json={"requests": calls}, headers=headers)
+    return response.status_code, response.get_json()
+
+
+def alone(client, call):
+    response = client.open(call["path"], method=call["method"], json=call.get("body"))
+    # Les respostes que no són JSON (el 404 de Flask) van com a text
+    return {"status": response.status_code,
+            "body": response.get_json() if response.is_json else response.get_data(as_text=True)}
+
+
+def main():
+    client = server.createApp().test_client()
+
+    print("subpeticions == peticions soles")
+    reads = [{"method": "GET", "path": path} for path in
+             ("/getusers", "/getusers?limit=1", "/children?user_id=1", "/children", "/taps", "/taps/1",
+              "/taps/search?child_id=1", "/treatment/1?date=2024-12-18", "/treatment/1", "/taps/9999", "/noexisteix")]
+    status, body = batch(client, reads)
+    check("200 amb un resultat per subpetició", status == 200 and len(body["data"]) == len(reads))
+    check("mateix status i cos", body["data"] == [alone(client, call) for call in reads])
+    check("els errors van a la seva subpetició",
+          [r["status"] for r in body["data"]][-3:] == [400, 404, 404] and body["data"][0]["status"] == 200)
+
+    print("escriptures en ordre")
+    tap = {"child_id": 2, "status_id": 1, "user_id": 2, "init": "2024-12-22T08:00:00"}
+    status, body = batch(client, [
+        {"method": "POST", "path": "/taps", "body": tap},
+        {"method": "GET", "path": "/taps/search?child_id=2&start_date=2024-12-22T00:00:00"},
+        {"method": "PUT", "path": "/taps/3/close", "body": {"end_time": "2024-12-22T07:00:00"}},
+        {"method": "PUT", "path": "/taps/3/close", "body": {"end_time": "2024-12-22T09:00:00"}},
+        {"method": "GET", "path": "/taps/3"},
+        {"method": "DELETE", "path": "/taps/3"},
+        {"method": "GET", "path": "/taps/3"},
+        {"method": "POST", "path": "/taps", "body": {"child_id": 2}},
+    ])
+    results = body["data"]
+    check("POST: 201 amb l'id", results[0] == {"status": 201, "body": {"id": 3}})
+    check("el GET següent el veu", [t["id"] for t in results[1]["body"]["taps"]] == [3])
+    check("tancar abans de l'inici: 400; després: 200", [results[2]["status"], results[3]["status"]] == [400, 200])
+    check("el GET veu el tap tancat", results[4]["body"]["end"] == "2024-12-22T09:00:00")
+    check("DELETE i després 404", [results[5]["status"], results[6]["status"]] == [200, 404])
+    check("un POST incorrecte: 400 amb el missatge", results[7]["status"] == 400 and "error" in results[7]["body"])
+
+    print("sessió del batch")
+    token = client.post('/login', json={"username": "mare", "password": "12345"}).get_json()["data"]["token"]
+    status, body = batch(client, [{"method": "GET", "path": "/me"}], {"Authorization": f"Bearer {token}"})
+    check("/me amb el token del batch", body["data"][0]["status"] == 200
+          and body["data"][0]["body"]["data"]["user_id"] == 1)
+    status, body = batch(client, [{"method": "GET", "path": "/me"}])
+    check("/me sense token: 401", body["data"][0]["status"] == 401)
+
+    print("peticions incorrectes")
+    check(f"{server.MAX_BATCH} subpeticions: 200",
+          batch(client, [{"method": "GET", "path": "/taps/1"}] * server.MAX_BATCH)[0] == 200)
+    check(f"{server.MAX_BATCH + 1}: 400",
+          batch(client, [{"method": "GET", "path": "/taps/1"}] * (server.MAX_BATCH + 1))[0] == 400)
+    check("batch buit: 400", batch(client, [])[0] == 400)
+    check("sense requests: 400", client.post('/batch', json={}).status_code == 400)
+    check("cos que no és JSON: 400", client.post('/batch', data="x").status_code == 400)
+    for name, call in (("mètode PATCH", {"method": "PATCH", "path": "/taps"}),
+                       ("path sense /", {"method": "GET", "path": "taps"}),
+                       ("path que no és text", {"method": "GET", "path": 5}),
+                       ("subpetició que no és un objecte", "GET /taps"),
+                       ("/batch dins d'un batch", {"method": "POST", "path": "/batch?x=1"})):
+        check(f"{name}: 400", batch(client, [{"method": "GET", "path": "/taps"}, call])[0] == 400)
+
+    print("APIClient.batch() (serverMetods)")
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.createApp(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        api = APIClient(f"http://127.0.0.1:{httpd.server_port}")
+        with api.batch() as calls:
+            children = calls.get('/children', {'user_id': 1})
+            treatment = calls.get('/treatment/1', {'date': '2024-12-18'})
+            missing = calls.get('/taps/9999')
+            many = [calls.get(f'/taps/{1 + i % 2}') for i in range(120)]
+        check("mateix resultat que api.get", children.result() == api.get('/children', {'user_id': 1})
+              and treatment.result() == api.get('/treatment/1', {'date': '2024-12-18'}))
+        check("123 crides (3 /batch de com a molt 50)",
+              all(call.result() == api.get(f'/taps/{1 + i % 2}') for i, call in enumerate(many)))
+        try:
+            missing.result()
+            failed = None
+        except APIException as e:
+            failed = e
+        check("result() d'una crida fallida: APIException amb el status",
+              failed is not None and failed.status_code == 404)
+        with api.batch() as calls:
+            created = calls.post('/taps', {"child_id": 1, "status_id": 2, "user_id": 1,
+                                           "init": "2024-12-23T08:00:00"})
+            found = calls.get('/taps/search', {'child_id': 1, 'start_date': '2024-12-23T00:00:00'})
+        check("POST i GET al mateix batch", created.status == 201
+              and [t["id"] for t in found.result()["taps"]] == [created.result()["id"]])
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Prova de l'alta en bloc (/taps/bulk i TapDao.createTaps, en memòria i SQLite):
+#  - un client_id repetit (a la mateixa petició o reenviat) no crea un tap nou
+#    i retorna l'id que ja tenia
+#  - les files incorrectes surten a "errors" i la resta s'insereix
+#  - diversos threads enviant els mateixos client_id alhora creen cada tap una
+#    sola vegada (en memòria amb el lock del TapStore; a SQLite sense IntegrityError)
+#  - SQLite: getTreatment dona el mateix que el TapDao en memòria
+# Ús: python checkBulk.py
+import os
+import tempfile
+import threading
+from copy import copy
+
+import datasetServer
+import server
+from DaoServer import TapDao, tapsFromRows
+from sqliteServer import SqliteDatabase, SqliteTapDao
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def rows(prefix, n, child_id=1, day="2024-12-21"):
+    return [{"client_id": f"{prefix}-{i}", "child_id": child_id, "status_id": 1 + i % 3, "user_id": 1,
+             "init": f"{day}T{i // 60 % 24:02d}:{i % 60:02d}:00"} for i in range(n)]
+
+
+def checkDao(create):
+    dao = create()
+    taps, clientIds, errors = tapsFromRows(rows("a", 50) + rows("a", 10))
+    result = dao.createTaps(taps, clientIds)
+    check("client_id repetit a la mateixa petició: un sol tap",
+          sum(isNew for _, isNew in result) == 50 and [i for i, _ in result[50:]] == [i for i, _ in result[:10]])
+    taps, clientIds, errors = tapsFromRows(rows("a", 50))
+    again = dao.createTaps(taps, clientIds)
+    check("reenviar: cap tap nou i els mateixos ids",
+          not any(isNew for _, isNew in again) and [i for i, _ in again] == [i for i, _ in result[:50]])
+    check("getTapsByChild en té 50", len(list(dao.getTapsByChild(1, "2024-12-21T00:00:00",
+                                                                 "2024-12-21T23:59:59"))) == 50)
+
+
+def checkThreads(dao, db):
+    # 8 threads per prefix envien 5 vegades els mateixos 200 client_id
+    results, failures = [], []
+
+    def sync(prefix):
+        try:
+            for _ in range(5):
+                taps, clientIds, _ = tapsFromRows(rows(prefix, 200, child_id=2))
+                results.append(dao.createTaps(taps, clientIds))
+        except Exception as e:
+            failures.append(e)
+        finally:
+            db.release()
+
+    for prefix in ("b", "c"):
+        threads = [threading.Thread(target=sync, args=(prefix,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    check(f"cap error ({failures[:1]})", not failures)
+    check("cada client_id té un sol tap", len(list(dao.getTapsByChild(2))) == 400)
+    check("tots els threads reben els mateixos ids",
+          len({tuple(i for i, _ in result) for result in results}) == 2)
+    check("cada tap es crea una sola vegada", sum(isNew for result in results for _, isNew in result) == 400)
+
+
+def main():
+    print("TapDao en memòria")
+    checkDao(lambda: TapDao([]))
+    folder = tempfile.mkdtemp()
+    print("SqliteTapDao")
+    db = SqliteDatabase(os.path.join(folder, "bulk.sqlite"))
+    checkDao(lambda: SqliteTapDao(db))
+
+    for name, dao in (("TapDao", TapDao([])), ("SqliteTapDao", SqliteTapDao(db))):
+        print(f"{name} amb threads")
+        checkThreads(dao, db)
+
+    print("getTreatment: SQLite == memòria")
+    data = datasetServer.generate(100, 3, seed=2)
+    db = SqliteDatabase(os.path.join(folder, "treatment.sqlite"))
+    db.load(taps=[copy(t) for t in data.taps])
+    sqlite, memory = SqliteTapDao(db), TapDao([copy(t) for t in data.taps])
+    days = sorted({t.init[:10] for t in data.taps})
+    now = f"{days[-1]}T23:00:00"
+    children = sorted({t.child_id for t in data.taps})
+    diverging = [(c, d) for c in children for d in days for n in (None, now)
+                 if sqlite.getTreatment(c, d, n) != memory.getTreatment(c, d, n)]
+    check(f"{len(diverging)} de {len(children) * len(days) * 2} resums diferents", not diverging)
+
+    print("POST /taps/bulk")
+    client = server.createApp().test_client()
+    body = {"taps": rows("http", 20, day="2024-12-22") + [{"client_id": "http-bad", "child_id": 1}]
+            + rows("http", 5, day="2024-12-22")}
+    response = client.post('/taps/bulk', json=body).get_json()
+    check("20 creats, 5 duplicats i 1 error", response["created"] == 20 and response["duplicates"] == 5
+          and [e["index"] for e in response["errors"]] == [20])
+    response = client.post('/taps/bulk', json={"taps": rows("http", 20, day="2024-12-22")}).get_json()
+    check("reenviar la petició no crea res", response["created"] == 0 and response["duplicates"] == 20)
+    check("sense llista de taps: 400", client.post('/taps/bulk', json={}).status_code == 400)
+
+
+if __name__ == '__main__':
+    main()
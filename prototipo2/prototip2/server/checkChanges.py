@@ -0,0 +1,193 @@
+# Prova del registre de canvis (changesServer) i de GET /changes:
+#  - els DAO en memòria (ChangeLog) i SQLite (SqliteChangeLog) apunten cada
+#    alta/modificació/baixa en ordre i amb la mateixa forma; aplicar el registre
+#    a les dades inicials dona les dades finals; el password no hi surt mai
+#  - since/limit: pàgines en ordre amb next/more; un since massa antic (fora de
+#    la retenció), de després d'un reinici o del futur: resync
+#  - GET /changes de server.py i asyncServer (since obligatori, limit entre 1 i
+#    5000) i ChangeFeedDAO.pull de serverMetods contra el servidor en un thread
+# Ús: python checkChanges.py
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+from copy import copy
+
+from werkzeug.serving import make_server
+
+import asyncServer
+import datasetServer
+import server
+from changesServer import ChangeLog, SqliteChangeLog, TAP, CHILD, USER, DELETE
+from dadesServer import User, Child, Tap
+from DaoServer import UserDAO, ChildDao, TapDao, tapsFromRows
+from indexServer import RelationIndex
+from sqliteServer import SqliteDatabase, SqliteUserDAO, SqliteChildDao, SqliteTapDao
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'client'))
+sys.path.append(os.path.join(HERE, '..', '..', 'diagramas'))
+from serverMetods import APIClient, ChangeFeedDAO
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def asDict(record):
+    return record if isinstance(record, dict) else record.to_dict()
+
+
+def mutate(userDao, childDao, tapDao, data):
+    # Els mateixos canvis per als dos backends
+    user = data.users[0]
+    userDao.addUser(User(id=9000, username="canvis", password="secret", email="canvis@x.com", idrole=1, token=""))
+    userDao.updateUser(user.id, email="nou@x.com")
+    userDao.updateUser(9000, password="altre")
+    userDao.deleteUser(9000)
+    childDao.addChild(Child(id=9000, child_name="Nou", sleep_average=9, treatment_id=1, time=6))
+    childDao.addRelation(user.id, 9000, 1)
+    childDao.removeRelation(user.id, 9000)
+    childDao.addRelation(user.id, 9000, 2)
+    childDao.deleteChild(9000)
+    tap = Tap(id=None, child_id=data.taps[0].child_id, status_id=1, user_id=user.id, init="2024-12-20T08:00:00")
+    tapDao.createTap(tap)
+    tapDao.closeTap(tap.id, "2024-12-20T09:00:00")
+    tapDao.deleteTap(data.taps[0].id)
+    taps, clientIds, _ = tapsFromRows([{"client_id": f"ch-{i}", "child_id": 1, "status_id": 2, "user_id": 1,
+                                        "init": f"2024-12-21T0{i}:00:00"} for i in range(5)])
+    tapDao.createTaps(taps, clientIds)
+    tapDao.createTaps(*tapsFromRows([{"client_id": "ch-0", "child_id": 1, "status_id": 2, "user_id": 1,
+                                      "init": "2024-12-21T00:00:00"}])[:2])
+
+
+def replay(initial, changes, entity):
+    state = {record['id']: record for record in initial}
+    for change in changes:
+        if change['entity'] != entity:
+            continue
+        if change['op'] == DELETE:
+            state.pop(change['id'], None)
+        else:
+            state[change['id']] = change['data']
+    return state
+
+
+def asyncGet(method, path, body=None):
+    req = asyncServer.Request(method, path, {}, json.dumps(body).encode() if body is not None else b'')
+    status, raw, _ = asyncio.run(asyncServer.dispatch(req))
+    return status, json.loads(raw)
+
+
+def pages(log, since, limit):
+    found = []
+    while True:
+        page = log.since(since, limit)
+        if page['resync']:
+            return None
+        found += page['changes']
+        since = page['next']
+        if not page['more']:
+            return found
+
+
+def checkFeed(name, log, first, initialTaps, tapDao):
+    print(f"registre ({name})")
+    changes = log.since(first - 1, 5000)
+    entries = changes['changes']
+    check(f"{len(entries)} canvis, seqüència creixent sense forats",
+          [c['seq'] for c in entries] == list(range(first, first + len(entries))) and changes['last'] == entries[-1]['seq'])
+    check("cap password ni token", all('password' not in (c['data'] or {}) and 'token' not in (c['data'] or {})
+                                       for c in entries))
+    final = {t['id']: t for t in map(asDict, tapDao.getTapsByDateRange())}
+    check("aplicar els canvis de taps a les dades inicials dona les finals",
+          replay(initialTaps, entries, TAP) == final)
+    check("el client_id repetit no apunta cap canvi",
+          sum(c['entity'] == TAP and c['op'] != DELETE for c in entries) == 1 + 1 + 5)
+    check("pàgines de 3 == tot", pages(log, first - 1, 3) == entries)
+    check("des del mig", log.since(entries[4]['seq'], 2)['changes'] == entries[5:7])
+    check("since == last: cap canvi i more=False", log.since(changes['last'], 10) ==
+          {"resync": False, "changes": [], "next": changes['last'], "last": changes['last'], "more": False})
+    check("since del futur: resync", log.since(changes['last'] + 1, 10)['resync'])
+    return [(c['entity'], c['op'], c['id'], c['data']) for c in entries]
+
+
+def main():
+    data = datasetServer.generate(100, 1, seed=18)
+    initialTaps = [t.to_dict() for t in data.taps]
+
+    log = ChangeLog(start=1)
+    relations = RelationIndex([dict(r) for r in data.relations])
+    tapDao = TapDao([copy(t) for t in data.taps], changes=log)
+    mutate(UserDAO([copy(u) for u in data.users], relations=relations, changes=log),
+           ChildDao([copy(c) for c in data.children], relations=relations, changes=log), tapDao, data)
+    memory = checkFeed("memòria", log, 1, initialTaps, tapDao)
+
+    db = SqliteDatabase(os.path.join(tempfile.mkdtemp(), "changes.sqlite"))
+    db.load([copy(u) for u in data.users], [copy(c) for c in data.children], [dict(r) for r in data.relations],
+            [copy(t) for t in data.taps])
+    sqliteLog = SqliteChangeLog(db)
+    tapDao = SqliteTapDao(db, sqliteLog)
+    mutate(SqliteUserDAO(db, sqliteLog), SqliteChildDao(db, sqliteLog), tapDao, data)
+    sqlite = checkFeed("SQLite", sqliteLog, 1, initialTaps, tapDao)
+    check("SQLite apunta els mateixos canvis que la memòria", sqlite == memory)
+    check("  users i children inclosos", {USER, CHILD} <= {entity for entity, *_ in sqlite})
+
+    print("retenció")
+    log = ChangeLog(retention=100, start=1)
+    for i in range(1000):
+        log.append(TAP, "upsert", i, {"id": i})
+    check("un since massa antic: resync amb last", log.since(0, 10)['resync'] and log.since(0)['last'] == 1000)
+    check("dins de la retenció: sense resync", pages(log, 900, 30) == log.entries[-100:])
+    restarted = ChangeLog()
+    check("després d'un reinici el since antic: resync", restarted.since(log.last, 10)['resync'])
+    sqliteLog = SqliteChangeLog(SqliteDatabase(os.path.join(tempfile.mkdtemp(), "retention.sqlite")), retention=100)
+    for i in range(1000):
+        sqliteLog.append(TAP, "upsert", i, {"id": i})
+    check("SQLite: es retalla cada 1000 canvis", sqliteLog.since(0, 10)['resync']
+          and [c['seq'] for c in pages(sqliteLog, 900, 30)] == list(range(901, 1001)))
+
+    print("GET /changes")
+    client = server.createApp().test_client()
+    last = client.get('/changes?since=0').get_json()['last']
+    for i in range(12):
+        client.post('/taps', json={"child_id": 1, "status_id": 1, "user_id": 1, "init": f"2024-12-22T{i:02d}:00:00"})
+    body = client.get(f'/changes?since={last}&limit=5').get_json()
+    check("limit=5: els 5 primers en ordre, more", [c['seq'] for c in body['changes']] == list(range(last + 1, last + 6))
+          and body['more'] and body['next'] == last + 5)
+    check("limit=0 dona 1 canvi", len(client.get(f'/changes?since={last}&limit=0').get_json()['changes']) == 1)
+    check("sense since: 400", client.get('/changes').status_code == 400)
+    check("since que no és un número: 400", client.get('/changes?since=x').status_code == 400)
+
+    print("GET /changes (asyncServer)")
+    for i in range(3):
+        asyncGet('POST', '/taps', {"child_id": 1, "status_id": 1, "user_id": 1, "init": f"2024-12-22T{i:02d}:00:00"})
+    status, body = asyncGet('GET', '/changes?since=0')
+    check("els mateixos camps que server.py", status == 200 and body['resync'] and set(body) == set(
+        client.get('/changes?since=0').get_json()))
+    since = body['last'] - 3
+    check("limit=0 dona 1 canvi", len(asyncGet('GET', f'/changes?since={since}&limit=0')[1]['changes']) == 1)
+    check("sense limit: tots", len(asyncGet('GET', f'/changes?since={since}')[1]['changes']) == 3)
+    check("sense since: 400", asyncGet('GET', '/changes')[0] == 400)
+
+    print("ChangeFeedDAO.pull (serverMetods)")
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.createApp(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        feed = ChangeFeedDAO(APIClient(f"http://127.0.0.1:{httpd.server_port}"))
+        pulled = feed.pull(last, limit=5)
+        check("12 canvis en 3 pàgines", not pulled['resync'] and len(pulled['changes']) == 12
+              and pulled['last'] == last + 12 and all(c['entity'] == TAP for c in pulled['changes']))
+        check("sense canvis nous", feed.pull(pulled['last'])['changes'] == [])
+        check("since d'abans d'un reinici: resync", feed.pull(1)['resync'])
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
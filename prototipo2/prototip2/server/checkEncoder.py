@@ -0,0 +1,82 @@
+# Prova de la serialització directa (encoderServer): el que surt ha de ser el
+# mateix JSON que el camí d'abans (ApiResponse -> asdict -> json), també amb
+# unicode, None, cometes, barres i salts de línia, objectes del model (__slots__),
+# vistes TapRow del TapTable, objectes amb __dict__, generadors i camps extra
+# (next de la paginació). Un valor que no es pot serialitzar dona TypeError.
+# Ús: python checkEncoder.py
+import json
+from dataclasses import asdict
+
+import server
+from dadesServer import User, Child, Tap
+from encoderServer import encode, encodeApiResponse, encodeRecord
+from tapTable import TapTable
+
+ODD = ['Àlex "el petit"', 'barra \\ i\nsalt', '日本語 😴', '', '</script>', ' \x00']
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def reference(response, **extra):
+    # El camí d'abans: còpia amb asdict dels models passats a dict i json.dumps
+    data = response.data
+    if isinstance(data, list):
+        data = [d.to_dict() if hasattr(d, 'to_dict') else d for d in data]
+    return json.dumps({**asdict(server.ApiResponse(response.msg, response.coderesponse, data)), **extra},
+                      separators=(',', ':')).encode()
+
+
+class Plain:
+    def __init__(self, name):
+        self.name = name
+        self.value = None
+
+
+def main():
+    users = [User(id=i, username=text, password=None, email=f"{i}@x.com", idrole=1, token=text)
+             for i, text in enumerate(ODD)]
+    children = [Child(id=1, child_name=ODD[2], sleep_average=8.5, treatment_id=None, time=None)]
+    taps = [Tap(id=1, child_id=1, status_id=1, user_id=1, init="2024-12-18T19:42:43", end=None),
+            Tap(id=2, child_id=1, status_id=2, user_id=1, init="2024-12-18T20:00:00", end="2024-12-18T21:00:00")]
+
+    print("encodeApiResponse == asdict + json.dumps")
+    for name, data in (("users", users), ("children", children), ("taps", taps), ("llista buida", []),
+                       ("None", None), ("text", ODD[1]), ("dicts", [{"a": t, "b": None} for t in ODD])):
+        response = server.ApiResponse(msg=ODD[0], coderesponse="1", data=data)
+        check(name, encodeApiResponse(response) == reference(response))
+    response = server.ApiResponse(msg="Users", coderesponse="1", data=users)
+    check("amb camps extra (next)", encodeApiResponse(response, next="abc==") == reference(response, next="abc=="))
+    check("next None", encodeApiResponse(response, next=None) == reference(response, next=None))
+
+    print("encode")
+    check("models amb __slots__ == to_dict", json.loads(encode(users)) == [u.to_dict() for u in users])
+    table = TapTable(taps)
+    check("vistes TapRow del TapTable", json.loads(encode(list(table))) == [t.to_dict() for t in taps])
+    check("objectes amb __dict__", json.loads(encode([Plain(t) for t in ODD])) ==
+          [{"name": t, "value": None} for t in ODD])
+    check("generadors i tuples", json.loads(encode({"g": (u for u in users), "t": (1, None)})) ==
+          {"g": [u.to_dict() for u in users], "t": [1, None]})
+    check("només ASCII (com json.dumps)", encode(ODD).isascii() and json.loads(encode(ODD)) == ODD)
+    check("encodeRecord: una línia NDJSON", encodeRecord(users[1]).count("\n") == 1
+          and json.loads(encodeRecord(users[1])) == users[1].to_dict())
+    try:
+        encode({"x": 1 + 2j})
+        failed = False
+    except TypeError:
+        failed = True
+    check("un valor no serialitzable: TypeError", failed)
+
+    print("respostes de Flask")
+    with server.createApp().test_request_context():
+        response = server.ApiResponse(msg=ODD[2], coderesponse="1", data=users)
+        flask = server.apiResponse(response, 201)
+        check("apiResponse: status, mimetype i cos", flask.status_code == 201 and flask.mimetype == "application/json"
+              and flask.get_data() == reference(response))
+        check("jsonResponse", server.jsonResponse({"taps": taps}).get_json() == {"taps": [t.to_dict() for t in taps]})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# Prova dels GET condicionals (ETag / If-None-Match -> 304):
+#  - /getusers, /children?user_id, /taps, /taps/search, /taps/<id> i /statuses
+#    porten ETag i amb If-None-Match la mateixa resposta és un 304 sense cos
+#  - el 304 no crida el DAO (només getVersion) ni serialitza res
+#  - l'ETag canvia després d'una alta; la de /taps/search d'un altre child no
+#  - l'ETag depèn de la url i de l'Accept (JSON i NDJSON no es barregen)
+#  - GET /users de primerPrototipo
+#  - la cache d'ETag de APIClient (serverMetods) contra el servidor en un thread
+# Ús: python checkEtag.py
+import importlib.util
+import logging
+import os
+import sys
+import threading
+
+from werkzeug.serving import make_server
+
+import server
+from dadesServer import User
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'client'))
+sys.path.append(os.path.join(HERE, '..', '..', 'diagramas'))
+from serverMetods import APIClient
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+class CountingDao:
+    # Compta les crides al DAO que no són getVersion
+    def __init__(self, dao):
+        self.dao = dao
+        self.calls = 0
+
+    def __getattr__(self, name):
+        value = getattr(self.dao, name)
+        if name == 'getVersion' or not callable(value):
+            return value
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return value(*args, **kwargs)
+        return counted
+
+
+def revalidate(client, path, headers=None):
+    first = client.get(path, headers=headers)
+    again = client.get(path, headers={**(headers or {}), "If-None-Match": first.headers.get("ETag", "")})
+    return first, again
+
+
+def primerModule():
+    # primerPrototipo/server.py amb un altre nom (aquí "server" ja és el de prototip2)
+    spec = importlib.util.spec_from_file_location(
+        'primerServer', os.path.join(HERE, '..', '..', '..', 'primerPrototipo', 'server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    client = server.createApp().test_client()
+    client.post('/taps', json={"child_id": 1, "status_id": 1, "user_id": 1, "init": "2024-12-20T08:00:00"})
+    client.post('/taps', json={"child_id": 2, "status_id": 1, "user_id": 1, "init": "2024-12-20T09:00:00"})
+    search = "/taps/search?child_id=1&start_date=2024-12-20T00:00:00&end_date=2024-12-20T23:59:59"
+    for path in ("/getusers", "/children?user_id=1", "/children", "/taps", search, "/taps/1", "/statuses"):
+        print(f"GET {path}")
+        first, again = revalidate(client, path)
+        check("200 amb ETag", first.status_code == 200 and first.headers.get("ETag"))
+        check("If-None-Match igual: 304 sense cos, amb la mateixa ETag",
+              again.status_code == 304 and again.get_data() == b"" and again.headers["ETag"] == first.headers["ETag"])
+        other = client.get(path, headers={"If-None-Match": '"una-altra"'})
+        check("If-None-Match diferent: 200", other.status_code == 200 and other.get_data() == first.get_data())
+
+    print("el 304 no crida el DAO")
+    counting = server.userDao = CountingDao(server.userDao)
+    try:
+        first = client.get("/getusers")
+        calls = counting.calls
+        again = client.get("/getusers", headers={"If-None-Match": first.headers["ETag"]})
+        check("cap crida al DAO (només getVersion)", again.status_code == 304 and counting.calls == calls)
+    finally:
+        server.userDao = counting.dao
+    check("no serialitza res (fase serialize de /metrics)",
+          'route="/getusers",phase="serialize"} 3' in client.get("/metrics").get_data(as_text=True))
+
+    print("l'ETag canvia amb els canvis")
+    users = client.get("/getusers")
+    server.userDao.addUser(User(id=500, username="etag", password="x", email="etag@x.com", idrole=1, token=""))
+    changed = client.get("/getusers", headers={"If-None-Match": users.headers["ETag"]})
+    check("/getusers després d'una alta: 200 i ETag nova",
+          changed.status_code == 200 and changed.headers["ETag"] != users.headers["ETag"])
+    one, two = client.get(search), client.get("/taps/search?child_id=2")
+    client.post('/taps', json={"child_id": 1, "status_id": 2, "user_id": 1, "init": "2024-12-20T10:00:00"})
+    check("/taps/search del child 1 canvia", client.get(search).headers["ETag"] != one.headers["ETag"])
+    check("la del child 2 no", client.get("/taps/search?child_id=2").headers["ETag"] == two.headers["ETag"])
+    check("una url diferent té una ETag diferent",
+          client.get("/taps?x=1").headers["ETag"] != client.get("/taps").headers["ETag"])
+    ndjson = client.get("/taps", headers={"Accept": "application/x-ndjson"})
+    check("JSON i NDJSON tenen ETag diferent", ndjson.headers["ETag"] != client.get("/taps").headers["ETag"])
+    check("un 404 no porta ETag", "ETag" not in client.get("/taps/9999").headers)
+
+    print("GET /users (primerPrototipo)")
+    primer = primerModule()
+    primerClient = primer.app.test_client()
+    first, again = revalidate(primerClient, "/users")
+    check("304 amb la mateixa ETag", first.headers.get("ETag") and again.status_code == 304)
+    primer.user_dao.addUser(primer.User(username="etag", nom="E", password="x", email="etag@x.com"))
+    check("després d'una alta: 200",
+          primerClient.get("/users", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200)
+
+    print("cache d'ETag de APIClient (serverMetods)")
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.createApp(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        api = APIClient(f"http://127.0.0.1:{httpd.server_port}", etag_cache_size=2)
+        body = api.get("/getusers")
+        check("la segona vegada (304) torna el mateix objecte, sense parsejar", api.get("/getusers") is body)
+        server.userDao.addUser(User(id=501, username="etag2", password="x", email="etag2@x.com", idrole=1, token=""))
+        fresh = api.get("/getusers")
+        check("després d'una alta torna les dades noves",
+              fresh is not body and len(fresh["data"]) == len(body["data"]) + 1)
+        check("els paràmetres formen part de la clau",
+              api.get("/children", {"user_id": 1}) is not api.get("/children", {"user_id": 2}))
+        check("la cache no passa de etag_cache_size", len(api.etag_cache) == 2)
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
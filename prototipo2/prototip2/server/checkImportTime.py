@@ -0,0 +1,89 @@
+# Pressupost de temps d'importació (arrencada en fred) del client de consola,
+# dels servidors i dels mòduls que carreguen els processos treballadors.
+# Cada mòdul s'importa en un procés nou amb `python -X importtime` (el millor
+# de --runs) i es comprova:
+#  - el temps acumulat de l'import és dins del pressupost (ms)
+#  - no escriu res ni obre threads en importar-se
+#  - no importa mòduls que no li calen (flask al client, sqlite3 al servidor...)
+#  - no carrega dades: els DAO es creen amb la primera petició
+# Ús: python checkImportTime.py [--runs 5] [--scale 1.0]
+#     (--scale multiplica els pressupostos, per a màquines més lentes)
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLIENT = os.path.join(HERE, '..', 'client')
+DIAGRAMAS = os.path.join(HERE, '..', '..', 'diagramas')
+PRIMER = os.path.join(HERE, '..', '..', '..', 'primerPrototipo')
+MARK = "--checkImportTime--"
+
+# (nom, directori, mòdul, pressupost ms, mòduls prohibits, expressió que ha de ser certa)
+TARGETS = [
+    ("client de consola", CLIENT, "DaoClient", 200, ["flask"], None),
+    ("client de primerPrototipo", PRIMER, "Cliente", 200, ["flask"], None),
+    ("client de diagramas", DIAGRAMAS, "serverMetods", 250, ["flask"], None),
+    ("DAO en memòria", HERE, "DaoServer", 40, ["flask", "sqlite3"], None),
+    ("servidor Flask", HERE, "server", 250, ["sqlite3", "datasetServer", "sqliteServer"],
+     "not server.backend.loaded and 'app' not in vars(server)"),
+    ("servidor asyncio", HERE, "asyncServer", 120, ["flask", "sqlite3", "datasetServer", "sqliteServer"],
+     "not asyncServer.backend.loaded"),
+]
+
+
+def importOnce(directory, module, forbidden, expression):
+    code = (f"import {module}\n"
+            "import json, sys, threading\n"
+            f"print({MARK!r})\n"
+            f"print(json.dumps({{'threads': threading.active_count(),\n"
+            f"                  'loaded': [m for m in {forbidden!r} if m in sys.modules],\n"
+            f"                  'ok': bool({expression or 'True'})}}))\n")
+    env = dict(os.environ, PYTHONPATH=directory)
+    done = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory, env=env,
+                          capture_output=True, text=True, timeout=60)
+    if done.returncode != 0:
+        raise RuntimeError(f"import {module}:\n{done.stderr[-2000:]}")
+    # Línia del mòdul de primer nivell: "import time: self | cumulative | module"
+    micros = None
+    for line in done.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2] == f" {module}":
+            micros = int(parts[1])
+    output, _, result = done.stdout.partition(MARK + "\n")
+    return micros / 1000, output, json.loads(result)
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    return condition
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Temps d'importació dels mòduls de TapatApp")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--scale', type=float, default=1.0)
+    args = parser.parse_args()
+
+    failures = 0
+    for name, directory, module, budget, forbidden, expression in TARGETS:
+        runs = [importOnce(directory, module, forbidden, expression) for _ in range(args.runs)]
+        ms = min(run[0] for run in runs)
+        output, result = runs[0][1], runs[0][2]
+        budget *= args.scale
+        print(f"{name} (import {module})")
+        checks = [
+            check(f"{ms:.1f} ms <= {budget:.0f} ms", ms <= budget),
+            check("no escriu res en importar-se", output == ""),
+            check("no obre threads", result["threads"] == 1),
+            check(f"no importa {', '.join(forbidden)}", not result["loaded"]),
+        ]
+        if expression:
+            checks.append(check("no carrega les dades (ni crea l'app)", result["ok"]))
+        failures += checks.count(False)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Prova del login i de la cerca d'usuaris indexada (UserIndex, SQLite i el
+# snapshot binari): el login accepta el username o l'email sense distingir
+# majúscules ni espais a l'email, i un username que no és un string (JSON
+# {"username": 123}) és un login fallit, no un error 500.
+# Ús: python checkLogin.py
+import os
+import tempfile
+
+import datasetServer
+import server
+from dadesServer import users
+from backendServer import Backend
+from binarySnapshot import save
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def checkDao(userDao, user):
+    check("login amb el username", userDao.login(user.username, user.password).id == user.id)
+    check("login amb l'email en majúscules i amb espais",
+          userDao.login(f"  {user.email.upper()} ", user.password).id == user.id)
+    check("contrasenya incorrecta", userDao.login(user.username, user.password + "x") is None)
+    check("getUserByEmail normalitza", userDao.getUserByEmail(user.email.upper())['id'] == user.id)
+    for identifier in (123, None, ["mare"], {"a": 1}):
+        check(f"identifier {identifier!r}: login fallit", userDao.login(identifier, user.password) is None)
+
+
+def main():
+    data = datasetServer.generate(200, 1, seed=1)
+    user = data.users[17]
+    folder = tempfile.mkdtemp()
+    snapshot = os.path.join(folder, "check.tapsnap")
+    save(data, snapshot)
+    # En memòria amb les dades de dadesServer; SQLite i snapshot amb les generades
+    for name, environ, expected in (
+            ("memòria", {}, users[0]),
+            ("SQLite", {'TAPATAPP_DB': os.path.join(folder, "check.sqlite"), 'TAPATAPP_SNAPSHOT': snapshot}, user),
+            ("snapshot binari", {'TAPATAPP_SNAPSHOT': snapshot}, user)):
+        print(f"UserDAO ({name})")
+        backend = Backend(environ).load()
+        checkDao(backend.userDao, expected)
+        backend.release()
+
+    print("POST /login")
+    client = server.createApp().test_client()
+    response = client.post('/login', json={"username": " PROVA@gmail.com", "password": "12345"})
+    check("email amb majúscules i espais: Authenticated",
+          response.status_code == 200 and response.get_json()["msg"] == "Authenticated")
+    for body in ({"username": 123, "password": "12345"}, {"username": ["mare"], "password": "12345"},
+                 {"password": "12345"}):
+        response = client.post('/login', json=body)
+        check(f"{body}: {response.status_code} Not authenticated",
+              response.status_code == 200 and response.get_json()["msg"] == "Not authenticated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# Prova de les mètriques (metricsServer) i de GET /metrics:
+#  - text de Prometheus ben format: HELP/TYPE i una mostra per línia
+#  - histograma per ruta, mètode i status: buckets acumulats, +Inf, _sum i _count
+#  - peticions en curs per ruta (gauge)
+#  - temps dins dels DAO (TimedDao) i temps serialitzant per separat
+#  - amb Flask: la ruta és la plantilla, no la url; 404 (unmatched) i excepcions
+#    (500) també compten; les subpeticions de /batch compten a la seva ruta i no
+#    es barregen amb la petició de fora
+# Ús: python checkMetrics.py
+import re
+import time
+
+from flask import Flask, jsonify
+
+import server
+from metricsServer import Metrics, TimedDao, instrument, SERIALIZE, CONTENT_TYPE
+
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def parse(text):
+    # {(nom, ((etiqueta, valor), ...)): valor}; None si una línia no és vàlida
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            return None
+        name, labels, value = match.groups()
+        samples[(name, tuple(sorted(LABEL.findall(labels or ''))))] = float(value)
+    return samples
+
+
+def value(samples, name, **labels):
+    return samples.get((name, tuple(sorted((k, str(v)) for k, v in labels.items()))))
+
+
+class SlowDao:
+    def find(self, key):
+        time.sleep(0.02)
+        return {"key": key}
+
+
+def slowSerialize(obj):
+    time.sleep(0.01)
+    return jsonify(obj)
+
+
+def main():
+    print("Metrics (sense Flask)")
+    metrics = Metrics(buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.005, 0.01, 0.05, 0.5, 2.0):
+        previous = metrics.begin('/x')
+        metrics.end('/x', 'GET', 200, seconds, previous)
+    metrics.begin('/lenta')
+    metrics.begin('/ruta "rara"\\\n')
+    samples = parse(metrics.render())
+    name = "tapatapp_http_request_duration_seconds"
+    labels = {"route": "/x", "method": "GET", "status": "200"}
+    check("text vàlid", samples is not None)
+    check("buckets acumulats (le inclòs)", [value(samples, f"{name}_bucket", **labels, le=le)
+                                            for le in ("0.01", "0.1", "1.0", "+Inf")] == [2, 3, 4, 5])
+    check("_count i _sum", value(samples, f"{name}_count", **labels) == 5
+          and abs(value(samples, f"{name}_sum", **labels) - 2.565) < 1e-9)
+    check("en curs: les que han començat i no han acabat",
+          value(samples, "tapatapp_http_requests_in_flight", route="/lenta") == 1
+          and value(samples, "tapatapp_http_requests_in_flight", route="/x") == 0)
+    check("etiquetes escapades", value(samples, "tapatapp_http_requests_in_flight",
+                                       route='/ruta \\"rara\\"\\\\\\n') == 1)
+
+    print("Flask amb instrument()")
+    app = Flask(__name__)
+    app.logger.disabled = True   # la traça de /falla
+    metrics = instrument(app, Metrics())
+    dao = TimedDao(SlowDao(), metrics)
+    serialize = metrics.timed(SERIALIZE, slowSerialize)
+    inFlight = []
+
+    @app.route('/item/<int:item_id>')
+    def item(item_id):
+        inFlight.append(parse(metrics.render()))
+        return serialize(dao.find(item_id))
+
+    @app.route('/falla')
+    def falla():
+        raise RuntimeError("error de prova")
+
+    client = app.test_client()
+    for i in range(3):
+        client.get(f'/item/{i}')
+    client.get('/noexisteix')
+    client.get('/falla')
+    response = client.get('/metrics')
+    samples = parse(response.get_data(as_text=True))
+    check("Content-Type de Prometheus", response.headers['Content-Type'] == CONTENT_TYPE and samples is not None)
+    check("la ruta és la plantilla", value(samples, f"{name}_count", route="/item/<int:item_id>", method="GET",
+                                           status=200) == 3)
+    check("404: ruta unmatched", value(samples, f"{name}_count", route="unmatched", method="GET", status=404) == 1)
+    check("excepció: 500", value(samples, f"{name}_count", route="/falla", method="GET", status=500) == 1)
+    check("en curs dins de la petició: 1",
+          value(inFlight[0], "tapatapp_http_requests_in_flight", route="/item/<int:item_id>") == 1)
+    check("  i 0 quan acaba", value(samples, "tapatapp_http_requests_in_flight", route="/item/<int:item_id>") == 0)
+    phase = lambda p, suffix: value(samples, f"tapatapp_phase_{suffix}", route="/item/<int:item_id>", phase=p)
+    check("DAO i serialització per separat (3 peticions a cadascuna)",
+          phase("dao", "requests_total") == 3 and phase("serialize", "requests_total") == 3)
+    check(f"  dao {phase('dao', 'seconds_total'):.3f} s, serialize {phase('serialize', 'seconds_total'):.3f} s",
+          0.06 <= phase("dao", "seconds_total") < 0.5 and 0.03 <= phase("serialize", "seconds_total")
+          < phase("dao", "seconds_total"))
+    check("la petició inclou les dues fases", value(samples, f"{name}_sum", route="/item/<int:item_id>",
+                                                    method="GET", status=200) >= 0.09)
+
+    print("GET /metrics de server.py")
+    client = server.createApp().test_client()
+    before = parse(client.get('/metrics').get_data(as_text=True))
+    client.post('/batch', json={"requests": [{"method": "GET", "path": "/taps/1"},
+                                             {"method": "GET", "path": "/getusers"}]})
+    after = parse(client.get('/metrics').get_data(as_text=True))
+    count = lambda samples, route, method="GET": value(samples, f"{name}_count", route=route, method=method,
+                                                       status=200) or 0
+    check("/batch compta una vegada", count(after, "/batch", "POST") == count(before, "/batch", "POST") + 1)
+    check("  i cada subpetició a la seva ruta", count(after, "/taps/<int:tap_id>") == count(before, "/taps/<int:tap_id>") + 1
+          and count(after, "/getusers") == count(before, "/getusers") + 1)
+    check("les fases de les subpeticions no van a /batch",
+          value(after, "tapatapp_phase_requests_total", route="/batch", phase="dao") is None
+          and (value(after, "tapatapp_phase_requests_total", route="/getusers", phase="dao") or 0) >= 1)
+    check("cap petició en curs (menys el mateix /metrics)",
+          all(v == (1 if labels == (("route", "/metrics"),) else 0)
+              for (n, labels), v in after.items() if n == "tapatapp_http_requests_in_flight"))
+
+
+if __name__ == '__main__':
+    main()
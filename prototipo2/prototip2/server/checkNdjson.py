@@ -0,0 +1,82 @@
+# Prova del mode streaming (Accept: application/x-ndjson) de les llistes:
+#  - /getusers, /children, /children?user_id, /taps i /taps/search: un registre
+#    JSON per línia, els mateixos que la resposta JSON normal, i la resposta
+#    surt d'un generador (sense Content-Length)
+#  - /taps/search amb una data incorrecta: 400 abans de començar a enviar
+#  - APIClient.stream de serverMetods (stream_all / stream_by_child dels DAO)
+#    contra el servidor en un thread: els mateixos objectes que la llista
+# Amb dades generades (snapshot de datasetServer). Amb TAPATAPP_DB=fitxer.sqlite
+# (un fitxer nou) es prova el backend SQLite.
+# Ús: python checkNdjson.py
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+from werkzeug.serving import make_server
+
+import datasetServer
+
+data = datasetServer.generate(500, 2, seed=6)
+os.environ['TAPATAPP_SNAPSHOT'] = os.path.join(tempfile.mkdtemp(), "ndjson.snap.gz")
+datasetServer.save(data, os.environ['TAPATAPP_SNAPSHOT'])
+import server   # el backend es crea amb TAPATAPP_SNAPSHOT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'client'))
+sys.path.append(os.path.join(HERE, '..', '..', 'diagramas'))
+from serverMetods import APIClient, ChildDAO, TapDAO
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def main():
+    client = server.createApp().test_client()
+    child_id, user_id = data.taps[0].child_id, data.relations[0]['user_id']
+    day = data.taps[0].init[:10]
+    search = f"/taps/search?child_id={child_id}&start_date={day}T00:00:00&end_date={day}T23:59:59"
+    for path, key in (("/getusers", "data"), ("/children", "children"), (f"/children?user_id={user_id}", "children"),
+                      ("/taps", "taps"), (search, "taps")):
+        print(f"GET {path}")
+        expected = client.get(path).get_json()[key]
+        response = client.get(path, headers=NDJSON)
+        lines = response.get_data(as_text=True).splitlines()
+        check(f"{len(lines)} línies, una per registre",
+              response.mimetype == "application/x-ndjson" and [json.loads(line) for line in lines] == expected)
+        # Una resposta feta d'un generador no sap la mida: no porta Content-Length
+        check("  des d'un generador (sense Content-Length)",
+              "Content-Length" not in response.headers and len(expected) > 0)
+    response = client.get(f"/taps/search?child_id={child_id}&start_date=ahir", headers=NDJSON)
+    check("data incorrecta en streaming: 400", response.status_code == 400)
+    check("sense Accept ndjson: JSON normal", client.get("/taps").mimetype == "application/json")
+
+    print("APIClient.stream (serverMetods)")
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, server.createApp(), threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        api = APIClient(f"http://127.0.0.1:{httpd.server_port}")
+        children = ChildDAO(api)
+        check("ChildDAO.stream_all == find_all",
+              [c.to_dict() for c in children.stream_all()] == [c.to_dict() for c in children.find_all()])
+        taps = TapDAO(api)
+        streamed = list(taps.stream_by_child(child_id))
+        check("TapDAO.stream_by_child == find_by_child",
+              [t.to_dict() for t in streamed] == [t.to_dict() for t in taps.find_by_child(child_id)] and streamed)
+        lazy = taps.stream_all()
+        check("stream_all dona els taps d'un en un i es pot deixar a mitges",
+              next(lazy).__class__.__name__ == "Tap")
+        lazy.close()
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
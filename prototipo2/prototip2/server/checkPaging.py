@@ -0,0 +1,138 @@
+# Prova de la paginació amb cursor (limit i after opac):
+#  - getUsersPage dels DAO en memòria, SQLite i snapshot binari: totes les
+#    pàgines juntes són tots els usuaris en ordre d'id, sense repetits, també
+#    si s'afegeixen i s'esborren usuaris entre pàgines
+#  - GET /getusers?limit=N&after=... de server.py (limit entre 1 i 1000, 0 és
+#    el valor per defecte, cursor incorrecte: 400)
+#  - GET /users de primerPrototipo i UserDAO.iter_all de serverMetods (client)
+#    contra aquest servidor
+# Ús: python checkPaging.py
+import importlib.util
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+from copy import copy
+
+from werkzeug.serving import make_server
+
+import datasetServer
+import server
+from binarySnapshot import BinarySnapshot, SnapshotUserDao, save
+from dadesServer import User
+from DaoServer import UserDAO
+from sqliteServer import SqliteDatabase, SqliteUserDAO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'client'))
+sys.path.append(os.path.join(HERE, '..', '..', 'diagramas'))
+from serverMetods import APIClient, UserDAO as ClientUserDAO
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def pages(getPage, limit, between=None):
+    result, cursor = [], None
+    while True:
+        page, cursor = getPage(cursor, limit)
+        result += [u['id'] for u in page]
+        if cursor is None:
+            return result
+        if between is not None:
+            between()
+
+
+def checkDao(name, userDao, ids, writable):
+    print(f"getUsersPage ({name})")
+    check("limit 1, 7, 100 i 1000: tots en ordre", all(pages(userDao.getUsersPage, limit) == ids
+                                                       for limit in (1, 7, 100, 1000)))
+    if not writable:
+        return
+    rnd = random.Random(5)
+    kept = set(ids)
+    added, nextId = [], max(ids) + 1
+
+    def change():
+        # Entre pàgines: un usuari nou (id més gran que tots) i una baixa
+        nonlocal nextId
+        userDao.addUser(User(id=nextId, username=f"nou{nextId}", password="x", email=f"nou{nextId}@x.com",
+                             idrole=1, token=""))
+        added.append(nextId)
+        nextId += 1
+        victim = rnd.choice(sorted(kept))
+        userDao.deleteUser(victim)
+        kept.discard(victim)
+
+    seen = pages(userDao.getUsersPage, 13, change)
+    check("amb altes i baixes entre pàgines: sense repetits i en ordre",
+          len(seen) == len(set(seen)) and seen == sorted(seen))
+    check("  hi són tots els que no s'han esborrat", kept <= set(seen))
+    check("  i les altes (van al final)", set(added) <= set(seen))
+
+
+def primerModule():
+    # primerPrototipo/server.py amb un altre nom (aquí "server" ja és el de prototip2)
+    spec = importlib.util.spec_from_file_location(
+        'primerServer', os.path.join(HERE, '..', '..', '..', 'primerPrototipo', 'server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    data = datasetServer.generate(1000, 1, seed=5)
+    ids = sorted(u.id for u in data.users)
+    folder = tempfile.mkdtemp()
+    checkDao("memòria", UserDAO([copy(u) for u in data.users]), ids, True)
+    db = SqliteDatabase(os.path.join(folder, "paging.sqlite"))
+    db.load([copy(u) for u in data.users])
+    checkDao("SQLite", SqliteUserDAO(db), ids, True)
+    path = os.path.join(folder, "paging.tapsnap")
+    save(data, path)
+    with BinarySnapshot(path) as snapshot:
+        checkDao("snapshot binari", SnapshotUserDao(snapshot), ids, False)
+
+    print("GET /getusers")
+    for i in range(300):
+        server.userDao.addUser(User(id=100 + i, username=f"paging{i}", password="x", email=f"paging{i}@x.com",
+                                    idrole=1, token=""))
+    client = server.createApp().test_client()
+    everyone = [u['id'] for u in client.get('/getusers').get_json()['data']]
+
+    def httpPage(cursor, limit):
+        query = f"/getusers?limit={limit}" + (f"&after={cursor}" if cursor else "")
+        body = client.get(query).get_json()
+        return body['data'], body.get('next')
+
+    check("les pàgines de 25 són la llista sencera", pages(httpPage, 25) == everyone and len(everyone) == 302)
+    check("limit=0 dona la mida per defecte (100)", len(httpPage(None, 0)[0]) == 100)
+    check("limit negatiu dona 1 usuari", len(httpPage(None, -5)[0]) == 1)
+    check("limit=5000 dona com a molt 1000", len(httpPage(None, 5000)[0]) == 302)
+    check("l'última pàgina no té next", httpPage(None, 302)[1] is None)
+    check("cursor incorrecte: 400", client.get('/getusers?limit=5&after=%%%').status_code == 400)
+
+    print("GET /users (primerPrototipo) i UserDAO.iter_all (serverMetods)")
+    primer = primerModule()
+    for i in range(250):
+        primer.user_dao.addUser(primer.User(username=f"u{i:03d}", nom=f"U {i}", password="x", email=f"u{i}@x.com"))
+    names = sorted(u['username'] for u in primer.app.test_client().get('/users').get_json()['users'])
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', 0, primer.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        dao = ClientUserDAO(APIClient(f"http://127.0.0.1:{httpd.server_port}"))
+        for size in (1, 40, 1000):
+            found = [u.username for u in dao.iter_all(page_size=size)]
+            check(f"iter_all(page_size={size}): tots, ordenats per username", found == names and len(found) == 253)
+        check("find_all", [u.username for u in dao.find_all()] == names)
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
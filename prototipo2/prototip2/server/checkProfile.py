@@ -0,0 +1,73 @@
+# Prova del perfil a demanda (profileServer) amb el servidor Flask:
+#  - sense token ni mostra no s'instal·la res
+#  - una capçalera X-Profile incorrecta (també amb caràcters no ASCII) no fa
+#    perfil ni dona accés a /debug/profiles, i la petició respon igual (200)
+#  - amb el token es guarda el perfil, surt a /debug/profiles i es pot descarregar
+#  - del directori només queden els últims TAPATAPP_PROFILE_KEEP perfils
+#  - des de 127.0.0.1 només es dona accés amb TAPATAPP_PROFILE_LOCAL=1
+# Ús: python checkProfile.py
+import os
+import tempfile
+
+import profileServer
+import server
+
+TOKEN = "secret-token"
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def createClient(**environ):
+    # createApp llegeix la configuració del perfil de l'entorn
+    for key in ('TAPATAPP_PROFILE_TOKEN', 'TAPATAPP_PROFILE_RATE', 'TAPATAPP_PROFILE_DIR',
+                'TAPATAPP_PROFILE_KEEP', 'TAPATAPP_PROFILE_LOCAL'):
+        os.environ.pop(key, None)
+    os.environ.update(environ)
+    return server.createApp().test_client()
+
+
+def main():
+    print("configuració")
+    check("sense token ni mostra no hi ha perfil", profileServer.fromEnv({}) is None)
+    check("TAPATAPP_PROFILE_LOCAL sense token tampoc", profileServer.fromEnv({'TAPATAPP_PROFILE_LOCAL': '1'}) is None)
+
+    directory = tempfile.mkdtemp()
+    client = createClient(TAPATAPP_PROFILE_TOKEN=TOKEN, TAPATAPP_PROFILE_DIR=directory, TAPATAPP_PROFILE_KEEP="3")
+
+    print("capçalera incorrecta")
+    for value in ("wrong", "", "tòken-àèí", TOKEN + "x"):
+        response = client.get('/getusers', headers={"X-Profile": value})
+        check(f"X-Profile {value!r}: {response.status_code} == 200 sense perfil",
+              response.status_code == 200 and "X-Profile-File" not in response.headers)
+        response = client.get('/debug/profiles', headers={"X-Profile": value})
+        check(f"  /debug/profiles: {response.status_code} == 404", response.status_code == 404)
+    check("cap fitxer al directori", os.listdir(directory) == [])
+    check("des de 127.0.0.1 sense TAPATAPP_PROFILE_LOCAL: 404", client.get('/debug/profiles').status_code == 404)
+
+    print("amb el token")
+    names = []
+    for _ in range(5):
+        response = client.get('/getusers', headers={"X-Profile": TOKEN})
+        names.append(response.headers.get("X-Profile-File"))
+    check("cada petició té el seu perfil", all(names) and len(set(names)) == 5)
+    check("el nom porta el mètode i la ruta", all("_GET_getusers_" in name and name.endswith("ms.prof")
+                                                  for name in names))
+    check("només queden els 3 últims", sorted(os.listdir(directory)) == sorted(names[-3:]))
+    listing = client.get('/debug/profiles', headers={"X-Profile": TOKEN}).get_json()
+    check("/debug/profiles llista els 3 últims, del més nou al més antic",
+          [p["file"] for p in listing["profiles"]] == names[:-4:-1])
+    check("amb el resum de funcions", all(p["top"] and p["reason"] == "header" for p in listing["profiles"]))
+    response = client.get(f'/debug/profiles/{names[-1]}', headers={"X-Profile": TOKEN})
+    check("el perfil es pot descarregar", response.status_code == 200 and len(response.data) > 0)
+
+    print("TAPATAPP_PROFILE_LOCAL=1")
+    client = createClient(TAPATAPP_PROFILE_TOKEN=TOKEN, TAPATAPP_PROFILE_DIR=directory, TAPATAPP_PROFILE_LOCAL="1")
+    check("des de 127.0.0.1 sense token: 200", client.get('/debug/profiles').status_code == 200)
+    check("però una petició normal no fa perfil", "X-Profile-File" not in client.get('/getusers').headers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Prova de l'índex de relacions user <-> child (indexServer.RelationIndex) que fan
+# servir ChildDao i UserDAO: children d'un user, users d'un child i rols han de
+# coincidir amb recórrer la llista de relacions sencera, també després d'altes i
+# baixes de relacions i d'esborrar children. La versió per user (ETag de
+# /children?user_id) només canvia si canvien les relacions d'aquell user.
+# Ús: python checkRelations.py [users]   (per defecte 1000)
+import random
+import sys
+
+import datasetServer
+import server
+from DaoServer import UserDAO, ChildDao
+from indexServer import RelationIndex
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def scan(relations, children, user_id):
+    # El que feia ChildDao.getChild abans de l'índex
+    ids = {r['child_id'] for r in relations if r['user_id'] == user_id}
+    return sorted(c for c in children if c in ids)
+
+
+def compare(name, relations, children, userDao, childDao, users, childIds):
+    byId = lambda c: c['id']
+    check(f"{name}: getChildsOfUser",
+          all([c['id'] for c in sorted(childDao.getChildsOfUser(u), key=byId)] == scan(relations, children, u)
+              for u in users))
+    check(f"{name}: getUsersOfChild",
+          all(sorted(childDao.getUsersOfChild(c)) == sorted({r['user_id'] for r in relations if r['child_id'] == c})
+              for c in childIds))
+    check(f"{name}: getUserRole",
+          all(sorted(userDao.getUserRole(u)) == sorted(r['rol_id'] for r in relations if r['user_id'] == u)
+              for u in users))
+
+
+def main(n):
+    data = datasetServer.generate(n, 1, seed=3)
+    rnd = random.Random(3)
+    index = RelationIndex(data.relations)
+    userDao = UserDAO(data.users, relations=index)
+    childDao = ChildDao(data.children, relations=index)
+    relations = [dict(r) for r in data.relations]
+    children = {c.id for c in data.children}
+    users = [u.id for u in data.users]
+    childIds = sorted(children)
+
+    print(f"relacions ({len(relations)})")
+    compare("dades generades", relations, children, userDao, childDao, rnd.sample(users, 200),
+            rnd.sample(childIds, 200))
+    check("un user sense relacions", childDao.getChildsOfUser(-1) == [] and userDao.getUserRole(-1) == [])
+
+    print("altes i baixes")
+    wrongRemoved = 0
+    for _ in range(2000):
+        user_id, child_id, rol_id = rnd.choice(users), rnd.choice(childIds), rnd.choice((1, 2))
+        if rnd.random() < 0.6:
+            if childDao.addRelation(user_id, child_id, rol_id) is not None:
+                relations.append({"user_id": user_id, "child_id": child_id, "rol_id": rol_id})
+        else:
+            removed = childDao.removeRelation(user_id, child_id)
+            before = len(relations)
+            relations = [r for r in relations if not (r['user_id'] == user_id and r['child_id'] == child_id)]
+            wrongRemoved += len(removed) != before - len(relations)
+    check("removeRelation retorna les relacions esborrades", not wrongRemoved)
+    check("una relació repetida no s'afegeix dues vegades",
+          childDao.addRelation(relations[0]['user_id'], relations[0]['child_id'], relations[0]['rol_id']) is None)
+    for child_id in rnd.sample(childIds, 20):
+        childDao.deleteChild(child_id)
+        relations = [r for r in relations if r['child_id'] != child_id]
+        children.discard(child_id)
+    compare("després dels canvis", relations, children, userDao, childDao, rnd.sample(users, 200), childIds)
+    check("len(RelationIndex)", len(index) == len(relations))
+
+    print("versió per user")
+    a, b = users[0], users[1]
+    versionA, versionB = childDao.getVersion(a), childDao.getVersion(b)
+    childDao.addRelation(a, childIds[-1], 2)
+    check("canvia la del user que té la relació nova", childDao.getVersion(a) != versionA)
+    check("no canvia la dels altres", childDao.getVersion(b) == versionB)
+
+    print("POST /Child")
+    client = server.createApp().test_client()
+    response = client.post('/Child', json={"id_user": 1}).get_json()
+    check("children de l'usuari 1 (dadesServer)", response["coderesponse"] == "1" and response["data"]
+          and response["msg"] == len(response["data"]) and all("child_name" in c for c in response["data"]))
+    check("id_user que no és un número: 400", client.post('/Child', json={"id_user": "x"}).status_code == 400)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,94 @@
+# Prova de les sessions amb token (sessionServer) i del seu ús al servidor Flask:
+#  - caducitat lliscant (amb un rellotge fals) i purge de les caducades
+#  - com a molt maxSessions: es descarta la menys usada (LRU)
+#  - el UserDAO (memòria i SQLite) revoca les sessions d'un usuari esborrat o
+#    amb un password nou, però no si només canvia l'email
+#  - /login retorna el token, /me el valida i /logout el revoca
+# Ús: python checkSessions.py
+import os
+import tempfile
+from copy import copy
+
+import server
+from DaoServer import UserDAO
+from dadesServer import users
+from sqliteServer import SqliteDatabase, SqliteUserDAO
+from sessionServer import SessionStore, bearerToken
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def main():
+    print("caducitat")
+    clock = Clock()
+    store = SessionStore(ttl=60, clock=clock)
+    session = store.create(users[0])
+    clock.now += 59
+    check("vàlida abans del ttl", store.get(session.token) is session)
+    clock.now += 59
+    check("cada ús l'allarga (lliscant)", store.get(session.token) is session)
+    clock.now += 60
+    check("caducada després de ttl sense ús", store.get(session.token) is None and len(store) == 0)
+    old = [store.create(users[0]) for _ in range(3)]
+    clock.now += 30
+    fresh = store.create(users[1])
+    clock.now += 31
+    check("purge treu només les caducades", store.purge() == 3 and store.get(fresh.token) is fresh)
+    check("token buit o desconegut", store.get(None) is None and store.get("x") is None
+          and store.get(old[0].token) is None)
+
+    print("LRU")
+    store = SessionStore(ttl=60, maxSessions=3, clock=clock)
+    first, second, third = (store.create(users[0]) for _ in range(3))
+    store.get(first.token)
+    store.create(users[1])
+    check("es descarta la menys usada", store.get(second.token) is None and store.get(first.token) is first
+          and store.get(third.token) is third and store.evictions == 1)
+
+    # Còpies dels usuaris: el UserDAO en memòria modifica els objectes que rep
+    sample = [copy(u) for u in users[:2]]
+    db = SqliteDatabase(os.path.join(tempfile.mkdtemp(), "check.sqlite"))
+    db.load(sample)
+    for name, create in (("memòria", lambda store: UserDAO([copy(u) for u in sample], sessions=store)),
+                         ("SQLite", lambda store: SqliteUserDAO(db, sessions=store))):
+        print(f"revocació des del UserDAO ({name})")
+        store = SessionStore(ttl=60, clock=clock)
+        userDao = create(store)
+        mare, pare = (userDao.login(u.username, u.password) for u in sample)
+        tokens = [store.create(mare).token for _ in range(2)]
+        other = store.create(pare).token
+        userDao.updateUser(mare.id, email="nou@gmail.com")
+        check("canviar l'email no revoca", all(store.get(t) for t in tokens))
+        userDao.updateUser(mare.id, password="nou")
+        check("canviar el password revoca les seves sessions", not any(store.get(t) for t in tokens))
+        check("  però no les dels altres", store.get(other) is not None)
+        userDao.deleteUser(pare.id)
+        check("esborrar l'usuari revoca les seves sessions", store.get(other) is None)
+
+    print("/login, /me i /logout")
+    client = server.createApp().test_client()
+    token = client.post('/login', json={"username": "mare", "password": "12345"}).get_json()["data"]["token"]
+    check("el login retorna un token", isinstance(token, str) and len(token) > 20)
+    check("bearerToken", bearerToken(f"Bearer {token}") == token and bearerToken(token) is None)
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get('/me', headers=headers)
+    check(f"/me amb el token: {response.status_code} == 200",
+          response.status_code == 200 and response.get_json()["data"]["user_id"] == 1)
+    check("/me sense token: 401", client.get('/me').status_code == 401)
+    check("/logout", client.post('/logout', headers=headers).status_code == 200)
+    check("/me després del logout: 401", client.get('/me', headers=headers).status_code == 401)
+
+
+if __name__ == '__main__':
+    main()
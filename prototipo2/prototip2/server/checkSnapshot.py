@@ -0,0 +1,99 @@
+# Prova dels DAO només de lectura del snapshot binari (binarySnapshot) contra
+# els DAO en memòria (DaoServer) amb les mateixes dades: usuaris, login,
+# pàgines, children i relacions, taps per child i per dates i el resum del
+# tractament per dia han de coincidir. Les escriptures han de donar PermissionError.
+# Ús: python checkSnapshot.py [users]   (per defecte 2000)
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import datasetServer
+from binarySnapshot import BinarySnapshot, SnapshotUserDao, SnapshotChildDao, SnapshotTapDao, save
+from DaoServer import UserDAO, ChildDao, TapDao
+from indexServer import RelationIndex
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def pages(dao):
+    result, cursor = [], None
+    while True:
+        page, cursor = dao.getUsersPage(cursor, 97)
+        result += page
+        if cursor is None:
+            return result
+
+
+def main(n):
+    data = datasetServer.generate(n, 3, seed=1)
+    relations = RelationIndex(data.relations)
+    memory = (UserDAO(data.users, relations=relations), ChildDao(data.children, relations=relations),
+              TapDao(data.taps))
+    path = os.path.join(tempfile.mkdtemp(), "check.tapsnap")
+    save(data, path)
+    rnd = random.Random(1)
+    with BinarySnapshot(path) as snapshot:
+        userDao, childDao, tapDao = SnapshotUserDao(snapshot), SnapshotChildDao(snapshot), SnapshotTapDao(snapshot)
+        users = rnd.sample(data.users, 200)
+        children = [c.id for c in rnd.sample(data.children, 200)]
+
+        print(f"users ({len(data.users)})")
+        check("getUserByUsername i getUserByEmail",
+              all(userDao.getUserByUsername(u.username) == memory[0].getUserByUsername(u.username)
+                  and userDao.getUserByEmail(u.email.upper()) == memory[0].getUserByEmail(u.email.upper())
+                  for u in users))
+        check("login amb username o email, i contrasenya incorrecta",
+              all(userDao.login(u.email, u.password).id == u.id and userDao.login(u.username, "x") is None
+                  for u in users))
+        check("getUsersPage recorre tots els usuaris en ordre d'id",
+              pages(userDao) == sorted(memory[0].getAllUsers(), key=lambda u: u['id']))
+        check("getUserRole", all(sorted(userDao.getUserRole(u.id)) == sorted(memory[0].getUserRole(u.id))
+                                 for u in users))
+
+        print(f"children ({len(data.children)})")
+        byId = lambda c: c['id']
+        check("getChildsOfUser", all(sorted(childDao.getChildsOfUser(u.id), key=byId) ==
+                                     sorted(memory[1].getChildsOfUser(u.id), key=byId) for u in users))
+        check("getUsersOfChild i getChildById",
+              all(sorted(childDao.getUsersOfChild(c)) == sorted(memory[1].getUsersOfChild(c))
+                  and childDao.getChildById(c) == memory[1].getChildById(c) for c in children))
+
+        print(f"taps ({len(data.taps)})")
+        first = datetime.fromisoformat(min(t.init for t in data.taps)).replace(hour=0, minute=0)
+        days = [(first + timedelta(days=d)).date().isoformat() for d in range(-1, 5)]
+        check("getTap", all(tapDao.getTap(t.id) == memory[2].getTap(t.id) for t in rnd.sample(data.taps, 200)))
+        check("getTapsByChild sencer i per dia",
+              all(list(tapDao.getTapsByChild(c)) == list(memory[2].getTapsByChild(c))
+                  and list(tapDao.getTapsByChild(c, f"{d}T00:00:00", f"{d}T23:59:59")) ==
+                  list(memory[2].getTapsByChild(c, f"{d}T00:00:00", f"{d}T23:59:59"))
+                  for c in children for d in days[1:3]))
+        start, end = f"{days[2]}T10:00:00", f"{days[2]}T11:00:00"
+        check("getTapsByDateRange", sorted(tapDao.getTapsByDateRange(start, end), key=byId) ==
+              sorted(memory[2].getTapsByDateRange(start, end), key=byId))
+        now = f"{days[-2]}T12:00:00"
+        diverging = [(c, d) for c in children for d in days
+                     if tapDao.getTreatment(c, d, now) != memory[2].getTreatment(c, d, now)]
+        check(f"getTreatment: {len(diverging)} de {len(children) * len(days)} dies diferents", not diverging)
+
+        print("escriptures")
+        tap = data.taps[0]
+        for name, call in (("createTap", lambda: tapDao.createTap(tap)),
+                           ("closeTap", lambda: tapDao.closeTap(tap.id, tap.init)),
+                           ("deleteTap", lambda: tapDao.deleteTap(tap.id)),
+                           ("addUser", lambda: userDao.addUser(users[0]))):
+            try:
+                call()
+                rejected = False
+            except PermissionError:
+                rejected = True
+            check(f"{name} dona PermissionError", rejected)
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
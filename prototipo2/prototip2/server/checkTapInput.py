@@ -0,0 +1,67 @@
+# Prova d'entrades incorrectes als taps (servidor Flask):
+#  - POST /taps: cada tap incorrecte dona 400 i no deixa res a mitges; el tap
+#    correcte que s'envia just després es crea (201)
+#  - PUT /taps/<id>/close amb un end incorrecte o anterior a init: 400, i ni el
+#    tap ni el resum del tractament canvien
+#  - /taps/bulk rebutja les mateixes files amb el mateix missatge que POST /taps
+# Ús: python checkTapInput.py   (amb TAPATAPP_DB=fitxer.sqlite prova SQLite)
+import server
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+GOOD = {"child_id": 1, "status_id": 1, "user_id": 1, "init": "2024-12-19T08:00:00"}
+
+BAD_TAPS = [
+    ("init que no és una data", {"init": "not-a-date"}),
+    ("end que no és una data", {"end": "garbage"}),
+    ("status_id 1000", {"status_id": 1000}),
+    ("id que no és un enter", {"id": "x"}),
+    ("end anterior a init", {"end": "2024-12-19T07:00:00"}),
+    ("status_id com a string", {"status_id": "1"}),
+    ("status_id desconegut", {"status_id": 42}),
+    ("child_id 0", {"child_id": 0}),
+    ("sense init", {"init": None}),
+    ("init que no és un string", {"init": 12345}),
+]
+
+
+def main():
+    client = server.createApp().test_client()
+    print("POST /taps incorrecte i després un de correcte")
+    for minute, (name, fields) in enumerate(BAD_TAPS):
+        response = client.post('/taps', json={**GOOD, **fields})
+        check(f"{name}: {response.status_code} == 400", response.status_code == 400)
+        good = {**GOOD, "init": f"2024-12-19T08:{minute:02d}:30"}
+        response = client.post('/taps', json=good)
+        check(f"  el següent tap correcte: {response.status_code} == 201", response.status_code == 201)
+        tap_id = response.get_json()["id"]
+        check("  i es pot llegir", client.get(f'/taps/{tap_id}').get_json()["init"] == good["init"])
+
+    print("PUT /taps/<id>/close incorrecte")
+    response = client.post('/taps', json={**GOOD, "child_id": 2, "init": "2024-12-20T10:00:00"})
+    tap_id = response.get_json()["id"]
+    summary = client.get('/treatment/2?date=2024-12-20').get_json()
+    for name, end in (("end anterior a init", "2024-12-20T09:00:00"), ("end que no és una data", "garbage"),
+                      ("end que no és un string", 5)):
+        response = client.put(f'/taps/{tap_id}/close', json={"end_time": end})
+        check(f"{name}: {response.status_code} == 400", response.status_code == 400)
+    check("el tap continua obert", client.get(f'/taps/{tap_id}').get_json()["end"] is None)
+    check("el resum del dia no ha canviat", client.get('/treatment/2?date=2024-12-20').get_json() == summary)
+    response = client.put(f'/taps/{tap_id}/close', json={"end_time": "2024-12-20T11:00:00"})
+    check(f"end correcte: {response.status_code} == 200", response.status_code == 200)
+
+    print("/taps/bulk amb les mateixes files")
+    rows = [{**GOOD, **fields, "client_id": f"bad-{i}"} for i, (_, fields) in enumerate(BAD_TAPS)
+            if "id" not in fields]
+    single = [client.post('/taps', json=row).get_json()["error"] for row in rows]
+    bulk = client.post('/taps/bulk', json={"taps": rows}).get_json()
+    check("totes rebutjades, amb el mateix error que POST /taps",
+          bulk["count"] == 0 and [e["error"] for e in bulk["errors"]] == single)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Prova del magatzem de taps per child ordenat per temps (tapTable.TapStore):
+# findByChild, countByChild, findByDateRange i lastOfChild han de coincidir amb
+# filtrar la llista sencera, amb taps que arriben desordenats, amb el mateix
+# init, i després d'esborrar-ne i tancar-ne. Les consultes són generadors.
+# També /taps/search (per child, per dates i amb dates incorrectes).
+# Ús: python checkTapStore.py [taps]   (per defecte 20000)
+import inspect
+import random
+import sys
+from datetime import datetime, timedelta
+
+import server
+from dadesServer import Tap
+from indexServer import parseTime
+from tapTable import TapStore
+
+FIRST = datetime(2024, 11, 1)
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def randomTime(rnd, days=30):
+    return (FIRST + timedelta(seconds=rnd.randrange(days * 86400))).isoformat()
+
+
+def expected(taps, child_id, start, end):
+    # El que faria un recorregut de la llista: mateix ordre (init, després ordre d'alta)
+    lo, hi = parseTime(start), parseTime(end)
+    found = [t for t in taps if (child_id is None or t.child_id == child_id)
+             and (lo is None or parseTime(t.init) >= lo) and (hi is None or parseTime(t.init) <= hi)]
+    return sorted(found, key=lambda t: parseTime(t.init))
+
+
+def ids(taps):
+    return [t.id for t in taps]
+
+
+def main(n):
+    rnd = random.Random(4)
+    taps = []
+    for i in range(n):
+        init = randomTime(rnd) if i % 10 else (taps[-1].init if taps else randomTime(rnd))
+        taps.append(Tap(id=i + 1, child_id=rnd.randrange(1, 40), status_id=rnd.randrange(1, 4), user_id=1,
+                        init=init, end=None))
+    store = TapStore(taps)
+    children = sorted({t.child_id for t in taps})
+    ranges = [(None, None)] + [tuple(sorted((randomTime(rnd), randomTime(rnd)))) for _ in range(30)]
+
+    print(f"{n} taps desordenats ({len(children)} children)")
+    check("findByChild és un generador", inspect.isgenerator(store.findByChild(1)))
+    check("findByChild per rang == filtrar la llista",
+          all(ids(store.findByChild(c, s, e)) == ids(expected(taps, c, s, e)) for c in children for s, e in ranges))
+    check("countByChild", all(store.countByChild(c, s, e) == len(expected(taps, c, s, e))
+                              for c in children for s, e in ranges))
+    check("findByDateRange", all(sorted(ids(store.findByDateRange(s, e))) == sorted(ids(expected(taps, None, s, e)))
+                                 for s, e in ranges))
+    check("límits inclosos", all(ids(store.findByChild(t.child_id, t.init, t.init)) ==
+                                 ids(expected(taps, t.child_id, t.init, t.init)) for t in taps[:200]))
+
+    print("esborrar i tancar")
+    for tap in rnd.sample(taps, n // 5):
+        store.delete(tap.id)
+        taps.remove(tap)
+    check("delete d'un id que no hi és", store.delete(-5) is None and len(store) == len(taps))
+    for tap in rnd.sample(taps, n // 5):
+        store.close(tap.id, (datetime.fromisoformat(tap.init) + timedelta(minutes=5)).isoformat())
+        tap.end = store.get(tap.id).end
+    check("findByChild després dels canvis",
+          all([t.to_dict() for t in store.findByChild(c, s, e)] == [t.to_dict() for t in expected(taps, c, s, e)]
+              for c in children for s, e in ranges[:10]))
+    check("lastOfChild", all(store.lastOfChild(c).id == expected(taps, c, None, None)[-1].id for c in children))
+    check("un child sense taps", list(store.findByChild(999)) == [] and store.lastOfChild(999) is None)
+
+    print("GET /taps/search")
+    client = server.createApp().test_client()
+    client.post('/taps', json={"child_id": 7, "status_id": 1, "user_id": 1, "init": "2024-12-23T08:00:00"})
+    client.post('/taps', json={"child_id": 7, "status_id": 2, "user_id": 1, "init": "2024-12-24T08:00:00"})
+    found = client.get('/taps/search?child_id=7&start_date=2024-12-23T00:00:00&end_date=2024-12-23T23:59:59')
+    check("per child i dates", [t["init"] for t in found.get_json()["taps"]] == ["2024-12-23T08:00:00"])
+    found = client.get('/taps/search?child_id=7&status_id=2').get_json()
+    check("amb status_id", [t["init"] for t in found["taps"]] == ["2024-12-24T08:00:00"])
+    check("data incorrecta: 400", client.get('/taps/search?child_id=7&start_date=ahir').status_code == 400)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
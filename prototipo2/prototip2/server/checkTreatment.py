@@ -0,0 +1,94 @@
+# Prova de l'acumulador del tractament (treatmentAccumulator) contra el càlcul
+# columnar de tapColumns.dailyDurations: seqüències aleatòries de taps nous,
+# retroactius, solapats, tancats i esborrats han de donar els mateixos segons
+# de son, pegat i sense pegat per child i dia. També comprova que un end
+# incorrecte no es queda guardat al tap.
+# Ús: python checkTreatment.py [seqüències]   (per defecte 300)
+import random
+import sys
+from datetime import datetime, timedelta
+
+from dadesServer import Tap, SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH
+from tapColumns import TapColumns, dailyDurations
+from treatmentAccumulator import TreatmentAccumulator
+
+START = datetime(2024, 11, 1)
+STATUSES = (SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH)
+
+
+def stamp(minutes):
+    return (START + timedelta(minutes=minutes)).isoformat()
+
+
+def accumulated(acc):
+    return {(child, day): tuple(slots) for child, days in acc.days.items()
+            for day, slots in days.items() if any(slots)}
+
+
+def columnar(acc):
+    totals = dailyDurations(TapColumns.fromTaps(list(acc.store)))
+    return {(int(c), int(d)): (int(s), int(w), int(n))
+            for c, d, s, w, n in zip(totals['child'], totals['day'], totals['sleep'],
+                                     totals['wear'], totals['noPatch']) if s or w or n}
+
+
+def randomSequence(rnd, acc):
+    # Inits diferents per child (amb inits iguals l'ordre dels dos càlculs pot variar)
+    inits = iter(rnd.sample(range(3 * 1440), 40))
+    nextId = iter(range(1, 1000))
+    for _ in range(rnd.randint(3, 25)):
+        child = rnd.randint(1, 2)
+        action = rnd.random()
+        taps = [t for t in acc.store if t.child_id == child]
+        if action < 0.6 or not taps:
+            init = next(inits)
+            end = None if rnd.random() < 0.4 else stamp(init + rnd.randint(1, 900))
+            acc.insert(Tap(id=next(nextId), child_id=child, status_id=rnd.choice(STATUSES),
+                           user_id=1, init=stamp(init), end=end))
+        elif action < 0.85:
+            tap = rnd.choice(taps)
+            init = int((datetime.fromisoformat(tap.init) - START).total_seconds() // 60)
+            acc.close(tap.id, stamp(init + rnd.randint(1, 900)))
+        else:
+            acc.delete(rnd.choice(taps).id)
+
+
+def check(name, condition):
+    print(f"  {'OK ' if condition else 'ERR'} {name}")
+    assert condition, name
+
+
+def main(n):
+    print("tap solapat dins d'un tap tancat més llarg")
+    acc = TreatmentAccumulator()
+    acc.insert(Tap(id=1, child_id=1, status_id=AWAKE_PATCH, user_id=1, init=stamp(480), end=stamp(720)))
+    acc.insert(Tap(id=2, child_id=1, status_id=AWAKE_NO_PATCH, user_id=1, init=stamp(600), end=stamp(660)))
+    summary = acc.summary(1, START.date().isoformat())
+    check(f"sense pegat {summary['no_patch_minutes']} min == 60, pegat {summary['patch_minutes']} min == 120",
+          summary['no_patch_minutes'] == 60 and summary['patch_minutes'] == 120)
+
+    print("end incorrecte")
+    acc = TreatmentAccumulator()
+    acc.insert(Tap(id=1, child_id=1, status_id=SLEEP, user_id=1, init=stamp(0)))
+    try:
+        acc.close(1, "garbage")
+        rejected = False
+    except ValueError:
+        rejected = True
+    check("close amb 'garbage' dona ValueError i el tap continua obert",
+          rejected and acc.store.get(1).end is None)
+    acc.insert(Tap(id=2, child_id=1, status_id=AWAKE_PATCH, user_id=1, init=stamp(60)))
+    check("després es poden continuar afegint taps", acc.store.get(2) is not None)
+
+    print(f"{n} seqüències aleatòries contra tapColumns.dailyDurations")
+    rnd = random.Random(1)
+    diverging = 0
+    for _ in range(n):
+        acc = TreatmentAccumulator()
+        randomSequence(rnd, acc)
+        diverging += accumulated(acc) != columnar(acc)
+    check(f"{diverging} de {n} seqüències donen resultats diferents", diverging == 0)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
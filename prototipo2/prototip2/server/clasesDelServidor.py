@@ -1,6 +1,18 @@
 # Dades d'exemple amb List 
+
+# Les classes del model fan servir __slots__: sense __dict__ per instància
+# ocupen menys memòria (hi pot haver milions de taps). to_dict() en fa el diccionari.
+class Model:
+    __slots__ = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 # Clase User 
-class User:
+class User(Model):
+    __slots__ = ('id', 'username', 'password', 'email', 'idrole')
+
     def __init__(self, id, username, password, email, idrole):
         self.id = id
         self.username = username
@@ -12,7 +24,9 @@ class User:
         return self.username + ":" + self.password + ":" + self.email
 
 # Clase Child
-class Child:
+class Child(Model):
+    __slots__ = ('id', 'child_name', 'sleep_average', 'treatment_id', 'time')
+
     def __init__(self, id, child_name, sleep_average, treatment_id, time):
         self.id = id
         self.child_name = child_name
@@ -21,8 +35,10 @@ class Child:
         self.time = time
 
 # Clase Tap
-class Tap:
-    def __init__(self, id, child_id, status_id, user_id, init, end):
+class Tap(Model):
+    __slots__ = ('id', 'child_id', 'status_id', 'user_id', 'init', 'end')
+
+    def __init__(self, id, child_id, status_id, user_id, init, end=None):
         self.id = id
         self.child_id = child_id
         self.status_id = status_id
@@ -31,19 +47,25 @@ class Tap:
         self.end = end
 
 # Clase Status
-class Status:
+class Status(Model):
+    __slots__ = ('id', 'name')
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
 
 # Clase Role
-class Role:
+class Role(Model):
+    __slots__ = ('id', 'type_rol')
+
     def __init__(self, id, type_rol):
         self.id = id
         self.type_rol = type_rol
 
 # Clase Treatment
-class Treatment:
+class Treatment(Model):
+    __slots__ = ('id', 'name')
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
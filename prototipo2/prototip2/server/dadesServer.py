@@ -1,6 +1,18 @@
 # Dades d'exemple amb List 
+
+# Les classes del model fan servir __slots__: sense __dict__ per instància
+# ocupen menys memòria (hi pot haver milions de taps). to_dict() en fa el diccionari.
+class Model:
+    __slots__ = ()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 # Clase User 
-class User:
+class User(Model):
+    __slots__ = ('id', 'username', 'password', 'email', 'idrole', 'token')
+
     def __init__(self, id, username, password, email, idrole,token):
         self.id = id
         self.username = username
@@ -13,7 +25,9 @@ class User:
         return self.username + ":" + self.password + ":" + self.email
 
 # Clase Child
-class Child:
+class Child(Model):
+    __slots__ = ('id', 'child_name', 'sleep_average', 'treatment_id', 'time')
+
     def __init__(self, id, child_name, sleep_average, treatment_id, time):
         self.id = id
         self.child_name = child_name
@@ -22,28 +36,37 @@ class Child:
         self.time = time
 
 # Clase Tap
-class Tap:
-    def __init__(self, id, child_id, status_id, user_id, init):
+class Tap(Model):
+    __slots__ = ('id', 'child_id', 'status_id', 'user_id', 'init', 'end')
+
+    def __init__(self, id, child_id, status_id, user_id, init, end=None):
         self.id = id
         self.child_id = child_id
         self.status_id = status_id
         self.user_id = user_id
         self.init = init
+        self.end = end
 
 # Clase Status
-class Status:
+class Status(Model):
+    __slots__ = ('id', 'name')
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
 
 # Clase Role
-class Role:
+class Role(Model):
+    __slots__ = ('id', 'type_rol')
+
     def __init__(self, id, type_rol):
         self.id = id
         self.type_rol = type_rol
 
 # Clase Treatment
-class Treatment:
+class Treatment(Model):
+    __slots__ = ('id', 'name')
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
@@ -87,6 +110,11 @@ statuses = [
     Status(id=3, name="awake no_eyepatch")
 ]
 
+# ids de statuses
+SLEEP = 1
+AWAKE_PATCH = 2      # awake yes_eyepatch
+AWAKE_NO_PATCH = 3   # awake no_eyepatch
+
 treatments = [
     Treatment(id=1, name='Hour'),
     Treatment(id=2, name='percentage')
@@ -0,0 +1,205 @@
+# Generador de dades de prova grans i reproduïbles: amb la mateixa llavor
+# (seed) surten sempre les mateixes dades. Retorna les mateixes quatre
+# col·leccions que dadesServer (users, children, relation_user_child, taps),
+# així serveixen tal qual per als DAO en memòria i per a SqliteDatabase.load.
+#
+#  - famílies d'1 o 2 tutors (rol 2) amb 1-3 fills
+#  - un 30% de famílies té un cuidador (rol 3); un cuidador porta nens de diverses famílies
+#  - cada 200 nens hi ha un usuari de seguiment (rol 4) que els porta tots
+#  - cada nen té `days` dies de taps seguits: pegat al matí, sense pegat a la
+#    tarda i son a la nit. L'últim tap de cada nen queda obert (end None)
+#
+# Snapshot: fitxer gzip de línies JSON. La primera és la capçalera (paràmetres
+# i recomptes); cada una de les altres és ["u"|"c"|"r"|"t", [files...]] amb un
+# bloc de users, children, relacions o taps.
+#
+# Ús: python datasetServer.py usuaris fitxer.snap.gz [--days 7] [--seed 1]
+import argparse
+import gc
+import gzip
+import itertools
+import json
+import os
+import random
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from dadesServer import User, Child, Tap
+
+Dataset = namedtuple('Dataset', 'users children relations taps')
+
+FORMAT = "tapatapp-snapshot"
+VERSION = 1
+TUTOR, CAREGIVER, FOLLOWUP = 2, 3, 4
+CHILDREN_PER_FOLLOWUP = 200
+CHUNK = 5000
+NAMES = ("Carol", "Jaco", "Pau", "Laia", "Marc", "Julia", "Nil", "Martina", "Pol", "Ona",
+         "Hugo", "Lucia", "Leo", "Emma", "Biel", "Aina", "Arnau", "Jana", "Eric", "Carla")
+SURNAMES = ("Garcia", "Puig", "Soler", "Vidal", "Ferrer", "Serra", "Font", "Roca", "Pons", "Vila")
+
+
+def userOf(user_id, kind, role):
+    username = f"{kind}{user_id}"
+    return User(id=user_id, username=username, password=f"pw{user_id}",
+                email=f"{username}@tapatapp.cat", idrole=role, token="")
+
+
+@contextmanager
+def noGc():
+    # Amb milions d'objectes nous el recol·lector de cicles passa molts cops i no
+    # en troba cap: es para mentre es construeixen les dades
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def minuteStamps(firstDay, days):
+    # 'YYYY-MM-DDTHH:MM:00' de cada minut: els taps comparteixen els mateixos strings
+    return [(firstDay + timedelta(minutes=m)).isoformat() for m in range(days * 1440)]
+
+
+def childTaps(rnd, child, days, nextTap, tutors, stamps):
+    # Un dia: pegat (status 2) des de les ~8h durant child.time hores, sense pegat
+    # (status 3) fins a les ~21h i son (status 1) fins al matí següent.
+    # Es compta en minuts des del primer dia: stamps[minut] és l'hora en ISO
+    random = rnd.random
+    taps = []
+    init = 420 + int(random() * 60)
+    for day in range(days):
+        midnight = day * 1440
+        patchEnd = init + child.time * 60 + int(random() * 41) - 20
+        bedtime = midnight + 1230 + int(random() * 90)
+        wakeUp = midnight + 1440 + 420 + int(random() * 60)
+        for status, end in ((2, patchEnd), (3, bedtime), (1, wakeUp)):
+            taps.append(Tap(id=nextTap(), child_id=child.id, status_id=status,
+                            user_id=tutors[int(random() * len(tutors))], init=stamps[init], end=stamps[end]))
+            init = end
+    if taps:
+        taps[-1].end = None
+    return taps
+
+
+def generate(users=10000, days=7, seed=1, firstDay=datetime(2024, 11, 1)):
+    # users: nombre aproximat d'usuaris (s'acaba la família que s'està creant)
+    rnd = random.Random(seed)
+    data = Dataset([], [], [], [])
+    counters = {"user": 0, "child": 0, "tap": 0}
+
+    def nextId(name):
+        counters[name] += 1
+        return counters[name]
+
+    stamps = minuteStamps(firstDay, days + 2)
+    caregivers = []
+    followup = None
+    with noGc():
+        while len(data.users) < users:
+            tutors = []
+            for _ in range(2 if rnd.random() < 0.85 else 1):
+                user = userOf(nextId("user"), "tutor", TUTOR)
+                data.users.append(user)
+                tutors.append(user.id)
+            caregiver = None
+            if rnd.random() < 0.3:
+                if caregivers and rnd.random() < 0.6:
+                    caregiver = rnd.choice(caregivers)
+                else:
+                    user = userOf(nextId("user"), "cuidador", CAREGIVER)
+                    data.users.append(user)
+                    caregiver = user.id
+                    caregivers.append(caregiver)
+            for _ in range(rnd.choices((1, 2, 3), (55, 35, 10))[0]):
+                child = Child(id=nextId("child"), child_name=f"{rnd.choice(NAMES)} {rnd.choice(SURNAMES)}",
+                              sleep_average=rnd.randint(7, 11), treatment_id=rnd.randint(1, 2),
+                              time=rnd.randint(2, 8))
+                data.children.append(child)
+                if (child.id - 1) % CHILDREN_PER_FOLLOWUP == 0:
+                    followup = userOf(nextId("user"), "seguiment", FOLLOWUP)
+                    data.users.append(followup)
+                for user_id in tutors:
+                    data.relations.append({"user_id": user_id, "child_id": child.id, "rol_id": TUTOR})
+                if caregiver is not None:
+                    data.relations.append({"user_id": caregiver, "child_id": child.id, "rol_id": CAREGIVER})
+                data.relations.append({"user_id": followup.id, "child_id": child.id, "rol_id": FOLLOWUP})
+                data.taps.extend(childTaps(rnd, child, days, lambda: nextId("tap"), tutors, stamps))
+    return data
+
+
+def rowsOf(data):
+    yield "u", ([u.id, u.username, u.password, u.email, u.idrole] for u in data.users)
+    yield "c", ([c.id, c.child_name, c.sleep_average, c.treatment_id, c.time] for c in data.children)
+    yield "r", ([r["user_id"], r["child_id"], r["rol_id"]] for r in data.relations)
+    yield "t", ([t.id, t.child_id, t.status_id, t.user_id, t.init, t.end] for t in data.taps)
+
+
+def save(data, path, **params):
+    # Escriu a un fitxer temporal i el reanomena: mai queda un snapshot a mitges
+    header = {"format": FORMAT, "version": VERSION, "params": params,
+              "counts": {name: len(rows) for name, rows in data._asdict().items()}}
+    tmp = path + ".tmp"
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=1) as f:
+        f.write(json.dumps(header) + "\n")
+        for kind, rows in rowsOf(data):
+            # Blocs de CHUNK files per línia: menys crides a json
+            while True:
+                chunk = list(itertools.islice(rows, CHUNK))
+                if not chunk:
+                    break
+                f.write(json.dumps([kind, chunk]) + "\n")
+    os.replace(tmp, path)
+    return header
+
+
+def load(path):
+    data = Dataset([], [], [], [])
+    # Com a generate, les hores repetides són el mateix string
+    share = {}.setdefault
+    with gzip.open(path, 'rt', encoding='utf-8') as f, noGc():
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"{path} no és un snapshot de TapatApp (versió {VERSION})")
+        for line in f:
+            kind, rows = json.loads(line)
+            if kind == "t":
+                data.taps.extend(Tap(i, c, s, u, share(init, init), end and share(end, end))
+                                 for i, c, s, u, init, end in rows)
+            elif kind == "r":
+                data.relations.extend({"user_id": u, "child_id": c, "rol_id": r} for u, c, r in rows)
+            elif kind == "u":
+                data.users.extend(User(*row, token="") for row in rows)
+            elif kind == "c":
+                data.children.extend(Child(*row) for row in rows)
+    return data
+
+
+def loadOrGenerate(path, users=10000, days=7, seed=1):
+    # Reutilitza el snapshot si existeix amb els mateixos paràmetres; si no, el crea
+    params = {"users": users, "days": days, "seed": seed}
+    if os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+        if header.get("params") == params and header.get("version") == VERSION:
+            return load(path)
+    data = generate(users, days, seed)
+    save(data, path, **params)
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera un snapshot de dades de prova")
+    parser.add_argument('users', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    data = generate(args.users, args.days, args.seed)
+    header = save(data, args.path, users=args.users, days=args.days, seed=args.seed)
+    print(f"{header['counts']} -> {args.path} "
+          f"({os.path.getsize(args.path) / 1e6:.1f} MB, {time.perf_counter() - start:.1f} s)")
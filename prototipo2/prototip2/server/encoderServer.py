@@ -0,0 +1,80 @@
+# Serialització directa a bytes JSON de les respostes del servidor.
+# Abans: ApiResponse -> asdict (còpia recursiva de tota la llista) -> jsonify (un altre recorregut).
+# Ara l'embolcall s'escriu a mà i la llista passa una sola vegada pel json de C;
+# els objectes del model (User, Child, Tap...) es tradueixen amb un encoder per classe.
+import json
+
+
+# Encoders per classe (es creen la primera vegada que surt la classe)
+_modelEncoders = {}
+
+
+def _modelEncoder(obj):
+    cls = type(obj)
+    encoder = _modelEncoders.get(cls)
+    if encoder is None:
+        if hasattr(cls, 'to_dict'):
+            # Models amb __slots__ (dadesServer) i vistes com TapRow
+            encoder = cls.to_dict
+        elif hasattr(obj, '__dict__'):
+            # El __dict__ de l'objecte es fa servir tal qual, sense copiar-lo
+            encoder = vars
+        else:
+            names = tuple(name for klass in reversed(cls.__mro__)
+                          for name in getattr(klass, '__slots__', ()))
+            encoder = lambda o: {name: getattr(o, name) for name in names}
+        _modelEncoders[cls] = encoder
+    return encoder
+
+
+def _default(obj):
+    if hasattr(obj, '__dict__') or hasattr(type(obj), '__slots__'):
+        return _modelEncoder(obj)(obj)
+    # Generadors, tuples de dades...
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f"{type(obj).__name__} no és serialitzable a JSON")
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+
+
+def encode(obj):
+    # Qualsevol valor (dicts, llistes, objectes del model) -> bytes JSON
+    return _encoder.encode(obj).encode()
+
+
+def encodeApiResponse(response, **extra):
+    # ApiResponse (msg, coderesponse, data) sense passar per asdict
+    parts = ['{"msg":', _encoder.encode(response.msg),
+             ',"coderesponse":', _encoder.encode(response.coderesponse),
+             ',"data":', _encoder.encode(response.data)]
+    for key, value in extra.items():
+        parts += [',', _encoder.encode(key), ':', _encoder.encode(value)]
+    parts.append('}')
+    return ''.join(parts).encode()
+
+
+def encodeRecord(obj):
+    # Una línia NDJSON
+    return _encoder.encode(obj) + "\n"
+
+
+# Flask només s'importa amb la primera resposta: asyncServer fa servir encode i
+# encodeApiResponse sense Flask
+Response = None
+
+
+def _response(body, status):
+    global Response
+    if Response is None:
+        from flask import Response
+    return Response(body, status=status, mimetype='application/json')
+
+
+def apiResponse(response, status=200, **extra):
+    return _response(encodeApiResponse(response, **extra), status)
+
+
+def jsonResponse(obj, status=200):
+    return _response(encode(obj), status)
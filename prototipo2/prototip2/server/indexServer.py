@@ -0,0 +1,227 @@
+# Índexs en memòria sobre les dades de dadesServer
+# Les llistes de dadesServer es recorren senceres a cada petició,
+# aquests índexs permeten buscar per clau en O(1)
+import base64
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+
+EPOCH = datetime(1970, 1, 1)
+DAY = 86400
+
+
+def normalizeEmail(email):
+    # Els emails es comparen sense distingir majúscules ni espais.
+    # Un valor que no és un string (JSON {"username": 123}) no és cap email
+    if not isinstance(email, str):
+        return None
+    return email.strip().lower()
+
+
+def encodeCursor(key):
+    # Cursor opac per a la paginació: el client només l'ha de tornar tal qual
+    return base64.urlsafe_b64encode(str(key).encode()).decode().rstrip("=")
+
+
+def decodeCursor(token):
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"cursor incorrecte: {token}")
+
+
+class UserIndex:
+    def __init__(self, users=()):
+        self.byId = {}
+        self.byUsername = {}
+        self.byEmail = {}
+        self.ids = []   # ids ordenats, per paginar
+        self.version = 0   # canvia a cada alta/modificació/baixa (ETag)
+        # Les altes, modificacions i baixes toquen diversos diccionaris: una alhora
+        self.lock = threading.Lock()
+        for user in users:
+            self.insert(user)
+
+    def __len__(self):
+        return len(self.byId)
+
+    def __iter__(self):
+        return iter(self.byId.values())
+
+    def _checkFree(self, username, email, user_id=None):
+        other = self.byUsername.get(username)
+        if other is not None and other.id != user_id:
+            raise ValueError(f"username '{username}' ja existeix")
+        other = self.byEmail.get(normalizeEmail(email))
+        if other is not None and other.id != user_id:
+            raise ValueError(f"email '{email}' ja existeix")
+
+    def _unlink(self, user):
+        del self.byUsername[user.username]
+        email = normalizeEmail(user.email)
+        if email and self.byEmail.get(email) is user:
+            del self.byEmail[email]
+
+    def _link(self, user):
+        self.byUsername[user.username] = user
+        email = normalizeEmail(user.email)
+        if email:
+            self.byEmail[email] = user
+
+    def insert(self, user):
+        with self.lock:
+            if user.id in self.byId:
+                raise ValueError(f"user id {user.id} ja existeix")
+            self._checkFree(user.username, user.email)
+            self.byId[user.id] = user
+            self._link(user)
+            insort(self.ids, user.id)
+            self.version += 1
+        return user
+
+    def update(self, user_id, **fields):
+        with self.lock:
+            user = self.byId.get(user_id)
+            if user is None:
+                return None
+            username = fields.get('username', user.username)
+            email = fields.get('email', user.email)
+            self._checkFree(username, email, user_id)
+            # Es treuen les claus velles abans de canviar l'objecte
+            self._unlink(user)
+            for name, value in fields.items():
+                setattr(user, name, value)
+            self._link(user)
+            self.version += 1
+        return user
+
+    def delete(self, user_id):
+        with self.lock:
+            user = self.byId.pop(user_id, None)
+            if user is not None:
+                self._unlink(user)
+                del self.ids[bisect_left(self.ids, user_id)]
+                self.version += 1
+        return user
+
+    def page(self, after=None, limit=100):
+        # Usuaris amb id > after, en ordre d'id. Retorna (usuaris, id de l'últim o None)
+        pos = 0 if after is None else bisect_right(self.ids, after)
+        ids = self.ids[pos:pos + limit]
+        last = ids[-1] if ids and pos + limit < len(self.ids) else None
+        return [self.byId[i] for i in ids], last
+
+    def get(self, user_id):
+        return self.byId.get(user_id)
+
+    def getByUsername(self, username):
+        return self.byUsername.get(username)
+
+    def getByEmail(self, email):
+        return self.byEmail.get(normalizeEmail(email))
+
+
+class RelationIndex:
+    # Relacions user <-> child (relation_user_child) indexades pels dos costats
+    def __init__(self, relations=()):
+        self.byUser = {}
+        self.byChild = {}
+        # Versió global i per user (l'última versió que va tocar les seves relacions)
+        self.version = 0
+        self.userVersion = {}
+        # Cada canvi toca els dos costats (byUser i byChild): un alhora
+        self.lock = threading.Lock()
+        for relation in relations:
+            self.add(relation['user_id'], relation['child_id'], relation['rol_id'])
+
+    def __len__(self):
+        return sum(len(rels) for rels in self.byUser.values())
+
+    def __iter__(self):
+        for rels in self.byUser.values():
+            yield from rels
+
+    def add(self, user_id, child_id, rol_id):
+        relation = {"user_id": user_id, "child_id": child_id, "rol_id": rol_id}
+        with self.lock:
+            if relation in self.byUser.get(user_id, ()):
+                return None
+            self.byUser.setdefault(user_id, []).append(relation)
+            self.byChild.setdefault(child_id, []).append(relation)
+            self._touch(user_id)
+        return relation
+
+    def _touch(self, user_id):
+        self.version += 1
+        self.userVersion[user_id] = self.version
+
+    def versionOf(self, user_id):
+        return self.userVersion.get(user_id, 0)
+
+    def remove(self, user_id, child_id, rol_id=None):
+        # Sense rol_id s'esborren tots els rols del user sobre el child
+        with self.lock:
+            removed = [r for r in self.byUser.get(user_id, ())
+                       if r['child_id'] == child_id and (rol_id is None or r['rol_id'] == rol_id)]
+            for relation in removed:
+                self._drop(self.byUser, user_id, relation)
+                self._drop(self.byChild, child_id, relation)
+            if removed:
+                self._touch(user_id)
+        return removed
+
+    def removeChild(self, child_id):
+        with self.lock:
+            removed = self.byChild.pop(child_id, [])
+            for relation in removed:
+                self._drop(self.byUser, relation['user_id'], relation)
+                self._touch(relation['user_id'])
+        return removed
+
+    def _drop(self, index, key, relation):
+        rels = index[key]
+        rels.remove(relation)
+        if not rels:
+            del index[key]
+
+    def getByUser(self, user_id):
+        return self.byUser.get(user_id, [])
+
+    def getByChild(self, child_id):
+        return self.byChild.get(child_id, [])
+
+    def childIds(self, user_id):
+        # Sense repetits i en ordre d'inserció (un user pot tenir diversos rols)
+        return list(dict.fromkeys(r['child_id'] for r in self.getByUser(user_id)))
+
+    def userIds(self, child_id):
+        return list(dict.fromkeys(r['user_id'] for r in self.getByChild(child_id)))
+
+    def roles(self, user_id, child_id=None):
+        return [r['rol_id'] for r in self.getByUser(user_id)
+                if child_id is None or r['child_id'] == child_id]
+
+
+def parseTime(value):
+    # ISO 8601 -> segons (int). Les hores sense zona es prenen tal qual (com UTC)
+    # perquè els límits de dia coincideixin amb la data del text
+    if value is None or isinstance(value, int):
+        return value
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((dt - EPOCH).total_seconds())
+
+
+def checkTimes(init, end=None):
+    # Dates d'un tap (alta, alta en bloc o tancament): strings ISO 8601 i end no
+    # anterior a init. Retorna (init, end) en segons; end és None si el tap és obert
+    if not isinstance(init, str) or (end is not None and not isinstance(end, str)):
+        raise ValueError("Data incorrecta (format ISO 8601)")
+    try:
+        start, stop = parseTime(init), parseTime(end)
+    except ValueError:
+        raise ValueError("Data incorrecta (format ISO 8601)")
+    if stop is not None and stop < start:
+        raise ValueError("end anterior a init")
+    return start, stop
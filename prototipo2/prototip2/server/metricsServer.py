@@ -0,0 +1,210 @@
+# Mètriques de les peticions en format Prometheus (GET /metrics)
+#  - histograma de latència per ruta, mètode i status (també dona el recompte)
+#  - peticions en curs per ruta (gauge)
+#  - temps dins dels DAO i temps serialitzant, per ruta, separats
+# La ruta és la plantilla de Flask ('/taps/<int:tap_id>'), no la url: així el
+# nombre de sèries no creix amb els ids.
+#
+# Al camí de cada petició només hi ha dues lectures del rellotge i dos append
+# a una deque; la resta es fa en segon pla (veure benchMetrics.py).
+#
+# Ús amb Flask:
+#   metrics = Metrics()
+#   instrument(app, metrics)               # before/after_request + GET /metrics
+#   userDao = TimedDao(userDao, metrics)   # temps de DAO
+#   apiResponse = metrics.timed(SERIALIZE, apiResponse)
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import wraps
+from threading import get_ident
+from time import perf_counter
+
+# Límits superiors dels buckets (segons)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DAO, SERIALIZE = "dao", "serialize"
+ENVIRON_KEY = "tapatapp.metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escapeLabel(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    # Al camí de la petició només s'afegeixen esdeveniments a una deque (append és
+    # atòmic, no cal lock). Un thread en segon pla (i cada GET /metrics) els
+    # agrega: buckets de l'histograma, peticions en curs i temps de cada fase.
+    def __init__(self, namespace="tapatapp", buckets=BUCKETS, flushEvery=1.0):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.flushEvery = flushEvery
+        self.events = deque()   # ruta (comença) o (ruta, mètode, status, segons, fases) (acaba)
+        self.lock = threading.Lock()
+        # (ruta, mètode, status) -> [peticions de cada bucket..., més grans que l'últim, suma de segons]
+        self.series = {}
+        self.inFlight = {}   # ruta -> peticions en curs
+        self.phases = {}     # (ruta, fase) -> [crides, segons]
+        # thread -> temps de cada fase de la seva petició en curs (es crea amb el
+        # primer temps que es compta; un dict amb get_ident és més barat que threading.local)
+        self.current = {}
+        self.flusher = None
+
+    def begin(self, route):
+        # Retorna l'estat de la petició de fora (subpeticions de /batch al mateix thread)
+        if self.flusher is None:
+            self.startFlusher()
+        self.events.append(route)
+        return self.current.pop(get_ident(), None)
+
+    def end(self, route, method, status, seconds, previous=None):
+        ident = get_ident()
+        phases = self.current.pop(ident, None)
+        if previous is not None:
+            self.current[ident] = previous
+        self.events.append((route, method, status, seconds, phases))
+
+    def startFlusher(self):
+        # El thread es crea amb la primera petició, no en importar el mòdul
+        with self.lock:
+            if self.flusher is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(self.flushEvery)
+                    self.flush()
+            self.flusher = threading.Thread(target=run, name="metrics-flush", daemon=True)
+            self.flusher.start()
+
+    def flush(self):
+        events = self.events
+        with self.lock:
+            while True:
+                try:
+                    event = events.popleft()
+                except IndexError:
+                    return
+                if event.__class__ is str:
+                    self.inFlight[event] = self.inFlight.get(event, 0) + 1
+                    continue
+                route, method, status, seconds, phases = event
+                self.inFlight[route] -= 1
+                series = self.series.get((route, method, status))
+                if series is None:
+                    series = self.series[(route, method, status)] = [0] * (len(self.buckets) + 2)
+                series[bisect_left(self.buckets, seconds)] += 1
+                series[-1] += seconds
+                for phase, spent in (phases or {}).items():
+                    totals = self.phases.get((route, phase))
+                    if totals is None:
+                        totals = self.phases[(route, phase)] = [0, 0.0]
+                    totals[0] += 1
+                    totals[1] += spent
+
+    def add(self, phase, seconds):
+        ident = get_ident()
+        phases = self.current.get(ident)
+        if phases is None:
+            phases = self.current[ident] = {}
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+    def timed(self, phase, fn):
+        # fn amb el temps que hi passa sumat a la fase de la petició en curs
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(phase, perf_counter() - start)
+        return wrapper
+
+    def render(self):
+        self.flush()
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+            inFlight = dict(self.inFlight)
+            phases = {key: list(values) for key, values in self.phases.items()}
+        name = f"{self.namespace}_http_request_duration_seconds"
+        lines = [f"# HELP {name} Durada de les peticions HTTP per ruta, mètode i status",
+                 f"# TYPE {name} histogram"]
+        for (route, method, status), counts in sorted(series.items(), key=lambda item: str(item[0])):
+            labels = f'route="{escapeLabel(route)}",method="{method}",status="{status}"'
+            total = 0
+            for le, n in zip(self.buckets, counts):
+                total += n
+                lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+            total += counts[len(self.buckets)]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {total}')
+            lines.append(f'{name}_sum{{{labels}}} {counts[-1]}')
+            lines.append(f'{name}_count{{{labels}}} {total}')
+
+        name = f"{self.namespace}_http_requests_in_flight"
+        lines += [f"# HELP {name} Peticions en curs per ruta", f"# TYPE {name} gauge"]
+        for route, n in sorted(inFlight.items()):
+            lines.append(f'{name}{{route="{escapeLabel(route)}"}} {n}')
+
+        for suffix, column, kind, text in (("phase_seconds_total", 1, "counter", "Segons dins de cada fase (dao, serialize)"),
+                                           ("phase_requests_total", 0, "counter", "Peticions que han passat per cada fase")):
+            name = f"{self.namespace}_{suffix}"
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+            for (route, phase), values in sorted(phases.items()):
+                lines.append(f'{name}{{route="{escapeLabel(route)}",phase="{phase}"}} {values[column]}')
+        return "\n".join(lines) + "\n"
+
+
+class TimedDao:
+    # Embolcall d'un DAO: el temps de cada mètode compta a la fase "dao".
+    # Els generadors que retorna (getTapsByChild...) es recorren en serialitzar
+    # i aquest temps compta com a serialització.
+    def __init__(self, dao, metrics, phase=DAO):
+        object.__setattr__(self, '_dao', dao)
+        object.__setattr__(self, '_metrics', metrics)
+        object.__setattr__(self, '_phase', phase)
+
+    def __getattr__(self, name):
+        value = getattr(self._dao, name)
+        if callable(value):
+            value = self._metrics.timed(self._phase, value)
+            # La propera vegada no passa per __getattr__
+            object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        setattr(self._dao, name, value)
+
+
+def instrument(app, metrics, path='/metrics'):
+    # Cal cridar-ho just després de crear l'app: el before_request ha d'anar
+    # abans dels altres (un altre before_request pot respondre directament, 401...)
+    from flask import Response, request
+
+    def finish(status):
+        state = request.environ.pop(ENVIRON_KEY, None)
+        if state is not None:
+            route, previous, start = state
+            metrics.end(route, request.method, status, perf_counter() - start, previous)
+
+    @app.before_request
+    def startMetrics():
+        rule = request.url_rule
+        route = rule.rule if rule is not None else "unmatched"
+        request.environ[ENVIRON_KEY] = (route, metrics.begin(route), perf_counter())
+
+    @app.after_request
+    def stopMetrics(response):
+        finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def failedMetrics(exc):
+        # Si encara hi és, hi ha hagut una excepció no controlada i no after_request
+        finish(500)
+
+    def metricsEndpoint():
+        return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(path, 'metrics', metricsEndpoint, methods=['GET'])
+    return metrics
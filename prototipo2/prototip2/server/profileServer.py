@@ -0,0 +1,195 @@
+# Perfil (cProfile) de peticions concretes, a demanda:
+#  - les que porten la capçalera X-Profile amb el token de confiança
+#    (TAPATAPP_PROFILE_TOKEN), o
+#  - una mostra aleatòria (TAPATAPP_PROFILE_RATE, per exemple 0.01 = 1%)
+# Cada perfil es guarda a TAPATAPP_PROFILE_DIR com a <hora>_<ruta>_<ms>ms.prof
+# (es pot obrir amb pstats o snakeviz) i només es guarden els últims
+# TAPATAPP_PROFILE_KEEP. GET /debug/profiles llista els perfils amb les
+# funcions que més temps acumulen; /debug/profiles/<fitxer> el descarrega.
+# Els dos endpoints demanen el token; des de la mateixa màquina (127.0.0.1)
+# només si TAPATAPP_PROFILE_LOCAL=1 (darrere d'un proxy tot ve de 127.0.0.1).
+#
+# Si no hi ha ni token ni mostra, fromEnv retorna None i no s'instal·la res.
+#
+# Ús amb Flask:
+#   profiler = fromEnv()
+#   if profiler is not None:
+#       profiler.instrument(app)
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import deque
+from hmac import compare_digest
+from time import perf_counter
+
+HEADER = "X-Profile"
+ENVIRON_KEY = "tapatapp.profile"
+LOCAL = ("127.0.0.1", "::1")
+
+
+def fileRoute(route):
+    # '/taps/<int:tap_id>' -> 'taps_int_tap_id' (vàlid com a nom de fitxer)
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or "root"
+
+
+def summary(profile, top):
+    # Les `top` funcions amb més temps acumulat
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+                     "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)})
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:top]
+
+
+class Profiler:
+    def __init__(self, directory="profiles", token=None, sampleRate=0.0, keep=50, top=15, trustLocal=False):
+        self.directory = directory
+        self.token = token
+        self.trustLocal = trustLocal
+        self.sampleRate = sampleRate
+        self.keep = keep
+        self.top = top
+        self.profiles = deque()   # resums d'aquest procés, del més antic al més nou
+        # Només un perfil alhora: cProfile no admet dos perfils actius (i una
+        # subpetició de /batch ja queda dins del perfil de la petició de fora)
+        self.active = threading.Lock()
+        self.lock = threading.Lock()
+        self.random = random.random
+
+    def trusted(self, request):
+        value = request.headers.get(HEADER)
+        if self.token is None or value is None:
+            return False
+        # compare_digest amb strs no ASCII dona TypeError: es comparen els bytes
+        encode = lambda text: text.encode('utf-8', 'surrogateescape')
+        return compare_digest(encode(value), encode(self.token))
+
+    def wanted(self, request):
+        if self.sampleRate and self.random() < self.sampleRate:
+            return "sample"
+        if HEADER in request.headers and self.trusted(request):
+            return "header"
+        return None
+
+    def start(self, request):
+        reason = self.wanted(request)
+        if reason is None or not self.active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile, reason, perf_counter()
+
+    def stop(self, state, route, method, status):
+        profile, reason, start = state
+        profile.disable()
+        seconds = perf_counter() - start
+        self.active.release()
+        try:
+            return self.save(profile, reason, route, method, status, seconds)
+        except OSError:
+            # Sense disc no hi ha perfil, però la petició no ha de fallar
+            return None
+
+    def save(self, profile, reason, route, method, status, seconds):
+        os.makedirs(self.directory, exist_ok=True)
+        ms = seconds * 1000
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}_{int(time.time() * 1e6) % 1000000:06d}_" \
+               f"{method}_{fileRoute(route)}_{ms:.0f}ms.prof"
+        profile.dump_stats(os.path.join(self.directory, name))
+        entry = {"file": name, "route": route, "method": method, "status": status,
+                 "ms": round(ms, 3), "reason": reason, "time": time.time(),
+                 "top": summary(profile, self.top)}
+        with self.lock:
+            self.profiles.append(entry)
+            removed = self.rotate()
+            self.profiles = deque(p for p in self.profiles if p["file"] not in removed)
+        return name
+
+    def rotate(self):
+        # Els últims `keep` perfils del directori, no només els d'aquest procés:
+        # també compten els d'abans d'un reinici i els d'altres treballadors
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".prof") and entry.is_file():
+                try:
+                    files.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    pass
+        files.sort()
+        removed = set()
+        for _, file in files[:max(len(files) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, file))
+            except FileNotFoundError:
+                pass
+            removed.add(file)
+        return removed
+
+    def listing(self):
+        with self.lock:
+            return list(reversed(self.profiles))
+
+    def allowed(self, request):
+        # Els perfils ensenyen el codi per dins: amb el token, o des de la mateixa
+        # màquina si s'ha demanat (trustLocal)
+        return self.trusted(request) or (self.trustLocal and request.remote_addr in LOCAL)
+
+    def instrument(self, app, path='/debug/profiles'):
+        # Cal cridar-ho just després de crear l'app (i d'instrument de metricsServer),
+        # perquè el perfil inclogui els altres before_request
+        from flask import abort, jsonify, request, send_from_directory
+
+        def finish(status):
+            state = request.environ.pop(ENVIRON_KEY, None)
+            if state is not None:
+                rule = request.url_rule
+                return self.stop(state, rule.rule if rule is not None else "unmatched", request.method, status)
+            return None
+
+        @app.before_request
+        def startProfile():
+            state = self.start(request)
+            if state is not None:
+                request.environ[ENVIRON_KEY] = state
+
+        @app.after_request
+        def stopProfile(response):
+            name = finish(response.status_code)
+            if name is not None:
+                response.headers[HEADER + "-File"] = name
+            return response
+
+        @app.teardown_request
+        def failedProfile(exc):
+            finish(500)
+
+        def profilesEndpoint():
+            if not self.allowed(request):
+                abort(404)
+            return jsonify({"directory": os.path.abspath(self.directory), "sampleRate": self.sampleRate,
+                            "profiles": self.listing()})
+
+        def profileFile(name):
+            if not self.allowed(request):
+                abort(404)
+            return send_from_directory(os.path.abspath(self.directory), name, as_attachment=True)
+
+        app.add_url_rule(path, 'profiles', profilesEndpoint, methods=['GET'])
+        app.add_url_rule(path + '/<path:name>', 'profile_file', profileFile, methods=['GET'])
+        return self
+
+
+def fromEnv(environ=os.environ):
+    token = environ.get('TAPATAPP_PROFILE_TOKEN') or None
+    sampleRate = float(environ.get('TAPATAPP_PROFILE_RATE', 0))
+    if token is None and not sampleRate:
+        return None
+    return Profiler(directory=environ.get('TAPATAPP_PROFILE_DIR', 'profiles'), token=token,
+                    sampleRate=sampleRate, keep=int(environ.get('TAPATAPP_PROFILE_KEEP', 50)),
+                    trustLocal=environ.get('TAPATAPP_PROFILE_LOCAL') == '1')
@@ -1,7 +1,22 @@
-from flask import Flask, request, jsonify
-from DaoServer import UserDAO
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, g
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+import os
+import zlib
+from DaoServer import tapsFromRows, tapFromRow
+from backendServer import Backend, LazyDao
+from sessionServer import SessionStore, bearerToken
+from metricsServer import Metrics, TimedDao, instrument, SERIALIZE
+import profileServer
+from indexServer import parseTime
 from dadesServer import *
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
+from encoderServer import apiResponse, jsonResponse, encodeRecord
+
+# Importar aquest mòdul no carrega dades ni crea l'app:
+#  - createApp() crea l'app de Flask (flask --app "server:createApp()")
+#  - server.app és una app creada la primera vegada que es demana
+#  - els DAO es creen amb la primera petició que els fa servir (backendServer)
 
 @dataclass
 class ApiResponse():
@@ -10,21 +25,152 @@ class ApiResponse():
     data: list
 
 # Instantiate DAO
-userDao=UserDAO()
+# Amb TAPATAPP_DB=fitxer.sqlite les dades es guarden a SQLite (sqliteServer);
+# si no, es treballa en memòria amb les llistes de dadesServer o les del
+# snapshot de TAPATAPP_SNAPSHOT (datasetServer). Veure backendServer
+#
+# Sessions: /login retorna un token i les peticions següents s'identifiquen amb
+# 'Authorization: Bearer <token>' sense tornar a buscar l'usuari ni el password.
+# Amb TAPATAPP_REQUIRE_AUTH=1 totes les rutes (menys /login) demanen token.
+# El UserDAO revoca les sessions d'un usuari esborrat o amb un password nou
+sessions = SessionStore(ttl=int(os.environ.get('TAPATAPP_SESSION_TTL', 3600)))
+backend = Backend(sessions=sessions)
+changes = LazyDao(backend, 'changes')
+
+# Mètriques (GET /metrics): el temps dels DAO i el de serialitzar es compten a part
+metrics = Metrics()
+userDao = TimedDao(LazyDao(backend, 'userDao'), metrics)
+childDao = TimedDao(LazyDao(backend, 'childDao'), metrics)
+tapDao = TimedDao(LazyDao(backend, 'tapDao'), metrics)
+apiResponse = metrics.timed(SERIALIZE, apiResponse)
+jsonResponse = metrics.timed(SERIALIZE, jsonResponse)
+
+REQUIRE_AUTH = os.environ.get('TAPATAPP_REQUIRE_AUTH') == '1'
+PUBLIC = {'api.login'}
+
+# Les rutes de l'API; createApp les afegeix a l'app
+api = Blueprint('api', __name__)
+
+
+def createApp():
+    app = Flask(__name__)
+    instrument(app, metrics)
+    # Perfil de peticions amb X-Profile o per mostra (TAPATAPP_PROFILE_TOKEN / TAPATAPP_PROFILE_RATE)
+    profiler = profileServer.fromEnv()
+    if profiler is not None:
+        profiler.instrument(app)
+    app.register_blueprint(api)
+    # Amb SQLite cada petició torna la seva connexió al pool
+    app.teardown_appcontext(lambda exc: backend.release())
+    return app
+
+
+def __getattr__(name):
+    # server.app (python server.py, benchEncoder, benchAsync...) es crea en demanar-la
+    if name == 'app':
+        app = globals()['app'] = createApp()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def notAuthenticated():
+    return jsonify({"error": "No autenticat"}), 401
+
+
+@api.before_request
+def loadSession():
+    g.session = sessions.get(bearerToken(request.headers.get('Authorization')))
+    if REQUIRE_AUTH and g.session is None and request.endpoint not in PUBLIC:
+        return notAuthenticated()
+
+
+@api.errorhandler(PermissionError)
+def readOnly(e):
+    # Escriptures amb els DAO només de lectura (snapshot binari)
+    return jsonify({"error": str(e)}), 403
+
+
+def authenticated(view):
+    # Per a les rutes que sempre necessiten sessió (encara que REQUIRE_AUTH no hi sigui)
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.session is None:
+            return notAuthenticated()
+        return view(*args, **kwargs)
+    return wrapper
+
+# Mode streaming opcional: amb 'Accept: application/x-ndjson' les llistes
+# s'envien com un registre JSON per línia a mesura que surten del generador
+NDJSON = 'application/x-ndjson'
+
+def wantsNdjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON]) == NDJSON
 
-app = Flask(__name__)
+def ndjsonResponse(records):
+    def generate():
+        for record in records:
+            yield encodeRecord(record)
+    return Response(generate(), mimetype=NDJSON)
 
-@app.route('/getusers', methods=['GET'])
+# GET condicional: l'ETag surt de la versió de la col·lecció (+ url i Accept).
+# Si el client envia If-None-Match amb la mateixa ETag es respon 304
+# sense cridar el DAO ni serialitzar res.
+def conditional(version):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            variant = request.full_path + request.headers.get('Accept', '')
+            etag = f"{version(**kwargs)}-{zlib.crc32(variant.encode()):x}"
+            if etag in request.if_none_match:
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+
+def childrenVersion():
+    return childDao.getVersion(request.args.get('user_id', type=int))
+
+
+def tapsVersion(**kwargs):
+    return tapDao.getVersion(kwargs.get('child_id', request.args.get('child_id', type=int)))
+
+
+@api.route('/getusers', methods=['GET'])
+@conditional(lambda: userDao.getVersion())
 def getusers():
+    # Sense limit es retornen tots (com abans). Amb ?limit=N&after=<cursor> es pagina
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after')
+    if limit is None and after is None and wantsNdjson():
+        return ndjsonResponse(userDao.iterAllUsers())
+    if limit is None and after is None:
+        response = ApiResponse(
+            msg="All Users",
+            coderesponse="1",
+            data=userDao.getAllUsers()
+        )
+        return apiResponse(response)
+
+    limit = min(max(limit or 100, 1), 1000)
+    try:
+        listUsers, nextCursor = userDao.getUsersPage(after, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     response = ApiResponse(
-        msg="All Users",
+        msg="Users",
         coderesponse="1",
-        data=userDao.getAllUsers()
+        data=listUsers
     )
-    return jsonify(asdict(response)),200
+    return apiResponse(response, next=nextCursor)
 
 
-@app.route('/login', methods=['POST'])
+@api.route('/login', methods=['POST'])
 def login():
     # Existing username/password login
     data = request.get_json()
@@ -37,10 +183,14 @@ def login():
             data=user
         )
     if user:
+        # Mai s'envia el password; el token és el de la sessió nova
+        session = sessions.create(user)
+        data = {k: v for k, v in user.to_dict().items() if k != 'password'}
+        data['token'] = session.token
         response = ApiResponse(
             msg="Authenticated",
             coderesponse="1",
-            data=user
+            data=data
         )
     else:
         response = ApiResponse(
@@ -48,10 +198,10 @@ def login():
             coderesponse="0",
             data=user
         )
-    return jsonify(asdict(response)),200
+    return apiResponse(response)
 
 
-@app.route('/Child', methods=['POST'])
+@api.route('/Child', methods=['POST'])
 def child():
     data = request.get_json()
     user_id = data.get('id_user') #id_user
@@ -60,17 +210,253 @@ def child():
         coderesponse="-1",
         data=""
     )
-    if(not user_id and not user_id.is_integer):
-        return jsonify(asdict(reponse)),400
+    if(user_id is None or not str(user_id).isdigit()):
+        return apiResponse(reponse, 400)
 
 
     user_id=int(user_id)
-    u=User(id=user_id, usarname="", password="", email="", edrole=1, token="")
-    listChilds=childDao.getChilds(u)
-    reponse.corereponse="1"
+    u=User(id=user_id, username="", password="", email="", idrole=1, token="")
+    listChilds=childDao.getChild(u)
+    reponse.coderesponse="1"
     reponse.msg=len(listChilds)
     reponse.data=listChilds
-    return jsonify(asdict(reponse)),200
+    return apiResponse(reponse)
+
+# Taps: mateix format que espera TapDAO de serverMetods ({'taps': [...]})
+@api.route('/taps/search', methods=['GET'])
+@conditional(tapsVersion)
+def searchTaps():
+    child_id = request.args.get('child_id', type=int)
+    user_id = request.args.get('user_id', type=int)
+    status_id = request.args.get('status_id', type=int)
+    start = request.args.get('start_date')
+    end = request.args.get('end_date')
+    try:
+        if child_id is not None:
+            found = tapDao.getTapsByChild(child_id, start, end)
+        else:
+            found = tapDao.getTapsByDateRange(start, end)
+        found = (t for t in found
+                 if (user_id is None or t['user_id'] == user_id)
+                 and (status_id is None or t['status_id'] == status_id))
+        if wantsNdjson():
+            # Les dates es validen abans de començar a enviar
+            parseTime(start), parseTime(end)
+            return ndjsonResponse(found)
+        listTaps = list(found)
+    except ValueError:
+        return jsonify({"error": "Data incorrecta (format ISO 8601)"}), 400
+    return jsonResponse({"count": len(listTaps), "taps": listTaps})
+
+
+@api.route('/taps', methods=['GET'])
+@conditional(tapsVersion)
+def getTaps():
+    if wantsNdjson():
+        return ndjsonResponse(tapDao.getTapsByDateRange())
+    listTaps = list(tapDao.getTapsByDateRange())
+    return jsonResponse({"count": len(listTaps), "taps": listTaps})
+
+
+# /children?user_id=1 : només els childs d'aquest user
+@api.route('/children', methods=['GET'])
+@conditional(childrenVersion)
+def getChildren():
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        listChilds = childDao.getChildsOfUser(user_id)
+        if wantsNdjson():
+            return ndjsonResponse(listChilds)
+        return jsonResponse({"count": len(listChilds), "children": listChilds})
+    if wantsNdjson():
+        return ndjsonResponse(childDao.iterAllChilds())
+    listChilds = childDao.getAllChilds()
+    return jsonResponse({"count": len(listChilds), "children": listChilds})
+
+
+@api.route('/taps/<int:tap_id>', methods=['GET'])
+@conditional(lambda tap_id: tapDao.getVersion())
+def getTap(tap_id):
+    tap = tapDao.getTap(tap_id)
+    if tap is None:
+        return jsonify({"error": "Tap no trobat"}), 404
+    return jsonResponse(tap)
+
+
+@api.route('/taps', methods=['POST'])
+def createTap():
+    # Mateixa validació que /taps/bulk (DaoServer.tapFromRow)
+    try:
+        tap = tapFromRow(request.get_json(silent=True) or {})
+        tapDao.createTap(tap)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonResponse({"id": tap.id}, 201)
+
+
+# Alta en bloc per a la sincronització dels mòbils:
+# body {"taps": [{"client_id": "...", "child_id", "status_id", "user_id", "init", "end"}, ...]}
+# Les files incorrectes es retornen a "errors" (per índex) i la resta s'insereix;
+# reenviar el mateix client_id no crea un tap nou.
+MAX_BULK = 5000
+
+@api.route('/taps/bulk', methods=['POST'])
+def createTapsBulk():
+    rows = (request.get_json(silent=True) or {}).get('taps')
+    if not isinstance(rows, list):
+        return jsonify({"error": "Camp requerit: taps"}), 400
+    if len(rows) > MAX_BULK:
+        return jsonify({"error": f"Màxim {MAX_BULK} taps per petició"}), 400
+    newTaps, clientIds, errors = tapsFromRows(rows)
+    ids = tapDao.createTaps(newTaps, clientIds) if newTaps else []
+    created = sum(1 for _, isNew in ids if isNew)
+    return jsonResponse({
+        "count": len(ids),
+        "created": created,
+        "duplicates": len(ids) - created,
+        "ids": [{"client_id": c, "id": i} for c, (i, _) in zip(clientIds, ids)],
+        "errors": errors
+    })
+
+
+@api.route('/taps/<int:tap_id>/close', methods=['PUT'])
+def closeTap(tap_id):
+    data = request.get_json() or {}
+    end_time = data.get('end_time')
+    if end_time is None:
+        return jsonify({"error": "Camp requerit: end_time"}), 400
+    try:
+        tap = tapDao.closeTap(tap_id, end_time)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if tap is None:
+        return jsonify({"success": False, "error": "Tap no trobat"}), 404
+    return jsonify({"success": True}), 200
+
+
+@api.route('/taps/<int:tap_id>', methods=['DELETE'])
+def deleteTap(tap_id):
+    if tapDao.deleteTap(tap_id) is None:
+        return jsonify({"success": False, "error": "Tap no trobat"}), 404
+    return jsonify({"success": True}), 200
+
+
+# Canvis des de la seqüència since (sincronització delta). Veure changesServer
+@api.route('/changes', methods=['GET'])
+def getChanges():
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({"error": "Falta el paràmetre since"}), 400
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+    return jsonResponse(changes.since(since, limit))
+
+
+# Dades de referència (statuses, roles, treatments): no canvien mentre el servidor està engegat
+@api.route('/statuses', methods=['GET'])
+@conditional(lambda: 0)
+def getStatuses():
+    return jsonResponse({"count": len(statuses), "statuses": statuses})
+
+
+@api.route('/roles', methods=['GET'])
+@conditional(lambda: 0)
+def getRoles():
+    return jsonResponse({"count": len(roles), "roles": roles})
+
+
+@api.route('/treatments', methods=['GET'])
+@conditional(lambda: 0)
+def getTreatments():
+    return jsonResponse({"count": len(treatments), "treatments": treatments})
+
+
+# Minuts de pegat / despert / son d'un child en un dia (RF4/RF5)
+# Ex: /treatment/1?date=2024-12-18&now=2024-12-18T20:00:00
+@api.route('/treatment/<int:child_id>', methods=['GET'])
+@conditional(tapsVersion)
+def treatment(child_id):
+    day = request.args.get('date')
+    if not day:
+        return jsonify({"error": "Falta el paràmetre date"}), 400
+    try:
+        summary = tapDao.getTreatment(child_id, day, request.args.get('now'))
+    except ValueError:
+        return jsonify({"error": "Data incorrecta (format ISO 8601)"}), 400
+    return jsonResponse(summary)
+
+
+@api.route('/logout', methods=['POST'])
+@authenticated
+def logout():
+    sessions.revoke(g.session.token)
+    return jsonify({"success": True})
+
+
+@api.route('/me', methods=['GET'])
+@authenticated
+def me():
+    # Només amb la sessió: no es consulta la taula d'usuaris
+    response = ApiResponse(
+        msg="Session",
+        coderesponse="1",
+        data={"user_id": g.session.user_id, "idrole": g.session.idrole}
+    )
+    return apiResponse(response)
+
+
+# /batch: diverses peticions en una sola crida
+# body: {"requests": [{"method": "GET", "path": "/treatment/1?date=2024-12-18", "body": null}, ...]}
+# Els GET seguits s'executen en paral·lel; cada escriptura (POST/PUT/DELETE) espera
+# les anteriors, així l'ordre de les modificacions es manté.
+MAX_BATCH = 50
+batchPool = ThreadPoolExecutor(max_workers=8)
+
+def subRequest(app, method, path, body, authorization=None):
+    # Les subpeticions fan servir la mateixa sessió que el batch
+    headers = {'Accept': 'application/json'}
+    if authorization:
+        headers['Authorization'] = authorization
+    with app.test_request_context(path, method=method, json=body, headers=headers):
+        response = app.full_dispatch_request()
+    return {"status": response.status_code,
+            "body": response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)}
+
+
+@api.route('/batch', methods=['POST'])
+def batch():
+    data = request.get_json(silent=True) or {}
+    subRequests = data.get('requests')
+    if not isinstance(subRequests, list) or not subRequests:
+        return jsonify({"error": "Camp requerit: requests"}), 400
+    if len(subRequests) > MAX_BATCH:
+        return jsonify({"error": f"Màxim {MAX_BATCH} peticions per batch"}), 400
+    calls = []
+    for sub in subRequests:
+        method = str(sub.get('method', 'GET')).upper() if isinstance(sub, dict) else ''
+        path = sub.get('path') if isinstance(sub, dict) else None
+        if method not in ('GET', 'POST', 'PUT', 'DELETE') or not isinstance(path, str) \
+                or not path.startswith('/') or path.split('?')[0] == '/batch':
+            return jsonify({"error": f"Petició incorrecta: {sub}"}), 400
+        calls.append((method, path, sub.get('body'), request.headers.get('Authorization')))
+
+    # Els threads del pool no tenen l'app activa: se'ls passa
+    app = current_app._get_current_object()
+    results = []
+    reads = []
+    for call in calls:
+        if call[0] == 'GET':
+            reads.append(batchPool.submit(subRequest, app, *call))
+            continue
+        results += [f.result() for f in reads]
+        reads = []
+        results.append(subRequest(app, *call))
+    results += [f.result() for f in reads]
+    response = ApiResponse(
+        msg="Batch",
+        coderesponse="1",
+        data=results
+    )
+    return apiResponse(response)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    createApp().run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,95 @@
+# Sessions amb token (Authorization: Bearer <token>)
+# /login crea la sessió; després cada petició es valida amb una consulta al
+# diccionari, sense tornar a mirar usuaris ni passwords.
+#  - caducitat lliscant: cada ús allarga la sessió ttl segons més
+#  - com a molt maxSessions sessions: si n'hi ha més es descarta la menys usada (LRU)
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# Camps d'usuari que, si canvien, invaliden les seves sessions (UserDAO.updateUser)
+REVOKING_FIELDS = {'password', 'idrole'}
+
+
+class Session:
+    __slots__ = ('token', 'user_id', 'idrole', 'expires')
+
+    def __init__(self, token, user_id, idrole, expires):
+        self.token = token
+        self.user_id = user_id
+        self.idrole = idrole
+        self.expires = expires
+
+
+class SessionStore:
+    def __init__(self, ttl=3600, maxSessions=100000, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxSessions = maxSessions
+        self.clock = clock
+        self.sessions = OrderedDict()   # token -> Session, de la menys a la més usada
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, user):
+        token = secrets.token_urlsafe(32)
+        session = Session(token, user.id, user.idrole, self.clock() + self.ttl)
+        self.purge()
+        with self.lock:
+            self.sessions[token] = session
+            while len(self.sessions) > self.maxSessions:
+                self.sessions.popitem(last=False)
+                self.evictions += 1
+        return session
+
+    def get(self, token):
+        # Sessió vàlida (i allargada) o None
+        if not token:
+            return None
+        now = self.clock()
+        with self.lock:
+            session = self.sessions.get(token)
+            if session is None:
+                return None
+            if session.expires <= now:
+                del self.sessions[token]
+                return None
+            session.expires = now + self.ttl
+            self.sessions.move_to_end(token)
+            return session
+
+    def revoke(self, token):
+        with self.lock:
+            return self.sessions.pop(token, None)
+
+    def revokeUser(self, user_id):
+        # Quan es canvia el password o s'esborra l'usuari (UserDAO.updateUser / deleteUser)
+        with self.lock:
+            tokens = [t for t, s in self.sessions.items() if s.user_id == user_id]
+            for token in tokens:
+                del self.sessions[token]
+        return len(tokens)
+
+    def purge(self):
+        # Treu les caducades. Com que totes duren el mateix ttl des de l'últim ús,
+        # les caducades sempre són al principi: es para a la primera vàlida
+        now = self.clock()
+        removed = 0
+        with self.lock:
+            while self.sessions:
+                token, session = next(iter(self.sessions.items()))
+                if session.expires > now:
+                    break
+                del self.sessions[token]
+                removed += 1
+        return removed
+
+
+def bearerToken(header):
+    # 'Bearer abc' -> 'abc'
+    if header and header[:7].lower() == 'bearer ':
+        return header[7:].strip()
+    return None
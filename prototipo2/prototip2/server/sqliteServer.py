@@ -0,0 +1,556 @@
+# Backend persistent amb SQLite per als DAOs del servidor.
+# Mateixos noms de mètodes que UserDAO / ChildDao / TapDao de DaoServer,
+# així server.py pot fer servir un backend o l'altre (TAPATAPP_DB=fitxer.sqlite).
+#  - WAL: les lectures no bloquegen l'escriptura
+#  - pool de connexions: cada petició fa servir una connexió del pool i la torna
+#    en acabar (SqliteDatabase.release); les lliures es reutilitzen
+#  - SQL en constants: sqlite3 reutilitza la sentència preparada (cached_statements)
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from dadesServer import User, Child, Tap
+from indexServer import parseTime, checkTimes, normalizeEmail, encodeCursor, decodeCursor, DAY
+from sessionServer import REVOKING_FIELDS
+from treatmentAccumulator import summaryOf, SLOT
+from changesServer import USER, CHILD, RELATION, TAP, UPSERT, DELETE, relationKey
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    email TEXT,
+    email_norm TEXT,
+    idrole INTEGER,
+    token TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users(email_norm);
+CREATE TABLE IF NOT EXISTS children (
+    id INTEGER PRIMARY KEY,
+    child_name TEXT,
+    sleep_average REAL,
+    treatment_id INTEGER,
+    time INTEGER
+);
+CREATE TABLE IF NOT EXISTS relation_user_child (
+    user_id INTEGER NOT NULL,
+    child_id INTEGER NOT NULL,
+    rol_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, child_id, rol_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS relation_child ON relation_user_child(child_id, user_id);
+CREATE TABLE IF NOT EXISTS taps (
+    id INTEGER PRIMARY KEY,
+    child_id INTEGER NOT NULL,
+    status_id INTEGER NOT NULL,
+    user_id INTEGER,
+    init TEXT NOT NULL,
+    init_s INTEGER NOT NULL,
+    "end" TEXT
+);
+CREATE INDEX IF NOT EXISTS taps_child_init ON taps(child_id, init_s);
+CREATE INDEX IF NOT EXISTS taps_init ON taps(init_s);
+CREATE TABLE IF NOT EXISTS tap_clients (
+    client_id TEXT PRIMARY KEY,
+    tap_id INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+USER_COLUMNS = "id, username, password, email, idrole, token"
+TAP_COLUMNS = 'id, child_id, status_id, user_id, init, "end"'
+CHILD_COLUMNS = "id, child_name, sleep_average, treatment_id, time"
+
+SQL_BUMP = ("INSERT INTO versions(scope, version) VALUES (?, 1) "
+            "ON CONFLICT(scope) DO UPDATE SET version = version + 1")
+SQL_VERSION = "SELECT version FROM versions WHERE scope = ?"
+
+
+class SqliteDatabase:
+    def __init__(self, path, cached_statements=128, poolSize=8):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.poolSize = poolSize
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.idle = []     # connexions lliures, com a màxim poolSize
+        self.pins = {}     # connexió -> generadors que encara llegeixen d'un cursor seu
+        self.closed = False
+        self.connection().executescript(SCHEMA)
+        self.release()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def connection(self):
+        # Pool: el thread fa servir la mateixa connexió fins a release() (final de
+        # la petició); la primera vegada n'agafa una de lliure o n'obre una
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                conn = self.connect()
+            self.local.conn = conn
+        return conn
+
+    def release(self):
+        # Torna la connexió del thread al pool (server.py ho fa a teardown_appcontext)
+        conn = self.local.__dict__.pop('conn', None)
+        if conn is not None:
+            self._giveBack(conn)
+
+    def _giveBack(self, conn):
+        with self.lock:
+            if conn in self.pins:
+                # Un generador encara la llegeix: la tornarà ell quan acabi
+                return
+            if not self.closed and len(self.idle) < self.poolSize:
+                if conn.in_transaction:
+                    conn.rollback()
+                self.idle.append(conn)
+                return
+        # Pool ple (o tancat): les connexions que sobren es tanquen
+        conn.close()
+
+    @contextmanager
+    def pinned(self):
+        # Per als generadors que continuen llegint després de la petició (ndjson):
+        # la connexió no torna al pool fins que el generador acaba
+        # (si el generador comença després de la petició, la connexió és seva i també la torna)
+        owned = getattr(self.local, 'conn', None) is None
+        conn = self.connection()
+        with self.lock:
+            self.pins[conn] = self.pins.get(conn, 0) + 1
+        try:
+            yield conn
+        finally:
+            with self.lock:
+                self.pins[conn] -= 1
+                if self.pins[conn] == 0:
+                    del self.pins[conn]
+            if owned and getattr(self.local, 'conn', None) is conn:
+                del self.local.conn
+            if getattr(self.local, 'conn', None) is not conn:
+                self._giveBack(conn)
+
+    def stream(self, sql, params=()):
+        with self.pinned() as conn:
+            yield from conn.execute(sql, params)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+        conn = self.local.__dict__.pop('conn', None)
+        if conn is not None:
+            conn.close()
+
+    def version(self, scope):
+        row = self.connection().execute(SQL_VERSION, (scope,)).fetchone()
+        return row[0] if row else 0
+
+    def isEmpty(self):
+        return self.connection().execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+
+    def load(self, users=(), children=(), relations=(), taps=()):
+        # Càrrega inicial (per exemple les dades de dadesServer) en una transacció
+        with self.connection() as conn:
+            conn.executemany(SQL_INSERT_USER, (userRow(u) for u in users))
+            conn.executemany(SQL_INSERT_CHILD, ((c.id, c.child_name, c.sleep_average, c.treatment_id, c.time)
+                                                for c in children))
+            conn.executemany(SQL_INSERT_RELATION, ((r['user_id'], r['child_id'], r['rol_id'])
+                                                   for r in relations))
+            conn.executemany(SQL_INSERT_TAP, (tapRow(t) for t in taps))
+
+
+def userRow(u):
+    return (u.id, u.username, u.password, u.email, normalizeEmail(u.email) or None, u.idrole, u.token)
+
+
+def tapRow(t):
+    return (t.id or None, t.child_id, t.status_id, t.user_id, t.init, parseTime(t.init), t.end)
+
+
+def toUser(row):
+    user = User(row[0], row[1], row[2], row[3], row[4], row[5])
+    user.idrole = row[4]
+    return user
+
+
+def toTap(row):
+    return Tap(*row)
+
+
+SQL_INSERT_USER = ("INSERT INTO users(id, username, password, email, email_norm, idrole, token) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?)")
+SQL_INSERT_CHILD = f"INSERT INTO children({CHILD_COLUMNS}) VALUES (?, ?, ?, ?, ?)"
+SQL_INSERT_RELATION = "INSERT OR IGNORE INTO relation_user_child(user_id, child_id, rol_id) VALUES (?, ?, ?)"
+SQL_INSERT_TAP = ('INSERT INTO taps(id, child_id, status_id, user_id, init, init_s, "end") '
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+class SqliteUserDAO:
+    SQL_ALL = f"SELECT {USER_COLUMNS} FROM users ORDER BY id"
+    SQL_PAGE = f"SELECT {USER_COLUMNS} FROM users WHERE id > ? ORDER BY id LIMIT ?"
+    SQL_BY_ID = f"SELECT {USER_COLUMNS} FROM users WHERE id = ?"
+    SQL_BY_USERNAME = f"SELECT {USER_COLUMNS} FROM users WHERE username = ?"
+    SQL_BY_EMAIL = f"SELECT {USER_COLUMNS} FROM users WHERE email_norm = ?"
+    SQL_LOGIN = (f"SELECT {USER_COLUMNS} FROM users WHERE username = ? AND password = ? "
+                 f"UNION ALL SELECT {USER_COLUMNS} FROM users WHERE email_norm = ? AND password = ? LIMIT 1")
+    SQL_DELETE = "DELETE FROM users WHERE id = ?"
+    SQL_ROLES = "SELECT rol_id FROM relation_user_child WHERE user_id = ?"
+
+    def __init__(self, db, changes=None, sessions=None):
+        self.db = db
+        # Registre de canvis opcional (changesServer.SqliteChangeLog, mateixa base de dades)
+        self.changes = changes
+        # Sessions opcionals, com a DaoServer.UserDAO
+        self.sessions = sessions
+
+    def _one(self, sql, params):
+        row = self.db.connection().execute(sql, params).fetchone()
+        return toUser(row) if row else None
+
+    def getAllUsers(self):
+        return [toUser(row).to_dict() for row in self.db.connection().execute(self.SQL_ALL)]
+
+    def iterAllUsers(self, chunk=500):
+        after_id = 0
+        with self.db.pinned() as conn:
+            while True:
+                rows = conn.execute(self.SQL_PAGE, (after_id, chunk)).fetchall()
+                for row in rows:
+                    yield toUser(row).to_dict()
+                if len(rows) < chunk:
+                    return
+                after_id = rows[-1][0]
+
+    def getUsersPage(self, after=None, limit=100):
+        after_id = int(decodeCursor(after)) if after else 0
+        rows = self.db.connection().execute(self.SQL_PAGE, (after_id, limit + 1)).fetchall()
+        page = rows[:limit]
+        nextCursor = encodeCursor(page[-1][0]) if len(rows) > limit else None
+        return [toUser(row).to_dict() for row in page], nextCursor
+
+    def getUser(self, user_id):
+        return self._one(self.SQL_BY_ID, (user_id,))
+
+    def getUserByUsername(self, username):
+        user = self._one(self.SQL_BY_USERNAME, (username,))
+        return user.to_dict() if user else None
+
+    def getUserByEmail(self, email):
+        user = self._one(self.SQL_BY_EMAIL, (normalizeEmail(email),))
+        return user.to_dict() if user else None
+
+    def login(self, identifier, password):
+        # Com UserDAO.login: un identifier que no és un string no és de cap usuari
+        if not isinstance(identifier, str):
+            return None
+        return self._one(self.SQL_LOGIN, (identifier, password, normalizeEmail(identifier), password))
+
+    def addUser(self, user):
+        try:
+            with self.db.connection() as conn:
+                cursor = conn.execute(SQL_INSERT_USER, userRow(user))
+                conn.execute(SQL_BUMP, ("users",))
+                if user.id is None:
+                    user.id = cursor.lastrowid
+                if self.changes is not None:
+                    self.changes.append(USER, UPSERT, user.id, user, conn)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"usuari duplicat: {e}")
+        return user
+
+    def updateUser(self, user_id, **fields):
+        user = self.getUser(user_id)
+        if user is None:
+            return None
+        for name, value in fields.items():
+            setattr(user, name, value)
+        try:
+            with self.db.connection() as conn:
+                conn.execute("UPDATE users SET username = ?, password = ?, email = ?, email_norm = ?, "
+                             "idrole = ?, token = ? WHERE id = ?", userRow(user)[1:] + (user_id,))
+                conn.execute(SQL_BUMP, ("users",))
+                if self.changes is not None:
+                    self.changes.append(USER, UPSERT, user_id, user, conn)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"usuari duplicat: {e}")
+        if self.sessions is not None and REVOKING_FIELDS & fields.keys():
+            self.sessions.revokeUser(user_id)
+        return user
+
+    def deleteUser(self, user_id):
+        user = self.getUser(user_id)
+        if user is not None:
+            with self.db.connection() as conn:
+                conn.execute(self.SQL_DELETE, (user_id,))
+                conn.execute(SQL_BUMP, ("users",))
+                if self.changes is not None:
+                    self.changes.append(USER, DELETE, user_id, None, conn)
+            if self.sessions is not None:
+                self.sessions.revokeUser(user_id)
+        return user
+
+    def getUserRole(self, user_id):
+        return [row[0] for row in self.db.connection().execute(self.SQL_ROLES, (user_id,))]
+
+    def getVersion(self):
+        return self.db.version("users")
+
+
+class SqliteChildDao:
+    SQL_BY_USER = (f"SELECT DISTINCT c.id, c.child_name, c.sleep_average, c.treatment_id, c.time "
+                   f"FROM relation_user_child r JOIN children c ON c.id = r.child_id "
+                   f"WHERE r.user_id = ? ORDER BY c.id")
+    SQL_ALL = f"SELECT {CHILD_COLUMNS} FROM children ORDER BY id"
+    SQL_BY_ID = f"SELECT {CHILD_COLUMNS} FROM children WHERE id = ?"
+    SQL_USERS = "SELECT DISTINCT user_id FROM relation_user_child WHERE child_id = ?"
+
+    def __init__(self, db, changes=None):
+        self.db = db
+        self.changes = changes
+
+    def _children(self, sql, params=()):
+        return [Child(*row).to_dict() for row in self.db.connection().execute(sql, params)]
+
+    def getChild(self, user):
+        return self.getChildsOfUser(user.id)
+
+    def getChildsOfUser(self, user_id):
+        return self._children(self.SQL_BY_USER, (user_id,))
+
+    def getAllChilds(self):
+        return self._children(self.SQL_ALL)
+
+    def iterAllChilds(self):
+        for row in self.db.stream(self.SQL_ALL):
+            yield Child(*row).to_dict()
+
+    def getChildById(self, child_id):
+        children = self._children(self.SQL_BY_ID, (child_id,))
+        return children[0] if children else None
+
+    def getUsersOfChild(self, child_id):
+        return [row[0] for row in self.db.connection().execute(self.SQL_USERS, (child_id,))]
+
+    def addChild(self, child):
+        with self.db.connection() as conn:
+            conn.execute(SQL_INSERT_CHILD, (child.id, child.child_name, child.sleep_average,
+                                            child.treatment_id, child.time))
+            conn.execute(SQL_BUMP, ("children",))
+            if self.changes is not None:
+                self.changes.append(CHILD, UPSERT, child.id, child, conn)
+        return child
+
+    def deleteChild(self, child_id):
+        child = self.getChildById(child_id)
+        with self.db.connection() as conn:
+            removed = [{"user_id": r[0], "child_id": r[1], "rol_id": r[2]} for r in conn.execute(
+                "SELECT user_id, child_id, rol_id FROM relation_user_child WHERE child_id = ?", (child_id,))]
+            users = list(dict.fromkeys(r["user_id"] for r in removed))
+            conn.execute("DELETE FROM relation_user_child WHERE child_id = ?", (child_id,))
+            conn.execute("DELETE FROM children WHERE id = ?", (child_id,))
+            conn.execute(SQL_BUMP, ("children",))
+            conn.executemany(SQL_BUMP, ((f"relations:{u}",) for u in users))
+            if self.changes is not None:
+                for relation in removed:
+                    self.changes.append(RELATION, DELETE, relationKey(relation), relation, conn)
+                if child is not None:
+                    self.changes.append(CHILD, DELETE, child_id, None, conn)
+        return child
+
+    def addRelation(self, user_id, child_id, rol_id):
+        with self.db.connection() as conn:
+            if conn.execute(SQL_INSERT_RELATION, (user_id, child_id, rol_id)).rowcount == 0:
+                return None
+            conn.execute(SQL_BUMP, (f"relations:{user_id}",))
+            relation = {"user_id": user_id, "child_id": child_id, "rol_id": rol_id}
+            if self.changes is not None:
+                self.changes.append(RELATION, UPSERT, relationKey(relation), relation, conn)
+        return relation
+
+    def removeRelation(self, user_id, child_id, rol_id=None):
+        where = "user_id = ? AND child_id = ?" + ("" if rol_id is None else " AND rol_id = ?")
+        params = (user_id, child_id) if rol_id is None else (user_id, child_id, rol_id)
+        with self.db.connection() as conn:
+            removed = [{"user_id": r[0], "child_id": r[1], "rol_id": r[2]} for r in
+                       conn.execute(f"SELECT user_id, child_id, rol_id FROM relation_user_child WHERE {where}",
+                                    params)]
+            conn.execute(f"DELETE FROM relation_user_child WHERE {where}", params)
+            if removed:
+                conn.execute(SQL_BUMP, (f"relations:{user_id}",))
+            if self.changes is not None:
+                for relation in removed:
+                    self.changes.append(RELATION, DELETE, relationKey(relation), relation, conn)
+        return removed
+
+    def getVersion(self, user_id=None):
+        if user_id is None:
+            return self.db.version("children")
+        return f"{self.db.version('children')}.{self.db.version(f'relations:{user_id}')}"
+
+
+class SqliteTapDao:
+    SQL_BY_ID = f"SELECT {TAP_COLUMNS} FROM taps WHERE id = ?"
+    SQL_BY_CHILD = (f"SELECT {TAP_COLUMNS} FROM taps WHERE child_id = ? AND init_s BETWEEN ? AND ? "
+                    f"ORDER BY init_s, id")
+    SQL_BY_RANGE = (f"SELECT {TAP_COLUMNS} FROM taps WHERE init_s BETWEEN ? AND ? "
+                    f"ORDER BY child_id, init_s, id")
+    # Taps que toquen el dia: l'últim d'abans del dia, els del dia i el primer de l'endemà
+    SQL_PREVIOUS = (f"SELECT {TAP_COLUMNS}, init_s FROM taps WHERE child_id = ? AND init_s < ? "
+                    f"ORDER BY init_s DESC, id DESC LIMIT 1")
+    SQL_DAY = (f"SELECT {TAP_COLUMNS}, init_s FROM taps WHERE child_id = ? AND init_s >= ? AND init_s < ? "
+               f"ORDER BY init_s, id")
+    SQL_NEXT = (f"SELECT {TAP_COLUMNS}, init_s FROM taps WHERE child_id = ? AND init_s >= ? "
+                f"ORDER BY init_s, id LIMIT 1")
+    SQL_LAST = (f"SELECT {TAP_COLUMNS} FROM taps WHERE child_id = ? "
+                f"ORDER BY init_s DESC, id DESC LIMIT 1")
+    SQL_DELETE = "DELETE FROM taps WHERE id = ?"
+    SQL_INSERT_CLIENT = "INSERT OR IGNORE INTO tap_clients(client_id, tap_id) VALUES (?, ?)"
+    SQL_CLIENT_TAP = "SELECT tap_id FROM tap_clients WHERE client_id = ?"
+
+    MIN, MAX = -(2 ** 62), 2 ** 62
+
+    def __init__(self, db, changes=None):
+        self.db = db
+        self.changes = changes
+
+    def _bounds(self, start, end):
+        return (self.MIN if start is None else parseTime(start),
+                self.MAX if end is None else parseTime(end))
+
+    def _tap(self, tap_id):
+        row = self.db.connection().execute(self.SQL_BY_ID, (tap_id,)).fetchone()
+        return toTap(row) if row else None
+
+    def _bump(self, conn, child_id):
+        conn.executemany(SQL_BUMP, (("taps",), (f"taps:{child_id}",)))
+
+    def _changed(self, conn, tap, op=UPSERT):
+        if self.changes is not None:
+            self.changes.append(TAP, op, tap.id, tap if op == UPSERT else None, conn)
+
+    def getTap(self, tap_id):
+        tap = self._tap(tap_id)
+        return tap.to_dict() if tap else None
+
+    def getTapsByChild(self, child_id, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        cursor = self.db.stream(self.SQL_BY_CHILD, (child_id, lo, hi))
+        return (toTap(row).to_dict() for row in cursor)
+
+    def getTapsByDateRange(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        cursor = self.db.stream(self.SQL_BY_RANGE, (lo, hi))
+        return (toTap(row).to_dict() for row in cursor)
+
+    def createTap(self, tap):
+        try:
+            with self.db.connection() as conn:
+                tap.id = conn.execute(SQL_INSERT_TAP, tapRow(tap)).lastrowid
+                self._bump(conn, tap.child_id)
+                self._changed(conn, tap)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"tap duplicat: {e}")
+        return tap
+
+    def createTaps(self, taps, clientIds):
+        # Alta en bloc en una sola transacció; els client_id ja vistos retornen l'id que tenien
+        conn = self.db.connection()
+        known = {}
+        unique = list(dict.fromkeys(clientIds))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            known.update(conn.execute(
+                f"SELECT client_id, tap_id FROM tap_clients WHERE client_id IN ({marks})", chunk))
+        created = set()
+        with conn:
+            for tap, clientId in zip(taps, clientIds):
+                if clientId in known:
+                    continue
+                tap.id = conn.execute(SQL_INSERT_TAP, tapRow(tap)).lastrowid
+                if not conn.execute(self.SQL_INSERT_CLIENT, (clientId, tap.id)).rowcount:
+                    # Una altra petició amb el mateix client_id l'ha desat després del
+                    # SELECT d'abans: es desfà aquest tap i es retorna l'id de l'altra
+                    conn.execute(self.SQL_DELETE, (tap.id,))
+                    known[clientId] = conn.execute(self.SQL_CLIENT_TAP, (clientId,)).fetchone()[0]
+                    continue
+                self._changed(conn, tap)
+                known[clientId] = tap.id
+                created.add(id(tap))
+            for child_id in {tap.child_id for tap in taps if id(tap) in created}:
+                self._bump(conn, child_id)
+        return [(known[clientId], id(tap) in created) for tap, clientId in zip(taps, clientIds)]
+
+    def closeTap(self, tap_id, end):
+        if not isinstance(end, str):
+            raise ValueError("Data incorrecta (format ISO 8601)")
+        tap = self._tap(tap_id)
+        if tap is None:
+            return None
+        checkTimes(tap.init, end)
+        tap.end = end
+        with self.db.connection() as conn:
+            conn.execute('UPDATE taps SET "end" = ? WHERE id = ?', (end, tap_id))
+            self._bump(conn, tap.child_id)
+            self._changed(conn, tap)
+        return tap
+
+    def deleteTap(self, tap_id):
+        tap = self._tap(tap_id)
+        if tap is not None:
+            with self.db.connection() as conn:
+                conn.execute(self.SQL_DELETE, (tap_id,))
+                self._bump(conn, tap.child_id)
+                self._changed(conn, tap, DELETE)
+        return tap
+
+    def getTreatment(self, child_id, day, now=None):
+        # Mateix resultat que TreatmentAccumulator.summary (summaryOf), però llegint només els taps del dia
+        lo = parseTime(day) // DAY * DAY
+        hi = lo + DAY
+        conn = self.db.connection()
+        rows = conn.execute(self.SQL_PREVIOUS, (child_id, lo)).fetchall()
+        rows += conn.execute(self.SQL_DAY, (child_id, lo, hi)).fetchall()
+        following = conn.execute(self.SQL_NEXT, (child_id, hi)).fetchone()
+        if following:
+            rows.append(following)
+        last = conn.execute(self.SQL_LAST, (child_id,)).fetchone()
+        current = toTap(last) if last and last[5] is None else None
+
+        # Segons tancats del dia; el tap obert (fins a now) l'afegeix summaryOf
+        totals = [0, 0, 0]
+        for i, row in enumerate(rows):
+            start = row[6]
+            nextInit = rows[i + 1][6] if i + 1 < len(rows) else None
+            if row[5] is not None:
+                end = parseTime(row[5])
+                end = end if nextInit is None else min(end, nextInit)
+            elif nextInit is not None:
+                end = nextInit
+            else:
+                continue
+            seconds = min(end, hi) - max(start, lo)
+            if seconds > 0 and row[2] in SLOT:
+                totals[SLOT[row[2]]] += seconds
+        return summaryOf(child_id, day, totals, current, now)
+
+    def getVersion(self, child_id=None):
+        if child_id is None:
+            return self.db.version("taps")
+        return self.db.version(f"taps:{child_id}")
@@ -0,0 +1,101 @@
+# Taps en format columnar (numpy) per calcular el temps de pegat (RF4/RF5)
+# Un tap marca un canvi d'estat del child: dura fins al seu end o,
+# si no en té, fins al següent tap del mateix child (el que arribi abans).
+import numpy as np
+
+from dadesServer import SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH
+from indexServer import parseTime, DAY
+
+
+class TapColumns:
+    def __init__(self, start, end, status, child):
+        self.start = np.asarray(start, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.status = np.asarray(status, dtype=np.int8)
+        self.child = np.asarray(child, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.start)
+
+    @classmethod
+    def fromTaps(cls, taps, now=None):
+        # now: data ISO (o segons) on es tanquen els taps oberts; sense now duren 0
+        start, end, status, child = [], [], [], []
+        for tap in taps:
+            start.append(parseTime(tap.init))
+            end.append(-1 if getattr(tap, 'end', None) is None else parseTime(tap.end))
+            status.append(tap.status_id)
+            child.append(tap.child_id)
+        return cls.fromArrays(start, end, status, child, now)
+
+    @classmethod
+    def fromArrays(cls, start, end, status, child, now=None):
+        # end == -1 vol dir tap obert
+        start = np.asarray(start, dtype=np.int64)
+        end = np.asarray(end, dtype=np.int64)
+        status = np.asarray(status, dtype=np.int8)
+        child = np.asarray(child, dtype=np.int32)
+        order = np.lexsort((start, child))
+        start, end, status, child = start[order], end[order], status[order], child[order]
+
+        # Taps oberts: acaben on comença el següent del mateix child.
+        # Un tap tancat tampoc pot passar del següent (és un canvi d'estat)
+        nextStart = np.empty_like(start)
+        nextStart[:-1] = start[1:]
+        sameChild = np.zeros(len(start), dtype=bool)
+        sameChild[:-1] = child[1:] == child[:-1]
+        lastEnd = start if now is None else np.maximum(start, parseTime(now))
+        end = np.where(end < 0,
+                       np.where(sameChild, nextStart, lastEnd),
+                       np.where(sameChild, np.minimum(end, nextStart), end))
+        return cls(start, np.maximum(end, start), status, child)
+
+
+def splitByDay(cols):
+    # Parteix cada interval pels canvis de dia: retorna (child, day, status, segons)
+    # day és el número de dia des de 1970-01-01
+    first = cols.start // DAY
+    last = np.maximum(cols.end - 1, cols.start) // DAY
+    pieces = (last - first + 1).astype(np.int64)
+    idx = np.repeat(np.arange(len(cols)), pieces)
+    offsets = np.arange(len(idx)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    day = first[idx] + offsets
+    seconds = (np.minimum(cols.end[idx], (day + 1) * DAY)
+               - np.maximum(cols.start[idx], day * DAY))
+    return cols.child[idx], day, cols.status[idx], seconds
+
+
+def _group(keys, status, seconds):
+    groups, inverse = np.unique(keys, return_inverse=True)
+    n = len(groups)
+    totals = {}
+    for name, code in (('sleep', SLEEP), ('wear', AWAKE_PATCH), ('noPatch', AWAKE_NO_PATCH)):
+        weights = np.where(status == code, seconds, 0)
+        totals[name] = np.bincount(inverse, weights=weights, minlength=n).astype(np.int64)
+    totals['awake'] = totals['wear'] + totals['noPatch']
+    return groups, totals
+
+
+def dailyDurations(cols):
+    # Segons de son, pegat (wear), despert sense pegat i despert total per child i dia
+    child, day, status, seconds = splitByDay(cols)
+    keys = (child.astype(np.int64) << 32) | (day - day.min() if len(day) else day)
+    groups, totals = _group(keys, status, seconds)
+    totals['child'] = (groups >> 32).astype(np.int32)
+    totals['day'] = (groups & 0xFFFFFFFF) + (day.min() if len(day) else 0)
+    return totals
+
+
+def childDurations(cols, start=None, end=None):
+    # Totals per child; start/end (ISO o segons) retallen els intervals
+    lo = np.iinfo(np.int64).min if start is None else parseTime(start)
+    hi = np.iinfo(np.int64).max if end is None else parseTime(end)
+    seconds = np.clip(np.minimum(cols.end, hi) - np.maximum(cols.start, lo), 0, None)
+    groups, totals = _group(cols.child, cols.status, seconds)
+    totals['child'] = groups
+    return totals
+
+
+def halfAwakeReached(totals):
+    # Tractament 'percentage': pegat com a mínim la meitat del temps despert
+    return totals['wear'] * 2 >= totals['awake']
@@ -0,0 +1,168 @@
+# Acumulador del tractament per child i dia (segons de son, pegat i despert sense pegat)
+# S'actualitza a cada tap nou o tancat sense tornar a recórrer l'historial:
+#  - tap nou al final: es tanca l'anterior i se suma el seu interval (O(1))
+#  - tap antic, tancar un tap del mig o esborrar: es refan només els dies afectats
+from bisect import bisect_left
+
+from dadesServer import SLEEP, AWAKE_PATCH, AWAKE_NO_PATCH
+from indexServer import parseTime, checkTimes, DAY
+from tapTable import TapStore
+
+SLOT = {SLEEP: 0, AWAKE_PATCH: 1, AWAKE_NO_PATCH: 2}
+
+
+class TreatmentAccumulator:
+    def __init__(self, store=None):
+        self.store = store if store is not None else TapStore()
+        self.days = {}   # child_id -> {dia: [son, pegat, sense pegat]}
+        for child_id, (times, taps) in self.store.byChild.items():
+            if times:
+                self._repair(child_id, times[0] // DAY, self._lastDay(taps))
+
+    # --- Canvis de taps -------------------------------------------------
+
+    # Amb el lock del store (RLock): el store i els totals canvien junts
+    def insert(self, tap):
+        with self.store.lock:
+            self.store.insert(tap)
+            times, taps = self.store.byChild[tap.child_id]
+            pos = self._index(tap)
+            if pos == len(taps) - 1:
+                prev = taps[pos - 1] if pos > 0 else None
+                if prev is not None and prev.end is None:
+                    self._add(prev.child_id, prev.status_id, times[pos - 1], times[pos])
+                elif prev is not None and parseTime(prev.end) > times[pos]:
+                    # L'anterior estava tancat més enllà del tap nou: s'escurça. La
+                    # reparació ja compta el tap nou (fins al seu end): no se suma a part
+                    last = max(parseTime(prev.end), parseTime(tap.end) or 0)
+                    self._repair(tap.child_id, times[pos - 1] // DAY, last // DAY)
+                    return tap
+                if tap.end is not None:
+                    self._add(tap.child_id, tap.status_id, times[pos], parseTime(tap.end))
+            else:
+                # Tap retroactiu: canvia l'interval de l'anterior i el seu
+                first = times[pos - 1] if pos > 0 else times[pos]
+                self._repair(tap.child_id, first // DAY, self._lastDay(taps[pos:pos + 2]))
+            return tap
+
+    def close(self, tap_id, end):
+        # Primer es valida la data: un end incorrecte no ha d'arribar al store
+        if not isinstance(end, str):
+            raise ValueError("Data incorrecta (format ISO 8601)")
+        with self.store.lock:
+            tap = self.store.get(tap_id)
+            if tap is None:
+                return None
+            # Com a l'alta (DaoServer.tapFromRow): end no pot ser anterior a init
+            _, endTime = checkTimes(tap.init, end)
+            times, taps = self.store.byChild[tap.child_id]
+            pos = self._index(tap)
+            wasOpen = tap.end is None and pos == len(taps) - 1
+            oldEnd = self._end(times, taps, pos)
+            self.store.close(tap_id, end)
+            if wasOpen:
+                self._add(tap.child_id, tap.status_id, times[pos], endTime)
+            else:
+                # oldEnd no passa mai de l'init del següent, el nou end tampoc
+                last = max(endTime, oldEnd or 0)
+                self._repair(tap.child_id, times[pos] // DAY, last // DAY)
+            return tap
+
+    def delete(self, tap_id):
+        with self.store.lock:
+            tap = self.store.get(tap_id)
+            if tap is None:
+                return None
+            times, taps = self.store.byChild[tap.child_id]
+            pos = self._index(tap)
+            first = times[pos - 1] if pos > 0 else times[pos]
+            # Sense aquest tap l'anterior s'allarga fins al seu end (pot ser un altre dia)
+            last = self._lastDay(taps[max(pos - 1, 0):pos + 2])
+            # El store retorna una còpia: la vista tap ja no és vàlida
+            tap = self.store.delete(tap_id)
+            self._repair(tap.child_id, first // DAY, last)
+            return tap
+
+    # --- Consultes ------------------------------------------------------
+
+    def openTap(self, child_id):
+        # Estat actual: l'últim tap si encara no té end
+        tap = self.store.lastOfChild(child_id)
+        if tap is not None and tap.end is None:
+            return tap
+        return None
+
+    def summary(self, child_id, day, now=None):
+        # day: 'YYYY-MM-DD'. Amb now se suma també el tap obert fins a now
+        totals = self.days.get(child_id, {}).get(parseTime(day) // DAY, (0, 0, 0))
+        return summaryOf(child_id, day, totals, self.openTap(child_id), now)
+
+    # --- Intern ---------------------------------------------------------
+
+    def _index(self, tap):
+        return self.store._position(tap)
+
+    def _end(self, times, taps, pos):
+        # Final efectiu: end del tap, però mai més enllà de l'init del següent
+        # (un tap nou és un canvi d'estat); None si és l'obert
+        nextInit = times[pos + 1] if pos + 1 < len(times) else None
+        end = taps.endTime(pos)
+        if end is not None:
+            return end if nextInit is None else min(end, nextInit)
+        return nextInit
+
+    def _lastDay(self, taps):
+        last = 0
+        for tap in taps:
+            last = max(last, parseTime(tap.init), parseTime(tap.end) or 0)
+        return last // DAY
+
+    def _add(self, child_id, status_id, start, end, lo=None, hi=None):
+        if status_id not in SLOT:
+            return
+        if lo is not None:
+            start, end = max(start, lo), min(end, hi)
+        slot = SLOT[status_id]
+        childDays = self.days.setdefault(child_id, {})
+        while start < end:
+            d = start // DAY
+            pieceEnd = min(end, (d + 1) * DAY)
+            childDays.setdefault(d, [0, 0, 0])[slot] += pieceEnd - start
+            start = pieceEnd
+
+    def _repair(self, child_id, firstDay, lastDay):
+        # Torna a calcular els dies [firstDay, lastDay] a partir dels taps que hi cauen
+        childDays = self.days.setdefault(child_id, {})
+        for d in range(firstDay, lastDay + 1):
+            childDays.pop(d, None)
+        times, taps = self.store.byChild.get(child_id, ([], []))
+        lo, hi = firstDay * DAY, (lastDay + 1) * DAY
+        start = max(bisect_left(times, lo) - 1, 0)
+        stop = bisect_left(times, hi)
+        for pos in range(start, stop):
+            end = self._end(times, taps, pos)
+            if end is not None:
+                self._add(child_id, taps[pos].status_id, times[pos], end, lo, hi)
+
+
+def summaryOf(child_id, day, totals, current, now=None):
+    # Resposta de /treatment a partir dels segons (son, pegat, sense pegat) del
+    # dia i del tap obert; també la fan servir els DAO del snapshot binari
+    d = parseTime(day) // DAY
+    sleep, wear, noPatch = totals
+    if current is not None and now is not None:
+        lo = max(parseTime(current.init), d * DAY)
+        hi = min(parseTime(now), (d + 1) * DAY)
+        if hi > lo and current.status_id in SLOT:
+            extra = [0, 0, 0]
+            extra[SLOT[current.status_id]] = hi - lo
+            sleep, wear, noPatch = sleep + extra[0], wear + extra[1], noPatch + extra[2]
+    return {
+        "child_id": child_id,
+        "date": day,
+        "sleep_minutes": sleep // 60,
+        "patch_minutes": wear // 60,
+        "no_patch_minutes": noPatch // 60,
+        "awake_minutes": (wear + noPatch) // 60,
+        "open": current.to_dict() if current is not None else None
+    }